@@ -0,0 +1,50 @@
+"""Add etl_checkpoints and session_aggregates tables
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-job watermark for incremental jobs
+    op.create_table(
+        'etl_checkpoints',
+        sa.Column('job_name', sa.String(length=100), nullable=False),
+        sa.Column('last_created_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('last_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('job_name')
+    )
+
+    # Merged per-session aggregates written by the ETL
+    op.create_table(
+        'session_aggregates',
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('event_count', sa.BigInteger(), nullable=False),
+        sa.Column('score_max', sa.Float(), nullable=True),
+        sa.Column('last_event_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('session_id')
+    )
+
+    # Serves "(created_at, id) > watermark ORDER BY created_at, id" range scans
+    op.create_index('ix_events_created_at_id', 'events', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_created_at_id', table_name='events')
+    op.drop_table('session_aggregates')
+    op.drop_table('etl_checkpoints')
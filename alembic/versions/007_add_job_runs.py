@@ -0,0 +1,51 @@
+"""Add job_runs table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Admin-submitted job runs with progress and result
+    op.create_table(
+        'job_runs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tasks', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('params', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('params_hash', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('progress', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('result', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('created_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('started_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('finished_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_job_runs_status'), 'job_runs', ['status'], unique=False)
+    # Deduplicates identical submissions while one is queued or running
+    op.create_index(
+        'ix_job_runs_active_params_hash', 'job_runs', ['params_hash'], unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_job_runs_active_params_hash', table_name='job_runs')
+    op.drop_index(op.f('ix_job_runs_status'), table_name='job_runs')
+    op.drop_table('job_runs')
@@ -0,0 +1,36 @@
+"""Add backfill_checkpoints table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Completed (task, level, date) units per backfill run, so runs can resume
+    op.create_table(
+        'backfill_checkpoints',
+        sa.Column('run_name', sa.String(length=100), nullable=False),
+        sa.Column('task', sa.String(length=20), nullable=False),
+        sa.Column('level', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('stats', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('completed_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('run_name', 'task', 'level', 'date')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('backfill_checkpoints')
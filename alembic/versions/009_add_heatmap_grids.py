@@ -0,0 +1,35 @@
+"""Store each heatmap's world grid
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # grid_size was written by scripts/heatmap.py but never added by a migration
+    op.execute("ALTER TABLE heatmaps ADD COLUMN IF NOT EXISTS grid_size VARCHAR")
+    # World bounds of the grid each matrix was binned on; NULL for matrices
+    # binned over a data-derived range, which cannot be summed across dates
+    op.add_column('heatmaps', sa.Column('x_min', sa.Float(), nullable=True))
+    op.add_column('heatmaps', sa.Column('x_max', sa.Float(), nullable=True))
+    op.add_column('heatmaps', sa.Column('y_min', sa.Float(), nullable=True))
+    op.add_column('heatmaps', sa.Column('y_max', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('heatmaps', 'y_max')
+    op.drop_column('heatmaps', 'y_min')
+    op.drop_column('heatmaps', 'x_max')
+    op.drop_column('heatmaps', 'x_min')
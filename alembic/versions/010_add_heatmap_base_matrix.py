@@ -0,0 +1,27 @@
+"""Store settled counts for incremental heatmap accumulation
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Counts of the events up to the accumulator's watermark (see
+    # scripts/heatmap_accumulate.py); `matrix` adds the re-scanned tail on top
+    op.add_column('heatmaps', sa.Column('base_matrix', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('heatmaps', 'base_matrix')
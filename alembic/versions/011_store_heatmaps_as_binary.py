@@ -0,0 +1,107 @@
+"""Store heatmap matrices as compressed uint32 arrays
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The storage format as of this revision, inlined so later codec changes cannot alter what it writes
+STORAGE_DTYPE = "<u4"
+COMPRESSION_LEVEL = 6
+
+
+def encode_counts(matrix):
+    counts = np.asarray(matrix)
+    if counts.size and (counts.min() < 0 or counts.max() > np.iinfo(np.uint32).max):
+        raise ValueError(f"Heatmap counts out of uint32 range: [{counts.min()}, {counts.max()}]")
+    counts = np.ascontiguousarray(counts, dtype=STORAGE_DTYPE)
+    return zlib.compress(counts.tobytes(), COMPRESSION_LEVEL), list(counts.shape), STORAGE_DTYPE
+
+
+def decode_counts(data, shape, dtype):
+    return np.frombuffer(zlib.decompress(data), dtype=dtype).reshape(tuple(shape))
+
+
+def _as_list(value):
+    # JSON columns come back parsed from psycopg2, but be lenient with text
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def upgrade() -> None:
+    op.add_column('heatmaps', sa.Column('matrix_data', sa.LargeBinary(), nullable=True))
+    op.add_column('heatmaps', sa.Column('matrix_shape', sa.JSON(), nullable=True))
+    op.add_column('heatmaps', sa.Column('matrix_dtype', sa.String(16), nullable=True))
+    op.add_column('heatmaps', sa.Column('base_data', sa.LargeBinary(), nullable=True))
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT level, date, matrix, base_matrix FROM heatmaps")).all()
+    for row in rows:
+        # Stored matrices hold whole counts written as floats
+        data, shape, dtype = encode_counts(np.rint(np.asarray(_as_list(row.matrix), dtype=float)))
+        base = row.base_matrix
+        conn.execute(
+            sa.text(
+                "UPDATE heatmaps SET matrix_data = :data, matrix_shape = CAST(:shape AS json), "
+                "matrix_dtype = :dtype, base_data = :base WHERE level = :level AND date = :date"
+            ),
+            {
+                "data": data,
+                "shape": json.dumps(shape),
+                "dtype": dtype,
+                "base": encode_counts(_as_list(base))[0] if base is not None else None,
+                "level": row.level,
+                "date": row.date,
+            },
+        )
+
+    op.alter_column('heatmaps', 'matrix_data', nullable=False)
+    op.alter_column('heatmaps', 'matrix_shape', nullable=False)
+    op.alter_column('heatmaps', 'matrix_dtype', nullable=False)
+    op.drop_column('heatmaps', 'base_matrix')
+    op.drop_column('heatmaps', 'matrix')
+
+
+def downgrade() -> None:
+    op.add_column('heatmaps', sa.Column('matrix', sa.JSON(), nullable=True))
+    op.add_column('heatmaps', sa.Column('base_matrix', sa.JSON(), nullable=True))
+
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.text("SELECT level, date, matrix_data, matrix_shape, matrix_dtype, base_data FROM heatmaps")
+    ).all()
+    for row in rows:
+        shape = _as_list(row.matrix_shape)
+        base = row.base_data
+        conn.execute(
+            sa.text(
+                "UPDATE heatmaps SET matrix = CAST(:matrix AS json), base_matrix = CAST(:base AS json) "
+                "WHERE level = :level AND date = :date"
+            ),
+            {
+                "matrix": json.dumps(decode_counts(row.matrix_data, shape, row.matrix_dtype).astype(float).tolist()),
+                "base": json.dumps(decode_counts(base, shape, row.matrix_dtype).tolist()) if base is not None else None,
+                "level": row.level,
+                "date": row.date,
+            },
+        )
+
+    op.alter_column('heatmaps', 'matrix', nullable=False)
+    op.drop_column('heatmaps', 'base_data')
+    op.drop_column('heatmaps', 'matrix_dtype')
+    op.drop_column('heatmaps', 'matrix_shape')
+    op.drop_column('heatmaps', 'matrix_data')
@@ -0,0 +1,40 @@
+"""Add heatmap_tiles for multi-resolution heatmap pyramids
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '012'
+down_revision: Union[str, None] = '011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One row per non-empty tile of a (level, date) pyramid; see scripts/tiles.py
+    op.create_table(
+        'heatmap_tiles',
+        sa.Column('level', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('zoom', sa.SmallInteger(), nullable=False),
+        sa.Column('tile_x', sa.Integer(), nullable=False),
+        sa.Column('tile_y', sa.Integer(), nullable=False),
+        sa.Column('x_min', sa.Float(), nullable=False),
+        sa.Column('x_max', sa.Float(), nullable=False),
+        sa.Column('y_min', sa.Float(), nullable=False),
+        sa.Column('y_max', sa.Float(), nullable=False),
+        sa.Column('tile_size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('level', 'date', 'zoom', 'tile_x', 'tile_y'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('heatmap_tiles')
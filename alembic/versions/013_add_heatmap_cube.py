@@ -0,0 +1,45 @@
+"""Add heatmap_cube for per-dimension heatmap count arrays
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One count array per (level, date, platform, game_version, event_type); see scripts/heatmap_cube.py.
+    # Starts empty: the incremental accumulator only adds events after its watermark, so fill
+    # history with `python -m scripts.backfill --tasks heatmap` over every date with events.
+    op.create_table(
+        'heatmap_cube',
+        sa.Column('level', sa.String(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('platform', sa.String(length=50), nullable=False),
+        sa.Column('game_version', sa.String(length=50), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('grid_size', sa.String(), nullable=False),
+        sa.Column('x_min', sa.Float(), nullable=True),
+        sa.Column('x_max', sa.Float(), nullable=True),
+        sa.Column('y_min', sa.Float(), nullable=True),
+        sa.Column('y_max', sa.Float(), nullable=True),
+        sa.Column('matrix_data', sa.LargeBinary(), nullable=False),
+        sa.Column('matrix_shape', sa.JSON(), nullable=False),
+        sa.Column('matrix_dtype', sa.String(length=16), nullable=False),
+        sa.Column('base_data', sa.LargeBinary(), nullable=True),
+        sa.PrimaryKeyConstraint('level', 'date', 'platform', 'game_version', 'event_type'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('heatmap_cube')
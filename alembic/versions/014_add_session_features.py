@@ -0,0 +1,49 @@
+"""Add session_features for model training exports
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-session behavioral features maintained by the ETL; see scripts/session_features.py
+    op.create_table(
+        'session_features',
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('event_count', sa.BigInteger(), nullable=False),
+        sa.Column('first_event_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('last_event_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('active_seconds', sa.Float(), nullable=False),
+        sa.Column('jump_count', sa.Integer(), nullable=False),
+        sa.Column('collision_count', sa.Integer(), nullable=False),
+        sa.Column('jumps_per_second', sa.Float(), nullable=True),
+        sa.Column('score_max', sa.Float(), nullable=True),
+        sa.Column('score_velocity', sa.Float(), nullable=True),
+        sa.Column('inter_jump_mean', sa.Float(), nullable=True),
+        sa.Column('inter_jump_std', sa.Float(), nullable=True),
+        sa.Column('inter_jump_min', sa.Float(), nullable=True),
+        sa.Column('inter_jump_max', sa.Float(), nullable=True),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('session_id')
+    )
+
+    # Serves "session_id = ANY(...) ORDER BY session_id, timestamp" feature reads
+    op.create_index('ix_events_session_id_timestamp', 'events', ['session_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_session_id_timestamp', table_name='events')
+    op.drop_table('session_features')
@@ -0,0 +1,48 @@
+"""Add user_scores and user_score_runs for batch churn scoring
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '015'
+down_revision: Union[str, None] = '014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Latest churn score per user; see scripts/churn_scoring.py
+    op.create_table(
+        'user_scores',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('churn_score', sa.Float(), nullable=False),
+        sa.Column('model_version', sa.String(length=50), nullable=False),
+        sa.Column('score_version', sa.String(length=100), nullable=False),
+        sa.Column('scored_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # One row per published scoring run; the API cache follows the latest
+    op.create_table(
+        'user_score_runs',
+        sa.Column('score_version', sa.String(length=100), nullable=False),
+        sa.Column('model_version', sa.String(length=50), nullable=False),
+        sa.Column('users', sa.Integer(), nullable=False),
+        sa.Column('finished_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('score_version')
+    )
+    op.create_index('ix_user_score_runs_finished_at', 'user_score_runs', ['finished_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_score_runs_finished_at', table_name='user_score_runs')
+    op.drop_table('user_score_runs')
+    op.drop_table('user_scores')
@@ -0,0 +1,31 @@
+"""Track when each heatmap row last changed
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '016'
+down_revision: Union[str, None] = '015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Bumped by every upsert (scripts/heatmap.py); the API's local heatmap store
+    # revalidates cached days against it (scripts/heatmap_store.py)
+    op.add_column(
+        'heatmaps',
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('heatmaps', 'updated_at')
@@ -1,9 +1,13 @@
 import os
+import uuid
 from typing import Optional, List
 
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.jobs import run_etl_job, run_heatmap_job
+from app.db import get_db
+from app.job_runs import request_cancel, serialize_job_run, start_job_run, submit_job_run
+from app.models import JobRun
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -14,26 +18,80 @@ def _require_api_key(x_api_key: Optional[str]):
         raise HTTPException(status_code=401, detail="Unauthorized: invalid API key")
 
 
-@router.post("/run-jobs")
-def run_jobs(
+@router.post("/run-jobs", status_code=status.HTTP_202_ACCEPTED)
+async def run_jobs(
     x_api_key: Optional[str] = Header(default=None, alias="x-api-key"),
     tasks: Optional[List[str]] = None,
     levels: Optional[List[str]] = None,
     date: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
 ):
-    """Manually trigger ETL and/or heatmap jobs.
+    """Submit ETL and/or heatmap jobs; returns a job ID without waiting for them.
 
     - Provide header `x-api-key` matching ADMIN_API_KEY env var.
     - Body/query param `tasks`: ["etl", "heatmap"] (defaults to both)
     - Optional `levels`: list of levels for heatmap
     - Optional `date`: YYYY-MM-DD for heatmap (defaults to today UTC)
+
+    Submitting the same tasks and parameters while an identical run is queued
+    or running returns that run's ID with `deduplicated: true`.
+
+    Raises:
+        HTTPException: 400 for unknown tasks or a malformed date
+    """
+    _require_api_key(x_api_key)
+    try:
+        run, deduplicated = await submit_job_run(db, tasks, levels, date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deduplicated:
+        start_job_run(run.id)
+    return {
+        "job_id": str(run.id),
+        "status": run.status,
+        "deduplicated": deduplicated,
+        "status_url": f"/admin/jobs/{run.id}",
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: uuid.UUID,
+    x_api_key: Optional[str] = Header(default=None, alias="x-api-key"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Status, progress and result of a submitted job run.
+
+    Raises:
+        HTTPException: 404 if the job does not exist
     """
     _require_api_key(x_api_key)
+    run = await db.get(JobRun, job_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job_run(run)
+
+
+@router.post("/jobs/{job_id}/cancel", status_code=status.HTTP_202_ACCEPTED)
+async def cancel_job(
+    job_id: uuid.UUID,
+    x_api_key: Optional[str] = Header(default=None, alias="x-api-key"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Cancel a job run.
+
+    A queued run is cancelled immediately; a running one stops at its next
+    checkpoint, keeping what it committed: between ETL chunks or tile dates,
+    and for heatmaps between the scan and the write. A heatmap scan builds
+    every level at once, so it is never stopped partway through a level.
 
-    tasks = tasks or ["etl", "heatmap"]
-    results = []
-    if "etl" in tasks:
-        results.append(run_etl_job())
-    if "heatmap" in tasks:
-        results.append(run_heatmap_job(levels=levels, process_date=date))
-    return {"status": "ok", "results": results}
+    Raises:
+        HTTPException: 404 if the job does not exist, 409 if it already finished
+    """
+    _require_api_key(x_api_key)
+    current = await request_cancel(db, job_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current in ("succeeded", "failed"):
+        raise HTTPException(status_code=409, detail=f"Job already {current}")
+    return {"job_id": str(job_id), "status": current, "cancel_requested": True}
@@ -1,11 +1,13 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
+from app.user_scores import get_score_cache
 
 
 router = APIRouter(prefix="/api/v1/analytics", tags=["analytics"])
@@ -65,3 +67,19 @@ async def analytics_summary(
         for r in result
     ]
     return {"from": from_dt.date().isoformat(), "to": to_dt.date().isoformat(), "data": rows}
+
+
+@router.get("/users/{user_id}/churn")
+async def user_churn_score(user_id: UUID, db: AsyncSession = Depends(get_db)):
+    """Returns the user's churn score from the latest batch scoring run.
+
+    Scores come from scripts/churn_scoring.py and are served from an
+    in-process cache that is dropped when a new scoring run is published.
+
+    Raises:
+        HTTPException: 404 if the user has not been scored
+    """
+    score = await get_score_cache().get(db, str(user_id))
+    if score is None:
+        raise HTTPException(status_code=404, detail="No churn score for this user")
+    return {"user_id": str(user_id), **score}
@@ -15,6 +15,8 @@ from app.schemas import EventCreate, EventResponse
 
 from app.jwt import get_current_user
 from app.metrics import inc_events
+from app.live_metrics import live_metrics
+from app.jobs import record_ingest
 
 router = APIRouter(prefix="/api/v1/events", tags=["events"])
 
@@ -87,11 +89,11 @@ async def create_events(
         try:
             db.add_all(valid_events)
             await db.commit()
-            # Refresh to get generated IDs
-            for event in valid_events:
-                await db.refresh(event)
-                inserted_event_ids.append(event.id)
+            # Ids are generated client-side (uuid4 default) at flush; no refresh round trip per event
+            inserted_event_ids = [event.id for event in valid_events]
             inc_events(len(valid_events))
+            live_metrics.record_events(valid_events)
+            record_ingest(len(valid_events))
         except Exception as e:
             await db.rollback()
             raise HTTPException(
@@ -1,23 +1,138 @@
+import os
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-import pandas as pd
-import io
-from app.db import get_db
+from typing import AsyncIterator, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import String, and_, cast, select
+
+from app.db import AsyncSessionLocal
 from app.models import Session
+from scripts.session_features import session_features as features
 
 router = APIRouter(prefix="/api/v1/exports", tags=["exports"])
 
-@router.get("", response_class=Response)
+# Rows per Arrow record batch and Parquet row group
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+
+FEATURE_EXPORT_COLUMNS = (
+    "jump_count",
+    "collision_count",
+    "active_seconds",
+    "jumps_per_second",
+    "score_velocity",
+    "inter_jump_mean",
+    "inter_jump_std",
+    "inter_jump_min",
+    "inter_jump_max",
+)
+
+SESSION_EXPORT_SCHEMA = pa.schema([
+    ("session_id", pa.string()),
+    ("user_id", pa.string()),
+    ("session_start", pa.timestamp("us", tz="UTC")),
+    ("session_end", pa.timestamp("us", tz="UTC")),
+    ("duration_seconds", pa.int64()),
+    ("platform", pa.string()),
+    ("game_version", pa.string()),
+    ("final_score", pa.float64()),
+    # Behavioral features from session_features (scripts/session_features.py); null until the ETL has run
+    *[(name, pa.int64() if name.endswith("_count") else pa.float64()) for name in FEATURE_EXPORT_COLUMNS],
+])
+
+
+class _Drain:
+    """Write-only file for ParquetWriter whose bytes are taken out after every row group."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def record_batch(rows: Sequence[Sequence], schema: pa.Schema = SESSION_EXPORT_SCHEMA) -> pa.RecordBatch:
+    """Column-major Arrow batch of result rows in schema order."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.record_batch(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+    )
+
+
+async def parquet_stream(
+    partitions: AsyncIterator[Sequence[Sequence]], schema: pa.Schema = SESSION_EXPORT_SCHEMA
+) -> AsyncIterator[bytes]:
+    """Parquet file bytes, one row group per partition of rows, yielded as each group is written."""
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for rows in partitions:
+            writer.write_batch(record_batch(rows, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+async def _session_partitions(from_dt: datetime, to_dt: datetime, batch_rows: int) -> AsyncIterator[list]:
+    """Matching sessions from a server-side cursor, `batch_rows` at a time."""
+    stmt = select(
+        cast(Session.id, String),
+        cast(Session.user_id, String),
+        Session.session_start,
+        Session.session_end,
+        Session.duration_seconds,
+        Session.platform,
+        Session.game_version,
+        Session.meta["final_score"].as_float(),
+        *(features.c[name] for name in FEATURE_EXPORT_COLUMNS),
+    ).select_from(
+        Session.__table__.outerjoin(features, features.c.session_id == Session.id)
+    ).where(
+        and_(Session.session_start >= from_dt, Session.session_start <= to_dt)
+    ).execution_options(yield_per=batch_rows)
+    # Own session: the request's get_db session is closed before the body streams
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+
+@router.get("", response_class=StreamingResponse)
 async def export_sessions(
     from_: Optional[str] = Query(None, alias="from", description="Start ISO date (YYYY-MM-DD)"),
     to: Optional[str] = Query(None, description="End ISO date (YYYY-MM-DD)"),
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Export labeled session features as a Parquet file for model training.
+
+    Behavioral features are read from `session_features`, joined on the
+    session id, so no raw events are touched.
+
+    Sessions are read with a server-side cursor and written as one Parquet
+    row group per `EXPORT_BATCH_ROWS` sessions while the response streams,
+    so memory use does not grow with the size of the export.
     """
     try:
         to_dt = datetime.fromisoformat(to) if to else datetime.utcnow()
@@ -25,28 +140,8 @@ async def export_sessions(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid from/to date format. Use YYYY-MM-DD")
 
-    stmt = select(Session).where(
-        and_(Session.session_start >= from_dt, Session.session_start <= to_dt)
+    return StreamingResponse(
+        parquet_stream(_session_partitions(from_dt, to_dt, EXPORT_BATCH_ROWS)),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": "attachment; filename=sessions_export.parquet"},
     )
-    result = await db.execute(stmt)
-    sessions = result.scalars().all()
-
-    # Example feature extraction: id, user_id, session_start, session_end, duration, platform, game_version, final_score
-    rows = []
-    for s in sessions:
-        features = {
-            "session_id": str(s.id),
-            "user_id": str(s.user_id),
-            "session_start": s.session_start,
-            "session_end": s.session_end,
-            "duration_seconds": s.duration_seconds,
-            "platform": s.platform,
-            "game_version": s.game_version,
-            "final_score": (s.meta or {}).get("final_score"),
-        }
-        rows.append(features)
-    df = pd.DataFrame(rows)
-    buf = io.BytesIO()
-    df.to_parquet(buf, index=False)
-    buf.seek(0)
-    return Response(content=buf.read(), media_type="application/octet-stream", headers={"Content-Disposition": "attachment; filename=sessions_export.parquet"})
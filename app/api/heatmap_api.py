@@ -1,32 +1,478 @@
+import base64
+import json
+import os
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import text
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import JSON, text
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from app.db import get_db
+from scripts import heatmap_store
+from scripts.grids import GridSpec, grid_for
+from scripts.heatmap_codec import STORAGE_DTYPE, decode_counts, encode_counts, to_counts
+from scripts.heatmap_cube import DIMENSIONS
+from scripts.tiles import max_zoom, tile_bounds, tiles_for_viewport
 
 
 router = APIRouter(prefix="/api/v1", tags=["heatmap"])
 
+MAX_RANGE_DAYS = int(os.getenv("HEATMAP_MAX_RANGE_DAYS", "366"))
+
+JSON_MEDIA_TYPE = "application/json"
+# JSON body whose matrix is base64 of the zlib-compressed uint32 array
+BASE64_MEDIA_TYPE = "application/vnd.heatmap.base64+json"
+# Raw little-endian uint32 array; metadata in X-Heatmap-* headers
+BINARY_MEDIA_TYPE = "application/octet-stream"
+MEDIA_TYPES = (JSON_MEDIA_TYPE, BASE64_MEDIA_TYPE, BINARY_MEDIA_TYPE)
+
+# Cube dimensions a request can filter or group by (level is always fixed)
+CUBE_FILTERS = tuple(d for d in DIMENSIONS if d not in ("level", "date"))
+
+# Tiles per viewport request; zoom out for wider views
+MAX_TILES = int(os.getenv("HEATMAP_MAX_TILES", "16"))
 
-@router.get("/heatmap")
-async def get_heatmap(level: str = Query(...), date: str = Query(...), db: AsyncSession = Depends(get_db)):
-    """Returns heatmap matrix JSON for a given level and date (YYYY-MM-DD)."""
+
+def _parse_date(value: str, name: str):
     try:
-        target_date = datetime.fromisoformat(date).date()
+        return datetime.fromisoformat(value).date()
     except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        raise HTTPException(status_code=400, detail=f"Invalid {name} format. Use YYYY-MM-DD")
+
+
+def _resolve_dates(date: Optional[str], date_from: Optional[str], date_to: Optional[str]):
+    """(start, end) of a single `date` or an inclusive from/to range."""
+    if date_from or date_to:
+        if not (date_from and date_to):
+            raise HTTPException(status_code=400, detail="Both from and to are required for a date range")
+        start, end = _parse_date(date_from, "from"), _parse_date(date_to, "to")
+        if end < start:
+            raise HTTPException(status_code=400, detail="to is before from")
+        if (end - start).days + 1 > MAX_RANGE_DAYS:
+            raise HTTPException(status_code=400, detail=f"Date range exceeds {MAX_RANGE_DAYS} days")
+        return start, end
+    if date:
+        start = _parse_date(date, "date")
+        return start, start
+    raise HTTPException(status_code=400, detail="Provide date, or from and to")
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+
+def _grid(row) -> Optional[dict]:
+    """The stored grid of a heatmap row (None for data-derived legacy rows)."""
+    if row.x_min is None:
+        return None
+    return {
+        "x_min": row.x_min,
+        "x_max": row.x_max,
+        "y_min": row.y_min,
+        "y_max": row.y_max,
+        "resolution": int(row.grid_size) if row.grid_size else row.matrix_shape[0],
+    }
+
+
+def _grid_spec(row) -> Optional[GridSpec]:
+    grid = _grid(row)
+    return GridSpec.from_dict(grid) if grid else None
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """The preferred supported media type of an Accept header (JSON if absent); None if none is acceptable."""
+    if not accept:
+        return JSON_MEDIA_TYPE
+    best, best_q = None, 0.0
+    for rank, part in enumerate(accept.split(",")):
+        media, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media in ("*/*", "application/*"):
+            media = JSON_MEDIA_TYPE
+        # Ties go to the earlier entry
+        if media in MEDIA_TYPES and q > best_q:
+            best, best_q = media, q
+    return best
+
+
+def _encoded(counts: np.ndarray, media_type: str, stored: Optional[bytes] = None):
+    """A matrix for a JSON body: nested lists, or the base64 envelope of its compressed bytes."""
+    if media_type != BASE64_MEDIA_TYPE:
+        return counts.tolist()
+    data, shape, dtype = (stored, list(counts.shape), STORAGE_DTYPE) if stored else encode_counts(counts)
+    return {
+        "encoding": "base64",
+        "compression": "zlib",
+        "dtype": dtype,
+        "shape": shape,
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+
+def _render(request: Request, body: dict, counts: np.ndarray, stored: Optional[bytes], media_type: str):
+    """Serialize a heatmap response; `stored` is the already compressed matrix when there is one.
+
+    Binary responses are compressed (`Content-Encoding: deflate`) whenever
+    the client accepts it: the stored bytes if given, else `counts` deflated here.
+    """
+    if media_type == BINARY_MEDIA_TYPE:
+        headers = {
+            "Vary": "Accept, Accept-Encoding",
+            "X-Heatmap-Shape": ",".join(str(n) for n in counts.shape),
+            "X-Heatmap-Dtype": STORAGE_DTYPE,
+            "X-Heatmap-Meta": json.dumps(body),
+        }
+        if "deflate" in request.headers.get("accept-encoding", ""):
+            # zlib is the `deflate` coding: stored bytes go out untouched
+            headers["Content-Encoding"] = "deflate"
+            data = stored if stored is not None else encode_counts(counts)[0]
+            return Response(content=data, media_type=BINARY_MEDIA_TYPE, headers=headers)
+        return Response(content=to_counts(counts).tobytes(), media_type=BINARY_MEDIA_TYPE, headers=headers)
+    body["matrix"] = _encoded(counts, media_type, stored)
+    return Response(content=json.dumps(body), media_type=media_type, headers={"Vary": "Accept"})
+
+
+def _store_rows(level: str, days: List, found: Dict) -> None:
+    """Decode the heatmap rows `found` for `days` and put them in the local store (None where missing)."""
+    loaded = {}
+    for day in days:
+        row = found.get(day)
+        loaded[day] = None if row is None else (
+            _grid_spec(row), decode_counts(row.matrix_data, row.matrix_shape, row.matrix_dtype)
+        )
+    heatmap_store.put_days(level, loaded, {day: row.updated_at.isoformat() for day, row in found.items()})
+
+
+@router.get(
+    "/heatmap",
+    response_class=Response,
+    responses={200: {"content": {BASE64_MEDIA_TYPE: {}, BINARY_MEDIA_TYPE: {}}}},
+)
+async def get_heatmap(
+    request: Request,
+    level: str = Query(...),
+    date: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Returns the heatmap matrix for a level on one date, or summed over a date range.
+
+    Args:
+        level: Level identifier
+        date: Single date (YYYY-MM-DD)
+        date_from: First date of a range (query param `from`), inclusive
+        date_to: Last date of a range (query param `to`), inclusive
+
+    Returns:
+        Response: level, date or from/to, grid and matrix of uint32 counts.
+        Matrices are read from the memory-mapped local store
+        (scripts/heatmap_store.py), which revalidates expired days against
+        the heatmaps table and reloads only the changed ones. For a range the matrix is the element-wise sum
+        of the stored daily matrices; days stored on a different grid than
+        the level's current one are listed in `skipped_dates`. The format follows the Accept header:
+        `application/json` (nested lists, the default),
+        `application/vnd.heatmap.base64+json` (base64 of the zlib-compressed
+        array) or `application/octet-stream` (the raw array, compressed with
+        `Content-Encoding: deflate` when the client accepts it; the other
+        fields are in the `X-Heatmap-Meta` header as JSON).
+
+    Raises:
+        HTTPException: 400 for bad dates, 404 if nothing is stored, 406 for
+            an unsupported Accept header, 409 if no stored heatmap is on the
+            level's current grid
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(MEDIA_TYPES)}")
 
-    # Query heatmaps table (created by scripts/heatmap.py)
+    start, end = _resolve_dates(date, date_from, date_to)
+
+    # Expired days are checked against the heatmaps table (scripts/heatmap.py) by
+    # updated_at; only new or changed ones are read and decoded again. Store
+    # calls block on file locks and I/O, so they run in the threadpool.
+    stale = await run_in_threadpool(heatmap_store.stale_days, level, start, end)
+    reload = []
+    if stale:
+        version_sql = text("SELECT date, updated_at FROM heatmaps WHERE level = :level AND date = ANY(:dates)")
+        versions = {
+            row.date: row.updated_at.isoformat()
+            for row in (await db.execute(version_sql, {"level": level, "dates": stale})).all()
+        }
+        reload = await run_in_threadpool(heatmap_store.revalidate, level, stale, versions)
+    if reload:
+        sql = text(
+            """
+            SELECT date, grid_size, x_min, x_max, y_min, y_max, matrix_data, matrix_shape, matrix_dtype, updated_at
+            FROM heatmaps
+            WHERE level = :level AND date = ANY(:dates)
+            """
+        ).columns(matrix_shape=JSON)
+        found = {row.date: row for row in (await db.execute(sql, {"level": level, "dates": reload})).all()}
+        await run_in_threadpool(_store_rows, level, reload, found)
+
+    # One slice-and-sum of the memory-mapped month files; no raw events
+    counts, included, skipped = await run_in_threadpool(heatmap_store.read_range, level, start, end)
+    if not included:
+        if skipped:
+            raise HTTPException(
+                status_code=409, detail="Stored heatmaps are not on the level's current grid; re-run the backfill"
+            )
+        raise HTTPException(status_code=404, detail="Heatmap not found for specified level/date")
+
+    grid = grid_for(level).to_dict()
+    if date and not (date_from or date_to):
+        return _render(request, {"level": level, "date": start.isoformat(), "grid": grid}, counts, None, media_type)
+    body = {
+        "level": level,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "days": len(included),
+        "skipped_dates": sorted(day.isoformat() for day in skipped),
+        "grid": grid,
+    }
+    return _render(request, body, to_counts(counts), None, media_type)
+
+
+@router.get(
+    "/heatmap/tiles",
+    response_class=Response,
+    responses={200: {"content": {BASE64_MEDIA_TYPE: {}}}},
+)
+async def get_heatmap_tiles(
+    request: Request,
+    level: str = Query(...),
+    date: str = Query(...),
+    zoom: int = Query(0, ge=0),
+    x_min: Optional[float] = Query(None),
+    x_max: Optional[float] = Query(None),
+    y_min: Optional[float] = Query(None),
+    y_max: Optional[float] = Query(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Returns the tiles of a level's heatmap pyramid covering a viewport at one zoom.
+
+    Zoom 0 is one tile over the whole world; each zoom doubles the tiles per
+    axis (see scripts/tiles.py). Only tiles with events are returned.
+
+    Args:
+        level: Level identifier
+        date: Date (YYYY-MM-DD)
+        zoom: Pyramid zoom, 0 to HEATMAP_MAX_ZOOM
+        x_min, x_max, y_min, y_max: Viewport in world coordinates (default:
+            the whole grid)
+
+    Returns:
+        Response: level, date, zoom, tile_size, grid, the covered tile ranges
+        and `tiles`, each with x, y, world bounds and a matrix of uint32
+        counts. JSON by default; `application/vnd.heatmap.base64+json`
+        encodes each tile matrix like the heatmap endpoint.
+
+    Raises:
+        HTTPException: 400 for a bad date, zoom or viewport, or one needing
+            more than HEATMAP_MAX_TILES tiles; 404 if no pyramid is stored;
+            406 for an unsupported Accept header
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type not in (JSON_MEDIA_TYPE, BASE64_MEDIA_TYPE):
+        raise HTTPException(status_code=406, detail=f"Supported media types: {JSON_MEDIA_TYPE}, {BASE64_MEDIA_TYPE}")
+    target_date = _parse_date(date, "date")
+    if zoom > max_zoom():
+        raise HTTPException(status_code=400, detail=f"zoom must be between 0 and {max_zoom()}")
+
+    # Any stored tile carries the pyramid's grid; zoom 0 always exists when there are events
+    grid_row = (
+        await db.execute(
+            text(
+                """
+                SELECT x_min, x_max, y_min, y_max, tile_size FROM heatmap_tiles
+                WHERE level = :level AND date = :date AND zoom = 0
+                LIMIT 1
+                """
+            ),
+            {"level": level, "date": target_date},
+        )
+    ).first()
+    if grid_row is None:
+        raise HTTPException(status_code=404, detail="Heatmap tiles not found for specified level/date")
+    grid = GridSpec(grid_row.x_min, grid_row.x_max, grid_row.y_min, grid_row.y_max)
+
+    viewport = (
+        grid.x_min if x_min is None else x_min,
+        grid.x_max if x_max is None else x_max,
+        grid.y_min if y_min is None else y_min,
+        grid.y_max if y_max is None else y_max,
+    )
+    if viewport[1] <= viewport[0] or viewport[3] <= viewport[2]:
+        raise HTTPException(status_code=400, detail="Empty viewport")
+    xs, ys = tiles_for_viewport(grid, zoom, *viewport)
+    if len(xs) * len(ys) > MAX_TILES:
+        raise HTTPException(
+            status_code=400, detail=f"Viewport needs {len(xs) * len(ys)} tiles at zoom {zoom}; max {MAX_TILES}"
+        )
+
+    rows = (
+        await db.execute(
+            text(
+                """
+                SELECT tile_x, tile_y, data FROM heatmap_tiles
+                WHERE level = :level AND date = :date AND zoom = :zoom
+                  AND tile_x BETWEEN :x_first AND :x_last AND tile_y BETWEEN :y_first AND :y_last
+                ORDER BY tile_y, tile_x
+                """
+            ),
+            {
+                "level": level, "date": target_date, "zoom": zoom,
+                "x_first": xs.start, "x_last": xs.stop - 1, "y_first": ys.start, "y_last": ys.stop - 1,
+            },
+        )
+    ).all()
+
+    size = grid_row.tile_size
+    tiles = []
+    for row in rows:
+        tile = {"x": row.tile_x, "y": row.tile_y, "bounds": tile_bounds(grid, zoom, row.tile_x, row.tile_y)}
+        if media_type == BASE64_MEDIA_TYPE:
+            tile["matrix"] = {
+                "encoding": "base64",
+                "compression": "zlib",
+                "dtype": STORAGE_DTYPE,
+                "shape": [size, size],
+                "data": base64.b64encode(row.data).decode("ascii"),
+            }
+        else:
+            tile["matrix"] = decode_counts(row.data, (size, size)).tolist()
+        tiles.append(tile)
+    body = {
+        "level": level,
+        "date": target_date.isoformat(),
+        "zoom": zoom,
+        "tile_size": size,
+        "grid": {"x_min": grid.x_min, "x_max": grid.x_max, "y_min": grid.y_min, "y_max": grid.y_max},
+        "tile_x": [xs.start, xs.stop - 1] if len(xs) else None,
+        "tile_y": [ys.start, ys.stop - 1] if len(ys) else None,
+        "tiles": tiles,
+    }
+    return Response(content=json.dumps(body), media_type=media_type, headers={"Vary": "Accept"})
+
+
+@router.get(
+    "/heatmap/cube",
+    response_class=Response,
+    responses={200: {"content": {BASE64_MEDIA_TYPE: {}, BINARY_MEDIA_TYPE: {}}}},
+)
+async def get_heatmap_cube(
+    request: Request,
+    level: str = Query(...),
+    date: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    platform: Optional[str] = Query(None, description="Comma-separated platforms"),
+    game_version: Optional[str] = Query(None, description="Comma-separated game versions"),
+    event_type: Optional[str] = Query(None, description="Comma-separated event types"),
+    group_by: Optional[str] = Query(None, description="Comma-separated: date, platform, game_version, event_type"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Sums the stored heatmap cube cells matching a filter, optionally grouped.
+
+    Every dimension that is not filtered is summed over, so "collision
+    positions on mobile in v1.2" is
+    `?level=1&from=...&to=...&event_type=collision&platform=mobile&game_version=1.2`.
+    Only precomputed count arrays are read (see scripts/heatmap_cube.py).
+
+    Args:
+        level: Level identifier
+        date: Single date (YYYY-MM-DD)
+        date_from: First date of a range (query param `from`), inclusive
+        date_to: Last date of a range (query param `to`), inclusive
+        platform: Platforms to include (default: all)
+        game_version: Game versions to include (default: all)
+        event_type: Event types to include (default: all)
+        group_by: Dimensions to return one matrix per value combination for
+
+    Returns:
+        Response: the filters, grid, `cells` summed and `matrix`; with
+        `group_by`, `groups` of {dimension values, cells, matrix} instead.
+        Formats follow the Accept header like /heatmap (binary only without
+        `group_by`). Like /heatmap, cells are summed on the level's current
+        grid; cells stored on a different grid are counted in `skipped_cells`.
+
+    Raises:
+        HTTPException: 400 for bad dates or group_by, 404 if no cell matches,
+            406 for an unsupported Accept header, 409 if no matching cell is
+            on the level's current grid
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    groups = _split(group_by)
+    if media_type is None or (groups and media_type == BINARY_MEDIA_TYPE):
+        raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(MEDIA_TYPES)}")
+    unknown = set(groups) - set(CUBE_FILTERS) - {"date"}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot group by {sorted(unknown)}")
+    start, end = _resolve_dates(date, date_from, date_to)
+
+    filters: Dict[str, List[str]] = {
+        name: values
+        for name, values in (
+            ("platform", _split(platform)), ("game_version", _split(game_version)), ("event_type", _split(event_type))
+        )
+        if values
+    }
+    # Dimension names are fixed identifiers; values are bound
+    conditions = "".join(f" AND {name} = ANY(:{name})" for name in filters)
     sql = text(
+        f"""
+        SELECT date, platform, game_version, event_type,
+               grid_size, x_min, x_max, y_min, y_max, matrix_data, matrix_shape, matrix_dtype
+        FROM heatmap_cube
+        WHERE level = :level AND date >= :start AND date <= :end{conditions}
+        ORDER BY date DESC
         """
-        SELECT matrix
-        FROM heatmaps
-        WHERE level = :level AND date = :date
-        """
-    )
-    result = await db.execute(sql, {"level": level, "date": target_date})
-    row = result.first()
-    if not row:
-        raise HTTPException(status_code=404, detail="Heatmap not found for specified level/date")
-    return {"level": level, "date": target_date.isoformat(), "matrix": row.matrix}
+    ).columns(matrix_shape=JSON)
+    rows = (await db.execute(sql, {"level": level, "start": start, "end": end, **filters})).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No heatmap cube cells match the filter")
+
+    grid = grid_for(level)
+    totals: Dict[tuple, np.ndarray] = {}
+    cells: Dict[tuple, int] = {}
+    skipped = 0
+    for row in rows:
+        if _grid_spec(row) != grid:
+            skipped += 1
+            continue
+        group = tuple(row.date.isoformat() if g == "date" else getattr(row, g) for g in groups)
+        matrix = decode_counts(row.matrix_data, row.matrix_shape, row.matrix_dtype).astype(np.uint64)
+        totals[group] = totals[group] + matrix if group in totals else matrix
+        cells[group] = cells.get(group, 0) + 1
+    if not totals:
+        raise HTTPException(
+            status_code=409, detail="Stored cube cells are not on the level's current grid; re-run the backfill"
+        )
+
+    body = {
+        "level": level,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "filters": filters,
+        "grid": grid.to_dict(),
+        "skipped_cells": skipped,
+    }
+    if not groups:
+        body["cells"] = cells[()]
+        return _render(request, body, to_counts(totals[()]), None, media_type)
+    body["group_by"] = groups
+    body["groups"] = [
+        {**dict(zip(groups, group)), "cells": cells[group], "matrix": _encoded(to_counts(totals[group]), media_type)}
+        for group in sorted(totals)
+    ]
+    return Response(content=json.dumps(body), media_type=media_type, headers={"Vary": "Accept"})
@@ -1,19 +1,24 @@
 """
 Leaderboard API endpoints.
 """
+import asyncio
 from typing import List, Optional
 from enum import Enum
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, ConfigDict
 
 from app.db import get_db
 from app.models import Leaderboard, User
+from app.leaderboard_feed import FEEDS, MAX_TOP
 
 router = APIRouter(prefix="/api/v1/leaderboard", tags=["leaderboard"])
 
+# A socket that cannot take a message within this time is dropped
+SEND_TIMEOUT_SECONDS = 5
+
 
 class PeriodFilter(str, Enum):
     """Time period filter for leaderboard."""
@@ -86,3 +91,57 @@ async def get_leaderboard(
         )
     
     return leaderboard_entries
+
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    """Consume client frames until the socket closes."""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+@router.websocket("/ws")
+async def leaderboard_updates(
+    websocket: WebSocket,
+    board: str = "leaderboard",
+    top: int = 10,
+):
+    """
+    Push leaderboard changes to the client.
+
+    The first message is a full snapshot of the top `top` entries; later
+    messages are diffs (`upserts` and `removed` user_ids) sent only when the
+    top N actually changes.
+
+    Args:
+        websocket: Client connection
+        board: "leaderboard" (aggregated sessions) or "scores" (highest submitted scores)
+        top: Number of top entries to track (1-100)
+    """
+    feed = FEEDS.get(board)
+    if feed is None or not 1 <= top <= MAX_TOP:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    receiver = asyncio.create_task(_wait_for_disconnect(websocket))
+    sent_version = None
+    try:
+        while not receiver.done():
+            version = feed.version
+            if version and feed.has_changes(sent_version, top):
+                await asyncio.wait_for(
+                    websocket.send_text(feed.message(sent_version, top)),
+                    timeout=SEND_TIMEOUT_SECONDS,
+                )
+            if version:
+                sent_version = version
+            waiter = asyncio.create_task(feed.wait_for_change(version))
+            await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+    except (WebSocketDisconnect, asyncio.TimeoutError, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
@@ -0,0 +1,66 @@
+"""
+Live metrics API endpoints (Server-Sent Events).
+"""
+import json
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.live_metrics import live_feed, live_metrics
+
+router = APIRouter(prefix="/api/v1/live", tags=["live"])
+
+# Comment line sent when no update arrives, so proxies keep the stream open
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/snapshot")
+async def live_snapshot():
+    """
+    Get the current sliding-window metrics.
+
+    Returns:
+        dict: Events/sec by type, game_overs/min and active sessions for 1m/5m/15m windows
+    """
+    return live_metrics.snapshot()
+
+
+@router.get("/stream")
+async def live_stream(request: Request):
+    """
+    Stream sliding-window metrics as Server-Sent Events.
+
+    Each subscriber holds at most one undelivered update; when a client reads
+    slower than the feed ticks, older updates are replaced by the newest one.
+
+    Raises:
+        HTTPException: 503 if the feed is at its subscriber limit
+    """
+    sub = live_feed.subscribe()
+    if sub is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Live feed is at capacity, try again later"
+        )
+    # Send the current state right away instead of waiting for the next tick
+    initial = live_metrics.snapshot()
+
+    async def event_source():
+        try:
+            yield f"event: metrics\ndata: {json.dumps(initial)}\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                message = await sub.get(timeout=HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: metrics\ndata: {message}\n\n"
+        finally:
+            live_feed.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -16,6 +16,8 @@ from app.models import Session, Event, Leaderboard
 
 from app.schemas import SessionStart, SessionEnd, SessionResponse, SessionSummary
 from app.metrics import inc_sessions
+from app.live_metrics import live_metrics
+from app.leaderboard_feed import leaderboard_feed, notify_score
 from app.jwt import get_current_user
 
 router = APIRouter(prefix="/api/v1/sessions", tags=["sessions"])
@@ -63,6 +65,7 @@ async def start_session(
         )
     
     inc_sessions(1)
+    live_metrics.record_session_start(new_session.id)
     return new_session
 
 
@@ -132,6 +135,7 @@ async def end_session(
     final_score = session_end_data.final_score or 0
     if final_score > 0:
         await _update_leaderboard(db, session.user_id, final_score, end_time)
+        await notify_score(db, leaderboard_feed.name, session.user_id, final_score)
     
     try:
         await db.commit()
@@ -143,6 +147,10 @@ async def end_session(
             detail=f"Failed to update session: {str(e)}"
         )
     
+    live_metrics.record_session_end(session.id)
+    if final_score > 0:
+        leaderboard_feed.offer(session.user_id, final_score)
+    
     # Build summary response
     summary = SessionSummary(
         id=session.id,
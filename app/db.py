@@ -5,9 +5,12 @@ import os
 from typing import AsyncGenerator
 
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
+from app.instrumentation import TimedQueuePool, instrument_engine
+
 # Load environment variables
 load_dotenv()
 
@@ -18,20 +21,30 @@ DATABASE_URL = os.getenv(
 )
 
 
+def listen_dsn(url: str = DATABASE_URL) -> str:
+    """`url` as a plain libpq DSN for asyncpg (without the SQLAlchemy driver suffix).
+
+    Used by the dedicated LISTEN/NOTIFY connections, which bypass the engine.
+    """
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
 class Base(DeclarativeBase):
     """Base class for all database models."""
     pass
 
 
-# Create async engine
+# Create async engine; the pool and cursor hooks feed per-request timings (app/instrumentation.py)
 engine = create_async_engine(
     DATABASE_URL,
     echo=True,  # Set to False in production
     future=True,
+    poolclass=TimedQueuePool,
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20,
 )
+instrument_engine(engine)
 
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -0,0 +1,262 @@
+"""
+Per-request timing of database work, pool waits and response serialization.
+
+`MetricsMiddleware` (app/metrics.py) starts a `RequestTimings` for every
+HTTP request and stores it in a context variable. The pieces below add to it
+from wherever the work happens:
+
+- `instrument_engine` hooks the engine's cursor events to count queries and
+  time each execution;
+- `TimedQueuePool` times how long a checkout waited for a pooled (or new
+  overflow) connection;
+- `instrument_serialization` times FastAPI's `serialize_response`, the
+  `response_model` validation and `jsonable_encoder` pass that turns the
+  endpoint's return value into plain data (usually the larger cost);
+- `TimedJSONResponse`, the app's default response class, times rendering
+  that data to JSON bytes.
+
+SQLAlchemy runs the asyncpg driver in a greenlet that shares the caller's
+context, so the hooks see the request's timings. Work outside a request
+(scheduled jobs, startup) finds no timings and records nothing.
+
+Query tracing (`QUERY_TRACE=1`, for tests and staging) also keeps every
+statement of a request with its duration. At the end of the request,
+statements are grouped by normalized SQL (literals and parameters replaced
+by `?`); one run more than `QUERY_TRACE_MAX_REPEATS` times is logged as a
+likely N+1, and statements slower than `QUERY_TRACE_SLOW_MS` are logged as
+slow. `capture_queries()` turns tracing on for a block and collects the
+traces, so tests can assert a query budget per endpoint:
+
+    with capture_queries() as captured:
+        client.post("/api/v1/events", json=...)
+    captured.assert_budget(max_queries=3, max_repeats=1)
+"""
+import logging
+import os
+import re
+import time
+from functools import wraps
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import fastapi.routing
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    """Accumulated costs of one request; times in seconds.
+
+    `statements` lists (statement, seconds) when the request is traced, else None.
+    """
+
+    __slots__ = ("db_queries", "db_seconds", "pool_wait_seconds", "model_seconds", "serialize_seconds", "statements")
+
+    def __init__(self, trace: bool = False):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.model_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.statements: Optional[List[Tuple[str, float]]] = [] if trace else None
+
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    timings = RequestTimings(trace=tracing_enabled())
+    _timings.set(timings)
+    return timings
+
+
+def end_request() -> None:
+    _timings.set(None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _timings.get()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        timings = _timings.get()
+        if timings is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            timings.pool_wait_seconds += time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _timings.get() is not None and context is not None:
+        context._request_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _timings.get()
+    start = getattr(context, "_request_query_start", None)
+    if timings is not None and start is not None:
+        elapsed = time.perf_counter() - start
+        timings.db_queries += 1
+        timings.db_seconds += elapsed
+        if timings.statements is not None:
+            timings.statements.append((statement, elapsed))
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement `engine` executes (an AsyncEngine or Engine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def instrument_serialization() -> None:
+    """Time FastAPI's response-model pass (`fastapi.routing.serialize_response`) of every route.
+
+    Route handlers look the function up in `fastapi.routing` on each request,
+    so replacing it there covers every app in the process; requests without
+    timings are not affected.
+    """
+    serialize_response = fastapi.routing.serialize_response
+    if getattr(serialize_response, "_timed", False):
+        return
+
+    @wraps(serialize_response)
+    async def timed_serialize_response(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await serialize_response(*args, **kwargs)
+        finally:
+            timings = _timings.get()
+            if timings is not None:
+                timings.model_seconds += time.perf_counter() - start
+
+    timed_serialize_response._timed = True
+    fastapi.routing.serialize_response = timed_serialize_response
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse recording the time spent encoding its body."""
+
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            timings = _timings.get()
+            if timings is not None:
+                timings.serialize_seconds += time.perf_counter() - start
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# $1 (asyncpg), %(name)s / %s (psycopg2), :name (text()), not ::casts
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Statement with literals and parameters as `?` and IN / VALUES lists collapsed to `(?)`."""
+    sql = _STRING.sub("?", statement)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PARAM_LIST.sub("(?)", sql)
+    sql = _ROW_LIST.sub("(?)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class QueryTrace(NamedTuple):
+    """The statements one request executed, as (statement, seconds)."""
+
+    method: str
+    route: str
+    statements: List[Tuple[str, float]]
+
+    def counts(self) -> Dict[str, int]:
+        return dict(Counter(normalize_sql(sql) for sql, _ in self.statements))
+
+    def repeated(self, max_repeats: int) -> Dict[str, int]:
+        """Normalized statements run more than `max_repeats` times (likely N+1)."""
+        return {sql: n for sql, n in self.counts().items() if n > max_repeats}
+
+    def slow(self, threshold_seconds: float) -> List[Tuple[str, float]]:
+        return [(normalize_sql(sql), seconds) for sql, seconds in self.statements if seconds > threshold_seconds]
+
+
+def max_repeats() -> int:
+    return int(os.getenv("QUERY_TRACE_MAX_REPEATS", "5"))
+
+
+def slow_seconds() -> float:
+    return float(os.getenv("QUERY_TRACE_SLOW_MS", "100")) / 1000.0
+
+
+class QueryCapture:
+    """Traces of the requests finished while `capture_queries()` was open."""
+
+    def __init__(self):
+        self.traces: List[QueryTrace] = []
+
+    def assert_budget(
+        self, max_queries: Optional[int] = None, max_repeats: Optional[int] = None, route: Optional[str] = None
+    ) -> None:
+        """Fail if a captured request (of `route`, if given) ran more statements, or repeated one more, than allowed."""
+        traces = [t for t in self.traces if route is None or t.route == route]
+        if not traces:
+            raise AssertionError(f"No requests captured{f' for {route}' if route else ''}")
+        problems = []
+        for trace in traces:
+            if max_queries is not None and len(trace.statements) > max_queries:
+                problems.append(
+                    f"{trace.method} {trace.route}: {len(trace.statements)} queries (budget {max_queries})"
+                )
+            if max_repeats is not None:
+                for sql, n in trace.repeated(max_repeats).items():
+                    problems.append(f"{trace.method} {trace.route}: {n}x {sql} (max {max_repeats})")
+        if problems:
+            raise AssertionError("Query budget exceeded:\n" + "\n".join(problems))
+
+
+_captures: List[QueryCapture] = []
+
+
+def tracing_enabled() -> bool:
+    return bool(_captures) or os.getenv("QUERY_TRACE", "0").lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryCapture]:
+    """Trace every request finished inside the block, in any thread, and collect the traces."""
+    capture = QueryCapture()
+    _captures.append(capture)
+    try:
+        yield capture
+    finally:
+        _captures.remove(capture)
+
+
+def finish_trace(method: str, route: str, timings: RequestTimings) -> Optional[QueryTrace]:
+    """Log N+1 and slow statements of a traced request and hand the trace to open captures."""
+    if timings.statements is None:
+        return None
+    trace = QueryTrace(method, route, timings.statements)
+    for sql, n in trace.repeated(max_repeats()).items():
+        logger.warning(f"Possible N+1 in {method} {route}: {n} executions of {sql}")
+    for sql, seconds in trace.slow(slow_seconds()):
+        logger.warning(f"Slow query in {method} {route}: {seconds * 1000:.1f} ms {sql}")
+    for capture in list(_captures):
+        capture.traces.append(trace)
+    return trace
@@ -0,0 +1,279 @@
+"""
+Admin-submitted job runs tracked in the `job_runs` table.
+
+The API side (`submit_job_run`, `start_job_run`) inserts a queued row and
+returns immediately; the run then executes in the worker pool as the
+`job_run` job (`run_job_run`). The worker claims the row, runs each task with
+a progress callback that writes to the row and checks for cancellation, and
+stores the final status and result.
+
+Identical submissions are deduplicated by a partial unique index on
+`params_hash` over queued/running rows: a second submission gets the id of
+the run already in flight.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import JobRun
+from scripts import runtime
+
+logger = logging.getLogger(__name__)
+
+# Tasks an admin may submit, in execution order
+SUBMITTABLE_TASKS = ("etl", "heatmap")
+ACTIVE_STATUSES = ("queued", "running")
+
+job_runs = JobRun.__table__
+
+
+class JobCancelled(Exception):
+    """Raised by a progress callback to stop a job between units of work."""
+
+
+def normalize_params(
+    tasks: Optional[List[str]], levels: Optional[List[str]], date: Optional[str]
+) -> Tuple[List[str], dict]:
+    """Canonical (tasks, params) for a submission, with defaults resolved.
+
+    Raises:
+        ValueError: Unknown task or malformed date
+    """
+    from app.jobs import _heatmap_levels
+
+    requested = set(tasks or SUBMITTABLE_TASKS)
+    unknown = requested - set(SUBMITTABLE_TASKS)
+    if unknown:
+        raise ValueError(f"Unknown tasks: {sorted(unknown)}")
+    ordered = [t for t in SUBMITTABLE_TASKS if t in requested]
+
+    params = {}
+    if "heatmap" in requested:
+        if date:
+            try:
+                date = datetime.fromisoformat(date).date().isoformat()
+            except ValueError:
+                raise ValueError("Invalid date format. Use YYYY-MM-DD")
+        params["date"] = date or datetime.now(timezone.utc).date().isoformat()
+        params["levels"] = sorted(set(levels)) if levels else _heatmap_levels()
+    return ordered, params
+
+
+def params_hash(tasks: List[str], params: dict) -> str:
+    return hashlib.sha256(json.dumps({"tasks": tasks, **params}, sort_keys=True).encode()).hexdigest()
+
+
+def serialize_job_run(run: JobRun) -> dict:
+    return {
+        "job_id": str(run.id),
+        "tasks": run.tasks,
+        "params": run.params,
+        "status": run.status,
+        "progress": run.progress,
+        "result": run.result,
+        "error": run.error,
+        "cancel_requested": run.cancel_requested,
+        "created_at": run.created_at.isoformat() if run.created_at else None,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+    }
+
+
+async def _expire_abandoned(db: AsyncSession) -> None:
+    """Fail active runs that made no progress for longer than the job timeout.
+
+    Covers runs orphaned by an API restart, which would otherwise block
+    identical submissions forever.
+    """
+    timeout = float(os.getenv("JOB_TIMEOUT_SECONDS", "1800"))
+    await db.execute(
+        update(JobRun)
+        .where(
+            JobRun.status.in_(ACTIVE_STATUSES),
+            JobRun.updated_at < func.now() - timedelta(seconds=timeout),
+        )
+        .values(status="failed", error="abandoned: no progress within job timeout", finished_at=func.now())
+    )
+
+
+async def submit_job_run(
+    db: AsyncSession, tasks: Optional[List[str]], levels: Optional[List[str]], date: Optional[str]
+) -> Tuple[JobRun, bool]:
+    """Insert a queued run, or return the identical run already in flight.
+
+    Returns:
+        (run, deduplicated)
+    """
+    tasks, params = normalize_params(tasks, levels, date)
+    digest = params_hash(tasks, params)
+    await _expire_abandoned(db)
+    await db.commit()
+
+    for _ in range(3):
+        run = JobRun(tasks=tasks, params=params, params_hash=digest, status="queued", progress={})
+        db.add(run)
+        try:
+            await db.commit()
+            return run, False
+        except IntegrityError:
+            await db.rollback()
+        existing = (
+            await db.execute(
+                select(JobRun).where(JobRun.params_hash == digest, JobRun.status.in_(ACTIVE_STATUSES))
+            )
+        ).scalar_one_or_none()
+        if existing is not None:
+            return existing, True
+        # The active run finished between the insert and the lookup; try again
+    raise RuntimeError("Could not submit job run")
+
+
+async def request_cancel(db: AsyncSession, run_id: uuid.UUID) -> Optional[str]:
+    """Cancel a queued run outright or flag a running one; returns the resulting status.
+
+    Returns None if the run does not exist.
+    """
+    cancelled = await db.execute(
+        update(JobRun)
+        .where(JobRun.id == run_id, JobRun.status == "queued")
+        .values(status="cancelled", cancel_requested=True, finished_at=func.now())
+    )
+    if cancelled.rowcount == 0:
+        await db.execute(
+            update(JobRun).where(JobRun.id == run_id, JobRun.status == "running").values(cancel_requested=True)
+        )
+    await db.commit()
+    status = (await db.execute(select(JobRun.status).where(JobRun.id == run_id))).scalar_one_or_none()
+    return status
+
+
+_background: set = set()
+
+
+async def _execute(run_id: uuid.UUID) -> None:
+    from app.db import AsyncSessionLocal
+    from app.jobs import record_job_result
+    from app.worker import get_worker_pool
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, get_worker_pool().run, "job_run", {"run_id": str(run_id)})
+    if result.get("status") == "error":
+        # The worker timed out or died before it could record the outcome
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(JobRun)
+                .where(JobRun.id == run_id, JobRun.status.in_(ACTIVE_STATUSES))
+                .values(status="failed", error=result.get("error"), finished_at=func.now())
+            )
+            await db.commit()
+    for task_result in result.get("results", []):
+        record_job_result(task_result.get("job"), task_result)
+
+
+def start_job_run(run_id: uuid.UUID) -> None:
+    """Execute a submitted run in the worker pool in the background."""
+    task = asyncio.create_task(_execute(run_id))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+class ProgressReporter:
+    """Writes per-task progress to a job_runs row and raises JobCancelled when asked to stop.
+
+    Writes are throttled to one per `min_interval` seconds.
+    """
+
+    def __init__(self, engine, run_id: uuid.UUID, min_interval: float = 1.0):
+        self.engine = engine
+        self.run_id = run_id
+        self.min_interval = min_interval
+        self.progress: dict = {}
+        self._last_write = 0.0
+
+    def for_task(self, task: str) -> Callable[[dict], None]:
+        return lambda values: self.update(task, values)
+
+    def update(self, task: str, values: dict) -> None:
+        self.progress[task] = values
+        now = time.monotonic()
+        if now - self._last_write < self.min_interval:
+            return
+        self._last_write = now
+        with self.engine.begin() as conn:
+            cancel = conn.execute(
+                update(job_runs)
+                .where(job_runs.c.id == self.run_id)
+                .values(progress=self.progress, updated_at=func.now())
+                .returning(job_runs.c.cancel_requested)
+            ).scalar()
+        if cancel:
+            raise JobCancelled()
+
+
+def _task_kwargs(task: str, params: dict) -> dict:
+    if task == "heatmap":
+        return {"levels": params.get("levels"), "process_date": params.get("date")}
+    return {}
+
+
+def run_job_run(run_id: str) -> dict:
+    """Worker side: claim a queued run, execute its tasks and record the outcome."""
+    from app.jobs import JOB_REGISTRY
+
+    engine = runtime.get_engine()
+    key = uuid.UUID(run_id)
+    with engine.begin() as conn:
+        claimed = conn.execute(
+            update(job_runs)
+            .where(job_runs.c.id == key, job_runs.c.status == "queued")
+            .values(status="running", started_at=func.now(), updated_at=func.now())
+            .returning(job_runs.c.tasks, job_runs.c.params)
+        ).first()
+    if claimed is None:
+        # Cancelled (or expired) while waiting for a worker
+        return {"status": "cancelled", "job": "job_run", "run_id": run_id, "results": []}
+
+    reporter = ProgressReporter(engine, key)
+    results, error = [], None
+    try:
+        for task in claimed.tasks:
+            result = JOB_REGISTRY[task](progress=reporter.for_task(task), **_task_kwargs(task, claimed.params))
+            results.append(result)
+            if result.get("status") != "ok":
+                error = result.get("error")
+                break
+    except Exception as e:
+        error = str(e)
+
+    statuses = {r.get("status") for r in results}
+    if "cancelled" in statuses:
+        status = "cancelled"
+    elif error is not None or "error" in statuses:
+        status = "failed"
+    else:
+        status = "succeeded"
+    with engine.begin() as conn:
+        conn.execute(
+            update(job_runs)
+            .where(job_runs.c.id == key)
+            .values(
+                status=status,
+                progress=reporter.progress,
+                result={"results": results},
+                error=error,
+                finished_at=func.now(),
+                updated_at=func.now(),
+            )
+        )
+    logger.info(f"Job run {run_id} {status}")
+    return {"status": status, "job": "job_run", "run_id": run_id, "results": results}
@@ -1,14 +1,27 @@
+import asyncio
+import logging
 import os
-from datetime import datetime, timezone
-from typing import List
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
 
+import asyncpg
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
+from app.db import listen_dsn
+from app.job_runs import JobCancelled, run_job_run
+from app.metrics import JOB_TRIGGER_DECISIONS, JOB_TRIGGER_PENDING
+
 # Import script modules (ensure scripts is a package)
+from scripts import churn_scoring
 from scripts import etl_aggregate
+from scripts import event_lake
 from scripts import heatmap as heatmap_mod
-from sqlalchemy import MetaData
+from scripts import heatmap_accumulate
+from scripts import tiles
+
+logger = logging.getLogger(__name__)
 
 
 def _heatmap_levels() -> List[str]:
@@ -16,51 +29,428 @@ def _heatmap_levels() -> List[str]:
     return [lvl.strip() for lvl in levels.split(",") if lvl.strip()]
 
 
-def run_etl_job():
-    """Run the ETL aggregation script (append-only)."""
+def run_etl_job(progress: Optional[Callable[[dict], None]] = None):
+    """Run the incremental ETL aggregation (events past the stored watermark)."""
     try:
-        etl_aggregate.main()
-        return {"status": "ok", "job": "etl"}
+        stats = etl_aggregate.main(progress=progress)
+        return {"status": "ok", "job": "etl", **stats}
+    except JobCancelled:
+        return {"status": "cancelled", "job": "etl"}
     except Exception as e:
         return {"status": "error", "job": "etl", "error": str(e)}
 
 
-def run_heatmap_job(levels: List[str] | None = None, process_date: str | None = None):
-    """Compute and store heatmaps for given levels on a date (YYYY-MM-DD)."""
+def run_heatmap_job(
+    levels: List[str] | None = None,
+    process_date: str | None = None,
+    progress: Optional[Callable[[dict], None]] = None,
+):
+    """Update the stored heatmaps of the given levels.
+
+    Without `process_date` (the scheduled run) only events new since the last
+    run are added, plus a re-scan of the late-arrival tail (see
+    scripts/heatmap_accumulate.py). With a date (YYYY-MM-DD) that day is
+    recomputed from all of its events.
+
+    `progress` is called once the events are binned and again once written.
+    """
+    results = []
+    try:
+        if levels is None:
+            levels = _heatmap_levels()
+        # Pooled engine and reflected table are cached for the life of the worker
+        engine = heatmap_mod.get_engine()
+        if not process_date:
+            stats = heatmap_accumulate.accumulate(engine, levels, progress=progress)
+            return {"status": "ok", "job": "heatmap", "mode": "incremental", **stats}
+
+        target_date = datetime.fromisoformat(process_date).date()
+        # One scan of the day's position events builds every level
+        if progress is not None:
+            progress({"levels_done": [], "levels_total": len(levels)})
+        matrices, seen = heatmap_accumulate.recompute_heatmaps(engine, levels, target_date)
+        for lvl in matrices:
+            results.append(
+                {"level": lvl, "date": target_date.isoformat(), "events": seen[lvl], "sum": float(matrices[lvl].sum())}
+            )
+        if progress is not None:
+            progress({"levels_done": list(matrices), "levels_total": len(levels), "events": sum(seen.values())})
+        return {"status": "ok", "job": "heatmap", "mode": "recompute", "results": results}
+    except JobCancelled:
+        return {"status": "cancelled", "job": "heatmap", "results": results}
+    except Exception as e:
+        return {"status": "error", "job": "heatmap", "error": str(e)}
+
+
+def run_tiles_job(
+    levels: List[str] | None = None,
+    process_date: str | None = None,
+    progress: Optional[Callable[[dict], None]] = None,
+):
+    """Rebuild the heatmap tile pyramids of a date (YYYY-MM-DD).
+
+    Without a date, today is rebuilt, and yesterday too during the first
+    interval after midnight so its last events make it into its pyramid.
+    """
     try:
         if levels is None:
             levels = _heatmap_levels()
+        engine = heatmap_mod.get_engine()
+        now = datetime.now(timezone.utc)
         if process_date:
-            target_date = datetime.fromisoformat(process_date).date()
+            dates = [datetime.fromisoformat(process_date).date()]
         else:
-            target_date = datetime.now(timezone.utc).date()
+            dates = [now.date()]
+            interval = timedelta(minutes=int(os.getenv("HEATMAP_TILES_INTERVAL_MINUTES", "60")))
+            if now - datetime.combine(now.date(), datetime.min.time(), tzinfo=timezone.utc) < interval:
+                dates.insert(0, now.date() - timedelta(days=1))
+        results = []
+        for target_date in dates:
+            written = tiles.build_tile_pyramids(engine, levels, target_date)
+            results.append({"date": target_date.isoformat(), "tiles": written})
+            if progress is not None:
+                progress({"dates_done": len(results), "dates_total": len(dates)})
+        return {"status": "ok", "job": "heatmap_tiles", "results": results}
+    except JobCancelled:
+        return {"status": "cancelled", "job": "heatmap_tiles"}
+    except Exception as e:
+        return {"status": "error", "job": "heatmap_tiles", "error": str(e)}
 
-        engine = heatmap_mod.get_engine()
-        meta = MetaData()
+
+def run_event_lake_job(progress: Optional[Callable[[dict], None]] = None):
+    """Append events past the lake's watermark to the Parquet event lake (scripts/event_lake.py)."""
+    try:
+        stats = event_lake.export_events(heatmap_mod.get_engine(), progress=progress)
+        return {"status": "ok", "job": "event_lake", **stats}
+    except JobCancelled:
+        return {"status": "cancelled", "job": "event_lake"}
+    except Exception as e:
+        return {"status": "error", "job": "event_lake", "error": str(e)}
+
+
+def run_churn_scoring_job(progress: Optional[Callable[[dict], None]] = None):
+    """Score every user with the churn model and publish a new score version (scripts/churn_scoring.py)."""
+    try:
+        stats = churn_scoring.score_users(heatmap_mod.get_engine(), churn_scoring.load_model(), progress=progress)
+        return {"status": "ok", "job": "churn_scoring", **stats}
+    except JobCancelled:
+        return {"status": "cancelled", "job": "churn_scoring"}
+    except Exception as e:
+        return {"status": "error", "job": "churn_scoring", "error": str(e)}
+
+
+# Jobs that can be scheduled or submitted; worker processes resolve names here
+JOB_REGISTRY: Dict[str, Callable[..., dict]] = {
+    "etl": run_etl_job,
+    "heatmap": run_heatmap_job,
+    "heatmap_tiles": run_tiles_job,
+    "event_lake": run_event_lake_job,
+    "churn_scoring": run_churn_scoring_job,
+    # Admin-submitted runs (see app/job_runs.py)
+    "job_run": run_job_run,
+}
+
+# Last result per job in this process, reported by /health
+JOB_STATUS: Dict[str, dict] = {}
+
+
+def record_job_result(job_name: str, result: dict) -> None:
+    JOB_STATUS[job_name] = {
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "status": result.get("status"),
+        "result": result,
+    }
+
+
+async def dispatch_job(job_name: str, **kwargs) -> Optional[dict]:
+    """Run a scheduled job in the worker pool without blocking the event loop.
+
+    Every replica schedules the jobs, but only the elected leader runs them, so
+    each job runs once per interval across the cluster. Returns None when this
+    process is not the leader.
+    """
+    from app.leader import job_leader
+    from app.worker import get_worker_pool
+
+    if not job_leader.is_leader:
+        logger.debug(f"Skipping {job_name}: {job_leader.node_id} is not the job leader")
+        return None
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, get_worker_pool().run, job_name, kwargs)
+    record_job_result(job_name, result)
+    return result
+
+
+class IngestTrigger:
+    """Runs a job once enough events have been ingested or the oldest one has waited too long.
+
+    Decisions, checked every few seconds:
+    - "volume": at least `event_threshold` events ingested since the last run
+    - "staleness": some events pending for longer than `max_staleness_seconds`
+    - "idle_timeout": no run for `max_idle_seconds`, a fixed-interval fallback
+      for counts that never arrived (a relay that was disconnected)
+    - "no_work", "running", "not_leader": skipped
+
+    Counts come from the ingest path in this process (`record_ingest`) and
+    from every other process through `IngestRelay`, so the leader sees all
+    ingest and deciding costs no database queries.
+    """
+
+    def __init__(self, job_name: str, event_threshold: int, max_staleness_seconds: float, max_idle_seconds: float):
+        self.job_name = job_name
+        self.event_threshold = event_threshold
+        self.max_staleness_seconds = max_staleness_seconds
+        self.max_idle_seconds = max_idle_seconds
+        self.pending = 0
+        self.oldest_pending: Optional[float] = None
+        self.last_run = time.monotonic()
+        self.running = False
+        self.decisions: Dict[str, int] = {}
+
+    def record(self, count: int) -> None:
+        if count <= 0:
+            return
+        if self.pending == 0:
+            self.oldest_pending = time.monotonic()
+        self.pending += count
+        self._publish_pending()
+
+    def _publish_pending(self) -> None:
+        JOB_TRIGGER_PENDING.labels(self.job_name).set(self.pending)
+
+    def decide(self, now: Optional[float] = None) -> str:
+        now = time.monotonic() if now is None else now
+        if self.running:
+            return "running"
+        if self.pending >= self.event_threshold:
+            return "volume"
+        if self.oldest_pending is not None and now - self.oldest_pending >= self.max_staleness_seconds:
+            return "staleness"
+        if now - self.last_run >= self.max_idle_seconds:
+            return "idle_timeout"
+        return "no_work"
+
+    async def check(self, dispatch: Callable, leader=None) -> None:
+        """Scheduler hook: decide and, if due, start the job without waiting for it.
+
+        `leader` is the process's `LeaderElector` (app/leader.py) unless given.
+        """
+        if leader is None:
+            from app.leader import job_leader as leader
+
+        decision = self.decide()
+        if decision in ("volume", "staleness", "idle_timeout") and not leader.is_leader:
+            # The leader processes these events; don't let the count grow here
+            decision = "not_leader"
+            self._take()
+        self.decisions[decision] = self.decisions.get(decision, 0) + 1
+        JOB_TRIGGER_DECISIONS.labels(self.job_name, decision).inc()
+        if decision in ("volume", "staleness", "idle_timeout"):
+            self.running = True
+            task = asyncio.create_task(self._run(dispatch, decision))
+            _trigger_tasks.add(task)
+            task.add_done_callback(_trigger_tasks.discard)
+
+    def _take(self) -> Tuple[int, Optional[float]]:
+        taken = (self.pending, self.oldest_pending)
+        self.pending, self.oldest_pending = 0, None
+        self.last_run = time.monotonic()
+        self._publish_pending()
+        return taken
+
+    async def _run(self, dispatch: Callable, decision: str) -> None:
+        pending, oldest = self._take()
+        logger.info(f"Triggering {self.job_name} ({decision}, {pending} pending events)")
+        try:
+            result = await dispatch(self.job_name)
+            if result is not None and result.get("status") != "ok":
+                # Retry soon: put the events back (the job's watermark makes this safe)
+                self.pending += pending
+                if oldest is not None:
+                    self.oldest_pending = min(oldest, self.oldest_pending or oldest)
+                self._publish_pending()
+        finally:
+            self.running = False
+
+    def status(self) -> dict:
+        return {
+            "pending_events": self.pending,
+            "oldest_pending_seconds": (
+                round(time.monotonic() - self.oldest_pending, 1) if self.oldest_pending is not None else None
+            ),
+            "decisions": dict(self.decisions),
+        }
+
+
+_trigger_tasks: set = set()
+
+# Data-driven triggers by job name; enabled for the ETL unless ETL_TRIGGER_EVENTS=0
+INGEST_TRIGGERS: Dict[str, IngestTrigger] = {}
+if int(os.getenv("ETL_TRIGGER_EVENTS", "5000")) > 0:
+    INGEST_TRIGGERS["etl"] = IngestTrigger(
+        "etl",
+        event_threshold=int(os.getenv("ETL_TRIGGER_EVENTS", "5000")),
+        max_staleness_seconds=float(os.getenv("ETL_MAX_STALENESS_MINUTES", "5")) * 60,
+        # Never staler than the fixed interval it replaces
+        max_idle_seconds=float(os.getenv("ETL_MAX_IDLE_MINUTES", os.getenv("ETL_INTERVAL_MINUTES", "15"))) * 60,
+    )
+
+# Postgres channel carrying each process's ingest counts to every other one
+INGEST_CHANNEL = "ingest_counts"
+
+
+class IngestRelay:
+    """Shares ingest counts between processes over Postgres LISTEN/NOTIFY.
+
+    Each process queues the counts it ingests and NOTIFYs their sum at most
+    once per `flush_seconds` on a dedicated connection. The same connection
+    LISTENs and adds the counts of every other process (API workers, replicas,
+    `python -m app.worker`) to this process's triggers; its own notifications
+    are skipped since `record_ingest` already counted them. Counts sent while
+    a relay is disconnected are lost, which the triggers' idle fallback covers.
+    """
+
+    def __init__(
+        self,
+        triggers: Optional[Dict[str, IngestTrigger]] = None,
+        dsn: Optional[str] = None,
+        flush_seconds: float = 1.0,
+        retry_seconds: float = 5.0,
+        connect=asyncpg.connect,
+    ):
+        self.triggers = INGEST_TRIGGERS if triggers is None else triggers
+        self.dsn = dsn
+        self.flush_seconds = flush_seconds
+        self.retry_seconds = retry_seconds
+        self.unpublished = 0
+        self._connect = connect
+        self._server_pid: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def queue(self, count: int) -> None:
+        if self.triggers and count > 0:
+            self.unpublished += count
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        if pid == self._server_pid:
+            return
         try:
-            meta.reflect(bind=engine, only=["heatmaps"])  # if exists
+            count = int(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed {INGEST_CHANNEL} notification: {payload!r}")
+            return
+        for trigger in self.triggers.values():
+            trigger.record(count)
+
+    async def flush(self, conn) -> None:
+        count, self.unpublished = self.unpublished, 0
+        if not count:
+            return
+        try:
+            await conn.execute("SELECT pg_notify($1, $2)", INGEST_CHANNEL, str(count))
         except Exception:
-            pass
-        table = heatmap_mod.ensure_table(meta, engine)
+            self.unpublished += count
+            raise
 
-        results = []
-        for lvl in levels:
-            df = heatmap_mod.fetch_events(engine, lvl, target_date)
-            matrix = heatmap_mod.compute_heatmap(df)
-            heatmap_mod.write_heatmap(engine, table, lvl, target_date, matrix)
-            results.append({"level": lvl, "date": target_date.isoformat(), "sum": float(matrix.sum())})
-        return {"status": "ok", "job": "heatmap", "results": results}
-    except Exception as e:
-        return {"status": "error", "job": "heatmap", "error": str(e)}
+    async def _relay_once(self) -> None:
+        conn = await self._connect(self.dsn or listen_dsn())
+        closed = asyncio.Event()
+        conn.add_termination_listener(lambda _: closed.set())
+        try:
+            self._server_pid = conn.get_server_pid()
+            await conn.add_listener(INGEST_CHANNEL, self._on_notification)
+            while not closed.is_set():
+                await self.flush(conn)
+                try:
+                    await asyncio.wait_for(closed.wait(), self.flush_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._server_pid = None
+            await conn.close()
 
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._relay_once()
+            except Exception as e:
+                logger.warning(f"Ingest relay disconnected: {e}")
+            await asyncio.sleep(self.retry_seconds)
 
-def create_scheduler() -> AsyncIOScheduler:
-    scheduler = AsyncIOScheduler()
+    def start(self) -> None:
+        if not self.triggers:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+ingest_relay = IngestRelay()
 
+
+def record_ingest(count: int) -> None:
+    """Called by the ingest path after events are committed."""
+    for trigger in INGEST_TRIGGERS.values():
+        trigger.record(count)
+    ingest_relay.queue(count)
+
+
+def add_scheduled_jobs(scheduler, dispatch: Callable) -> None:
+    """Register the periodic jobs on `scheduler`, each calling `dispatch(job_name)`.
+
+    Jobs with an ingest trigger are checked every ETL_TRIGGER_CHECK_SECONDS
+    instead of running on a fixed interval.
+    """
     # Intervals configurable via env (minutes)
     etl_minutes = int(os.getenv("ETL_INTERVAL_MINUTES", "15"))
     heatmap_minutes = int(os.getenv("HEATMAP_INTERVAL_MINUTES", "30"))
+    tiles_minutes = int(os.getenv("HEATMAP_TILES_INTERVAL_MINUTES", "60"))
+    lake_minutes = int(os.getenv("EVENT_LAKE_INTERVAL_MINUTES", "60"))
+    scoring_minutes = int(os.getenv("CHURN_SCORING_INTERVAL_MINUTES", "360"))
+    check_seconds = int(os.getenv("ETL_TRIGGER_CHECK_SECONDS", "10"))
+
+    if "etl" in INGEST_TRIGGERS:
+        scheduler.add_job(
+            INGEST_TRIGGERS["etl"].check, IntervalTrigger(seconds=check_seconds), args=[dispatch],
+            id="etl-trigger", max_instances=1, coalesce=True
+        )
+    else:
+        scheduler.add_job(
+            dispatch, IntervalTrigger(minutes=etl_minutes), args=["etl"], id="etl-job", max_instances=1, coalesce=True
+        )
+    scheduler.add_job(
+        dispatch, IntervalTrigger(minutes=heatmap_minutes), args=["heatmap"], id="heatmap-job",
+        max_instances=1, coalesce=True
+    )
+    scheduler.add_job(
+        dispatch, IntervalTrigger(minutes=tiles_minutes), args=["heatmap_tiles"], id="heatmap-tiles-job",
+        max_instances=1, coalesce=True
+    )
+    scheduler.add_job(
+        dispatch, IntervalTrigger(minutes=lake_minutes), args=["event_lake"], id="event-lake-job",
+        max_instances=1, coalesce=True
+    )
+    scheduler.add_job(
+        dispatch, IntervalTrigger(minutes=scoring_minutes), args=["churn_scoring"], id="churn-scoring-job",
+        max_instances=1, coalesce=True
+    )
 
-    scheduler.add_job(run_etl_job, IntervalTrigger(minutes=etl_minutes), id="etl-job", max_instances=1, coalesce=True)
-    scheduler.add_job(run_heatmap_job, IntervalTrigger(minutes=heatmap_minutes), id="heatmap-job", max_instances=1, coalesce=True)
+
+def create_scheduler() -> AsyncIOScheduler:
+    """Scheduler for the API process; jobs execute in the worker pool, never on the event loop.
+
+    With JOB_RUNNER=external no jobs are registered here and `python -m app.worker`
+    runs them instead.
+    """
+    scheduler = AsyncIOScheduler()
+    if os.getenv("JOB_RUNNER", "pool") != "external":
+        add_scheduled_jobs(scheduler, dispatch_job)
     return scheduler
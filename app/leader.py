@@ -0,0 +1,165 @@
+"""
+Cluster-wide leader election for scheduled jobs.
+
+Every API worker and replica runs a scheduler, but only the process holding
+a Postgres session-level advisory lock actually dispatches jobs. The lock is
+taken with `pg_try_advisory_lock` on a dedicated connection and kept for as
+long as that connection lives:
+
+- Renewal: the leader re-checks on every interval that its session still
+  holds the lock; any error drops leadership and closes the connection.
+- Failover: followers retry the lock on the same interval. When a leader
+  dies, Postgres ends its session (TCP keepalives bound how long that takes)
+  and releases the lock, and the next follower to try becomes leader.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary application-wide advisory lock key for the job scheduler
+DEFAULT_LOCK_KEY = 7254_0001
+
+
+class LeaderElector:
+    """Acquires and renews an advisory-lock lease on a dedicated connection."""
+
+    def __init__(self, lock_key: int, renew_seconds: float = 10.0, enabled: bool = True):
+        self.lock_key = lock_key
+        self.renew_seconds = renew_seconds
+        self.enabled = enabled
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = not enabled
+        self.leader_since: Optional[datetime] = None
+        self.last_renewed: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._engine = None
+        self._conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_engine(self):
+        if self._engine is None:
+            self._engine = create_async_engine(
+                DATABASE_URL,
+                poolclass=NullPool,
+                # Let Postgres notice a dead leader quickly and release its lock
+                connect_args={"server_settings": {
+                    "tcp_keepalives_idle": "10",
+                    "tcp_keepalives_interval": "5",
+                    "tcp_keepalives_count": "3",
+                }},
+            )
+        return self._engine
+
+    async def _close_conn(self) -> None:
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _try_acquire(self) -> None:
+        self._conn = await self._get_engine().connect()
+        acquired = (
+            await self._conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key})
+        ).scalar()
+        # Keep the session open but not inside a transaction
+        await self._conn.commit()
+        if acquired:
+            now = datetime.now(timezone.utc)
+            self.is_leader = True
+            self.leader_since = self.last_renewed = now
+            logger.info(f"Job leader acquired by {self.node_id}")
+        else:
+            await self._close_conn()
+
+    async def _renew(self) -> None:
+        held = (
+            await self._conn.execute(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_locks "
+                    "WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted)"
+                )
+            )
+        ).scalar()
+        await self._conn.commit()
+        if not held:
+            raise RuntimeError("advisory lock no longer held")
+        self.last_renewed = datetime.now(timezone.utc)
+
+    def _step_down(self, reason: str) -> None:
+        if self.is_leader:
+            logger.warning(f"Job leader {self.node_id} stepping down: {reason}")
+        self.is_leader = False
+        self.leader_since = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.is_leader:
+                    await asyncio.wait_for(self._renew(), timeout=self.renew_seconds)
+                else:
+                    await asyncio.wait_for(self._try_acquire(), timeout=self.renew_seconds)
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                self._step_down(str(e))
+                await self._close_conn()
+            await asyncio.sleep(self.renew_seconds)
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop renewing and release the lock so a follower can take over immediately."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None and self.is_leader:
+            try:
+                await self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key})
+                await self._conn.commit()
+            except Exception:
+                pass
+        if self.enabled:
+            self._step_down("shutdown")
+        await self._close_conn()
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "node_id": self.node_id,
+            "is_leader": self.is_leader,
+            "leader_since": self.leader_since.isoformat() if self.leader_since else None,
+            "last_renewed": self.last_renewed.isoformat() if self.last_renewed else None,
+            "last_error": self.last_error,
+        }
+
+
+job_leader = LeaderElector(
+    lock_key=int(os.getenv("JOB_LEADER_LOCK_KEY", str(DEFAULT_LOCK_KEY))),
+    renew_seconds=float(os.getenv("JOB_LEADER_RENEW_SECONDS", "10")),
+    enabled=os.getenv("JOB_LEADER_ELECTION", "true").lower() == "true",
+)
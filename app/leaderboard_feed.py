@@ -0,0 +1,284 @@
+"""
+Push-based leaderboard updates for WebSocket subscribers.
+
+Score writes call `notify_score()` inside their transaction, which queues a
+Postgres NOTIFY delivered to every worker's `ScoreListener` when the write
+commits, and `offer()` on the local feed right after the commit. If the
+score could affect the cached top N, the feed is marked dirty; a tick loop
+reloads the top N at most once per tick, bumps the version only when the
+ranking actually changed and wakes the subscribers. Each socket is served by its own task that sends the
+diff from the version it last received to the latest one, so a slow socket
+only delays itself and bursts collapse into a single message.
+
+Notifications sent while a listener is disconnected are lost, so the
+listener marks every feed dirty whenever it (re)connects.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+from sqlalchemy import select, text
+
+from app.db import AsyncSessionLocal, listen_dsn
+from app.models import Leaderboard, User
+
+# Largest N a subscriber may ask for; the feed always tracks this many rows
+MAX_TOP = 100
+# How many past snapshots are kept to compute diffs for lagging subscribers
+HISTORY = 8
+# Postgres channel carrying committed scores to every worker
+CHANNEL = "leaderboard_updates"
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[int], Awaitable[List[dict]]]
+
+
+def diff_entries(old: List[dict], new: List[dict], top: int) -> Tuple[List[dict], List[str]]:
+    """Entries of `new[:top]` that differ from `old[:top]`, and user_ids that left the top."""
+    old_by_user = {e["user_id"]: e for e in old[:top]}
+    new_top = new[:top]
+    upserts = [e for e in new_top if old_by_user.get(e["user_id"]) != e]
+    new_ids = {e["user_id"] for e in new_top}
+    removed = [user_id for user_id in old_by_user if user_id not in new_ids]
+    return upserts, removed
+
+
+class LeaderboardFeed:
+    """Tracks the top `MAX_TOP` rows of one leaderboard and notifies subscribers on change."""
+
+    def __init__(self, name: str, loader: Loader, score_field: str, tick_seconds: float = 1.0):
+        self.name = name
+        self.score_field = score_field
+        self.tick_seconds = tick_seconds
+        self._loader = loader
+        self._entries: List[dict] = []
+        self._user_ids: set = set()
+        self.version = 0
+        self._history: Dict[int, List[dict]] = {0: []}
+        self._messages: Dict[Tuple[int, int, int], str] = {}
+        self._dirty = True
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def offer(self, user_id, score: int) -> None:
+        """Mark the feed dirty if a committed score may change the top N."""
+        if (
+            len(self._entries) < MAX_TOP
+            or str(user_id) in self._user_ids
+            or score >= self._entries[-1][self.score_field]
+        ):
+            self._dirty = True
+
+    def invalidate(self) -> None:
+        """Reload on the next tick regardless of the cached rows."""
+        self._dirty = True
+
+    async def refresh(self) -> bool:
+        """Reload the top rows if dirty; returns True when a new version was published."""
+        if not self._dirty:
+            return False
+        self._dirty = False
+        entries = await self._loader(MAX_TOP)
+        # The first load is always published, even empty, so subscribers get a snapshot
+        if entries == self._entries and self.version:
+            return False
+        self._entries = entries
+        self._user_ids = {e["user_id"] for e in entries}
+        self.version += 1
+        self._history[self.version] = entries
+        self._history.pop(self.version - HISTORY, None)
+        self._messages.clear()
+        # Wake everyone waiting on the previous version
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return True
+
+    def message(self, since: Optional[int], top: int) -> str:
+        """Encoded update from version `since` to the current one, shared across subscribers."""
+        key = (since if since is not None else -1, self.version, top)
+        cached = self._messages.get(key)
+        if cached is not None:
+            return cached
+        old = self._history.get(since) if since is not None else None
+        if old is None:
+            payload = {
+                "type": "snapshot",
+                "board": self.name,
+                "version": self.version,
+                "entries": self._entries[:top],
+            }
+        else:
+            upserts, removed = diff_entries(old, self._entries, top)
+            payload = {
+                "type": "diff",
+                "board": self.name,
+                "version": self.version,
+                "upserts": upserts,
+                "removed": removed,
+            }
+        encoded = self._messages[key] = json.dumps(payload)
+        return encoded
+
+    async def wait_for_change(self, since: int) -> None:
+        """Return once the feed version differs from `since`."""
+        while self.version == since:
+            await self._changed.wait()
+
+    def has_changes(self, since: Optional[int], top: int) -> bool:
+        if since is None:
+            return True
+        if since == self.version:
+            return False
+        old = self._history.get(since)
+        if old is None:
+            return True
+        upserts, removed = diff_entries(old, self._entries, top)
+        return bool(upserts or removed)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                # Keep the feed alive across transient DB errors; retry next tick
+                self._dirty = True
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def load_leaderboard(limit: int) -> List[dict]:
+    """Top rows of the aggregated `leaderboard` table, shaped like the REST response."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Leaderboard, User.username)
+            .join(User, Leaderboard.user_id == User.id)
+            .order_by(Leaderboard.best_score.desc())
+            .limit(limit)
+        )
+        return [
+            {
+                "rank": rank,
+                "user_id": str(entry.user_id),
+                "username": username,
+                "best_score": entry.best_score,
+                "games_played": entry.games_played,
+                "avg_score": float(entry.avg_score),
+                "total_score": entry.total_score,
+            }
+            for rank, (entry, username) in enumerate(result.all(), start=1)
+        ]
+
+
+async def load_high_scores(limit: int) -> List[dict]:
+    """Top users by `highest_score`, as served by `/api/v1/scores/leaderboard`."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.id, User.username, User.highest_score)
+            .order_by(User.highest_score.desc())
+            .limit(limit)
+        )
+        return [
+            {
+                "rank": rank,
+                "user_id": str(user_id),
+                "username": username,
+                "highest_score": highest_score,
+            }
+            for rank, (user_id, username, highest_score) in enumerate(result.all(), start=1)
+        ]
+
+
+_tick = float(os.getenv("LEADERBOARD_TICK_SECONDS", "1"))
+leaderboard_feed = LeaderboardFeed("leaderboard", load_leaderboard, "best_score", tick_seconds=_tick)
+scores_feed = LeaderboardFeed("scores", load_high_scores, "highest_score", tick_seconds=_tick)
+
+FEEDS = {feed.name: feed for feed in (leaderboard_feed, scores_feed)}
+
+
+async def notify_score(db, board: str, user_id, score: int) -> None:
+    """Queue a NOTIFY for `board`; Postgres delivers it to every listener when `db` commits."""
+    payload = json.dumps({"board": board, "user_id": str(user_id), "score": score})
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+def handle_notification(payload: str) -> bool:
+    """Offer a notified score to its feed; returns False for a malformed payload or unknown board."""
+    try:
+        message = json.loads(payload)
+        feed = FEEDS.get(message["board"])
+        if feed is None:
+            return False
+        feed.offer(message["user_id"], int(message["score"]))
+    except (ValueError, KeyError, TypeError):
+        logger.warning(f"Ignoring malformed {CHANNEL} notification: {payload!r}")
+        return False
+    return True
+
+
+class ScoreListener:
+    """LISTENs on `CHANNEL` over a dedicated connection and offers each score to its feed.
+
+    The connection is reopened after `retry_seconds` when it drops; every
+    (re)connect marks all feeds dirty to cover notifications missed meanwhile.
+    """
+
+    def __init__(self, dsn: Optional[str] = None, retry_seconds: float = 5.0, connect=asyncpg.connect):
+        self.dsn = dsn
+        self.retry_seconds = retry_seconds
+        self._connect = connect
+        self._task: Optional[asyncio.Task] = None
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        handle_notification(payload)
+
+    async def _listen_once(self) -> None:
+        conn = await self._connect(self.dsn or listen_dsn())
+        closed = asyncio.Event()
+        conn.add_termination_listener(lambda _: closed.set())
+        try:
+            await conn.add_listener(CHANNEL, self._on_notification)
+            for feed in FEEDS.values():
+                feed.invalidate()
+            await closed.wait()
+        finally:
+            await conn.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen_once()
+            except Exception as e:
+                logger.warning(f"Leaderboard listener disconnected: {e}")
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+score_listener = ScoreListener()
@@ -0,0 +1,215 @@
+"""
+In-process sliding-window metrics for the live dashboard feed.
+
+The ingestion endpoints record events and session lifecycle changes here as
+they happen. Counts are kept in per-second ring buffers covering the largest
+window (15 minutes), so snapshots are computed from memory and never touch
+the database. Each API worker process keeps its own engine; a subscriber sees
+the traffic handled by the worker it is connected to.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+
+import numpy as np
+
+# Window name -> length in seconds
+WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+HORIZON_SECONDS = max(WINDOWS.values())
+
+# Sessions with no activity for this long are no longer counted as active
+SESSION_IDLE_SECONDS = int(os.getenv("LIVE_SESSION_IDLE_SECONDS", "900"))
+# event_type is client-supplied; types beyond this many are counted under OTHER_EVENT_TYPE
+MAX_EVENT_TYPES = int(os.getenv("LIVE_MAX_EVENT_TYPES", "50"))
+OTHER_EVENT_TYPE = "other"
+
+
+class RingCounter:
+    """Per-second counts over a fixed horizon, stored in a ring of buckets."""
+
+    def __init__(self, horizon: int = HORIZON_SECONDS):
+        self.horizon = horizon
+        self._counts = np.zeros(horizon, dtype=np.int64)
+        # Absolute second each slot currently holds; -1 means never written
+        self._seconds = np.full(horizon, -1, dtype=np.int64)
+
+    def add(self, second: int, n: int = 1) -> None:
+        idx = second % self.horizon
+        if self._seconds[idx] != second:
+            self._seconds[idx] = second
+            self._counts[idx] = 0
+        self._counts[idx] += n
+
+    def last_second(self) -> int:
+        """Most recent second written, or -1 if the counter is empty."""
+        return int(self._seconds.max())
+
+    def total(self, now_second: int, window: int) -> int:
+        """Sum of counts in the `window` seconds ending at `now_second` (inclusive)."""
+        mask = (self._seconds > now_second - window) & (self._seconds <= now_second)
+        return int(self._counts[mask].sum())
+
+
+class LiveMetrics:
+    """Sliding-window counters for events by type, game overs and active sessions."""
+
+    def __init__(self, horizon: int = HORIZON_SECONDS, clock=time.time, max_event_types: int = MAX_EVENT_TYPES):
+        self._horizon = horizon
+        self._max_event_types = max_event_types
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._events_by_type: Dict[str, RingCounter] = {}
+        self._game_overs = RingCounter(horizon)
+        # session_id -> last second the session was seen
+        self._active_sessions: Dict[str, int] = {}
+
+    def _now(self) -> int:
+        return int(self._clock())
+
+    def record_events(self, events: Iterable) -> None:
+        """Record a batch of ingested events (objects with event_type/event_name/session_id)."""
+        now = self._now()
+        with self._lock:
+            for event in events:
+                self._event_counter(event.event_type).add(now)
+                if event.event_name == "game_over":
+                    self._game_overs.add(now)
+                if event.session_id is not None:
+                    # Sessions started on another worker become visible through their events
+                    if event.event_name == "session_end":
+                        self._active_sessions.pop(str(event.session_id), None)
+                    else:
+                        self._active_sessions[str(event.session_id)] = now
+
+    def _event_counter(self, event_type: str) -> RingCounter:
+        counter = self._events_by_type.get(event_type)
+        if counter is None:
+            if len(self._events_by_type) >= self._max_event_types:
+                event_type = OTHER_EVENT_TYPE
+                counter = self._events_by_type.get(event_type)
+            if counter is None:
+                counter = self._events_by_type[event_type] = RingCounter(self._horizon)
+        return counter
+
+    def record_session_start(self, session_id) -> None:
+        with self._lock:
+            self._active_sessions[str(session_id)] = self._now()
+
+    def record_session_end(self, session_id) -> None:
+        with self._lock:
+            self._active_sessions.pop(str(session_id), None)
+
+    def snapshot(self) -> dict:
+        """Current rates for every window plus the active session count."""
+        now = self._now()
+        with self._lock:
+            idle_cutoff = now - SESSION_IDLE_SECONDS
+            for key in [k for k, seen in self._active_sessions.items() if seen <= idle_cutoff]:
+                del self._active_sessions[key]
+            # Types with nothing left in the horizon would only ever report zero
+            horizon_cutoff = now - self._horizon
+            for key in [k for k, c in self._events_by_type.items() if c.last_second() <= horizon_cutoff]:
+                del self._events_by_type[key]
+
+            windows = {}
+            for name, seconds in WINDOWS.items():
+                windows[name] = {
+                    "events_per_sec": {
+                        event_type: round(counter.total(now, seconds) / seconds, 3)
+                        for event_type, counter in self._events_by_type.items()
+                    },
+                    "game_overs_per_min": round(self._game_overs.total(now, seconds) * 60 / seconds, 3),
+                }
+            return {
+                "ts": now,
+                "active_sessions": len(self._active_sessions),
+                "windows": windows,
+            }
+
+
+class Subscriber:
+    """A single feed consumer holding at most one pending (latest) message."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.dropped = 0
+
+    def offer(self, message: str) -> None:
+        """Queue `message`, replacing any undelivered one so slow readers never fall behind."""
+        if self._queue.full():
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self._queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LiveFeed:
+    """Periodically snapshots `LiveMetrics` and fans the result out to subscribers."""
+
+    def __init__(self, metrics: LiveMetrics, tick_seconds: float = 1.0, max_subscribers: int = 1000):
+        self.metrics = metrics
+        self.tick_seconds = tick_seconds
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """Register a new subscriber, or return None when the feed is at capacity."""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        sub = Subscriber()
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+
+    def publish(self) -> None:
+        """Encode one snapshot and hand it to every subscriber without awaiting any of them."""
+        if not self._subscribers:
+            return
+        message = json.dumps(self.metrics.snapshot())
+        for sub in list(self._subscribers):
+            sub.offer(message)
+
+    async def _run(self) -> None:
+        while True:
+            self.publish()
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Process-wide instances used by the ingestion endpoints and the live API
+live_metrics = LiveMetrics()
+live_feed = LiveFeed(
+    live_metrics,
+    tick_seconds=float(os.getenv("LIVE_TICK_SECONDS", "1")),
+    max_subscribers=int(os.getenv("LIVE_MAX_SUBSCRIBERS", "1000")),
+)
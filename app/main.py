@@ -15,13 +15,19 @@ from app.api.leaderboard import router as leaderboard_router
 from app.api.analytics import router as analytics_router
 from app.api.heatmap_api import router as heatmap_router
 from app.api.admin import router as admin_router
+from app.api.live import router as live_router
 
-from app.jobs import create_scheduler
+from app.jobs import create_scheduler, ingest_relay, JOB_STATUS
+from app.worker import get_worker_pool
+from app.leader import job_leader
+from app.live_metrics import live_feed
+from app.leaderboard_feed import FEEDS as leaderboard_feeds, score_listener
 
 from app.routes.auth import router as auth_router
 from app.routes.scores import router as scores_router
 
-from app.metrics import router as metrics_router
+from app.instrumentation import TimedJSONResponse, instrument_serialization
+from app.metrics import MetricsMiddleware, mark_process_dead, router as metrics_router
 from app.api.exports import router as exports_router
 
 
@@ -42,6 +48,15 @@ async def lifespan(app: FastAPI):
     scheduler = create_scheduler()
     scheduler.start()
     app.state.scheduler = scheduler
+    if scheduler.get_jobs():
+        # With JOB_RUNNER=external the standalone workers compete for leadership instead
+        job_leader.start()
+    # Publishes this worker's ingest counts even when another process runs the jobs
+    ingest_relay.start()
+    live_feed.start()
+    for feed in leaderboard_feeds.values():
+        feed.start()
+    score_listener.start()
     
     yield
     
@@ -51,17 +66,29 @@ async def lifespan(app: FastAPI):
         scheduler = getattr(app.state, "scheduler", None)
         if scheduler:
             scheduler.shutdown(wait=False)
+        get_worker_pool().shutdown()
     except Exception:
         pass
+    await ingest_relay.stop()
+    await job_leader.stop()
+    await live_feed.stop()
+    await score_listener.stop()
+    for feed in leaderboard_feeds.values():
+        await feed.stop()
+    mark_process_dead()
     logger.info("Cleanup completed successfully")
 
 
+# Time response-model validation separately from JSON rendering (app/instrumentation.py)
+instrument_serialization()
+
 # Initialize FastAPI application
 app = FastAPI(
     title="Game Analytics API",
     description="Real-time game analytics platform for tracking player behavior and game metrics",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=TimedJSONResponse,
 )
 
 # Configure CORS
@@ -71,7 +98,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Metadata of binary heatmap responses (app/api/heatmap_api.py)
+    expose_headers=["X-Heatmap-Shape", "X-Heatmap-Dtype", "X-Heatmap-Meta"],
 )
+# Per-route latency, DB, pool and serialization histograms (app/metrics.py)
+app.add_middleware(MetricsMiddleware)
 
 # Include API routers
 
@@ -86,6 +117,7 @@ app.include_router(leaderboard_router)
 app.include_router(analytics_router)
 app.include_router(heatmap_router)
 app.include_router(admin_router)
+app.include_router(live_router)
 
 
 @app.get("/")
@@ -113,7 +145,9 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "game-analytics",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "jobs": JOB_STATUS,
+        "leader": job_leader.status(),
     }
 
 
@@ -1,23 +1,177 @@
-from fastapi import APIRouter
-from fastapi.responses import PlainTextResponse
-import logging
+"""
+Prometheus metrics for the API, aggregated across worker processes.
+
+With `PROMETHEUS_MULTIPROC_DIR` set (needed whenever uvicorn runs more than
+one worker), prometheus_client keeps every process's values in mmap files in
+that directory and `/metrics` sums them, so a scrape of any worker reports
+the whole server. The directory must be emptied before the server starts.
+Without it the values live in process memory, which is right for a single
+worker.
+
+Incrementing is a lock and a write to the mapped value; nothing is logged
+on the ingest path.
+
+Every request also records its database query count and time, pool
+checkout wait, response-model validation and encoding time, and JSON
+rendering time (app/instrumentation.py), by route template. With `SERVER_TIMING_HEADER=1` the same numbers are sent in a
+`Server-Timing` response header for browser dev tools.
+"""
+import os
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from app.instrumentation import end_request, finish_trace, start_request
 
 router = APIRouter()
 
-# In-memory counters (for demo; use Redis/DB for production)
-events_received_total = 0
-sessions_created_total = 0
+EVENTS_RECEIVED = Counter("events_received", "Events inserted by the ingest API")
+SESSIONS_CREATED = Counter("sessions_created", "Sessions started")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database statements executed per request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time per request spent executing database statements",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+REQUEST_POOL_WAIT_SECONDS = Histogram(
+    "http_request_pool_wait_seconds",
+    "Time per request spent waiting for a database connection",
+    ["method", "route"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+REQUEST_MODEL_SECONDS = Histogram(
+    "http_request_response_model_seconds",
+    "Time per request spent validating and encoding the response model",
+    ["method", "route"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+REQUEST_SERIALIZE_SECONDS = Histogram(
+    "http_request_serialize_seconds",
+    "Time per request spent encoding the JSON response",
+    ["method", "route"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being handled", ["method"], multiprocess_mode="livesum"
+)
+
+# Ingest-driven job triggers (app/jobs.py)
+JOB_TRIGGER_PENDING = Gauge(
+    "job_trigger_pending_events", "Events ingested since the job last ran", ["job"], multiprocess_mode="livesum"
+)
+JOB_TRIGGER_DECISIONS = Counter("job_trigger_decisions", "Ingest trigger decisions", ["job", "decision"])
+
+
+def multiprocess_dir():
+    return os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+
+def server_timing_enabled() -> bool:
+    return os.getenv("SERVER_TIMING_HEADER", "0").lower() in ("1", "true", "yes")
+
+
+def server_timing(timings, total_seconds: float) -> str:
+    """`Server-Timing` header value for a request's timings."""
+    return ", ".join([
+        f'db;dur={timings.db_seconds * 1000:.2f};desc="{timings.db_queries} queries"',
+        f"pool;dur={timings.pool_wait_seconds * 1000:.2f}",
+        f"model;dur={timings.model_seconds * 1000:.2f}",
+        f"serialize;dur={timings.serialize_seconds * 1000:.2f}",
+        f"app;dur={total_seconds * 1000:.2f}",
+    ])
+
 
 def inc_events(n=1):
-    global events_received_total
-    events_received_total += n
-    logging.getLogger("metrics").info(f"events_received_total incremented by {n}")
+    EVENTS_RECEIVED.inc(n)
+
 
 def inc_sessions(n=1):
-    global sessions_created_total
-    sessions_created_total += n
-    logging.getLogger("metrics").info(f"sessions_created_total incremented by {n}")
+    SESSIONS_CREATED.inc(n)
+
+
+def mark_process_dead(pid=None):
+    """Drop this worker's live gauges from the shared files; call on shutdown."""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(os.getpid() if pid is None else pid)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by method, route template and status,
+    plus the request's database, pool, response-model and serialization timings.
+
+    The route template (`/api/v1/sessions/{session_id}`) rather than the path
+    keeps the label set bounded; requests no route matched are "unmatched".
+    """
+
+    def __init__(self, app, server_timing_header: Optional[bool] = None):
+        self.app = app
+        self.server_timing_header = server_timing_enabled() if server_timing_header is None else server_timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+        timings = start_request()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing_header:
+                    # Streamed bodies are still being produced; their header covers the work so far
+                    header = server_timing(timings, time.perf_counter() - start).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            end_request()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(time.perf_counter() - start)
+            REQUEST_DB_QUERIES.labels(method, route).observe(timings.db_queries)
+            REQUEST_DB_SECONDS.labels(method, route).observe(timings.db_seconds)
+            REQUEST_POOL_WAIT_SECONDS.labels(method, route).observe(timings.pool_wait_seconds)
+            REQUEST_MODEL_SECONDS.labels(method, route).observe(timings.model_seconds)
+            REQUEST_SERIALIZE_SECONDS.labels(method, route).observe(timings.serialize_seconds)
+            finish_trace(method, route, timings)
+
 
-@router.get("/metrics", response_class=PlainTextResponse)
+@router.get("/metrics")
 def metrics():
-    return f"events_received_total {events_received_total}\nsessions_created_total {sessions_created_total}\n"
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -5,7 +5,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Text, Integer, ForeignKey, JSON
+from sqlalchemy import String, Text, Integer, Boolean, ForeignKey, JSON, Index, text
 from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -209,3 +209,52 @@ class Leaderboard(Base):
 
     def __repr__(self) -> str:
         return f"<Leaderboard(user_id={self.user_id}, best_score={self.best_score}, games={self.games_played})>"
+
+
+class JobRun(Base):
+    """
+    Admin-submitted job run with its parameters, progress and result.
+    """
+    __tablename__ = "job_runs"
+    __table_args__ = (
+        # At most one active run per parameter set; identical submissions join it
+        Index(
+            "ix_job_runs_active_params_hash",
+            "params_hash",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4
+    )
+    tasks: Mapped[list] = mapped_column(JSON, nullable=False)
+    params: Mapped[dict] = mapped_column(JSON, nullable=False)
+    params_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    # queued -> running -> succeeded | failed | cancelled
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued", index=True)
+    progress: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    result: Mapped[Optional[dict]] = mapped_column(JSON)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True))
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<JobRun(id={self.id}, tasks={self.tasks}, status={self.status})>"
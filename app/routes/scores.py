@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_db
 from app.models import User
 from app.jwt import get_current_user
+from app.leaderboard_feed import notify_score, scores_feed
 
 router = APIRouter(prefix="/scores", tags=["scores"])
 
@@ -53,10 +54,13 @@ async def submit_score(
     if score_data.score > current_user.highest_score:
         current_user.highest_score = score_data.score
         new_record = True
+        # Other workers' feeds hear about the score once the update commits
+        await notify_score(db, scores_feed.name, current_user.id, score_data.score)
         
         # Commit the update to database
         await db.commit()
         await db.refresh(current_user)
+        scores_feed.offer(current_user.id, current_user.highest_score)
     
     return ScoreResponse(
         highest_score=current_user.highest_score,
@@ -0,0 +1,80 @@
+"""
+In-process cache of per-user churn scores.
+
+Scores are written in batches by scripts/churn_scoring.py, each run under a
+new `score_version` recorded in `user_score_runs`. The cache keeps up to
+`USER_SCORES_CACHE_SIZE` users' scores (least recently used evicted) and
+checks the latest version at most every `USER_SCORES_VERSION_CHECK_SECONDS`.
+When the version changes, every cached score is dropped, so a new scoring
+run is visible within that interval and score reads between checks never
+touch the database.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import text
+
+LATEST_VERSION_SQL = text("SELECT score_version FROM user_score_runs ORDER BY finished_at DESC LIMIT 1")
+USER_SCORE_SQL = text(
+    """
+    SELECT churn_score, model_version, score_version, scored_at
+    FROM user_scores
+    WHERE user_id = CAST(:user_id AS uuid)
+    """
+)
+
+
+class UserScoreCache:
+    """Scores by user id, invalidated as a whole when the scoring version changes."""
+
+    def __init__(self, max_size: int = 100_000, check_seconds: float = 30.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.check_seconds = check_seconds
+        self.version: Optional[str] = None
+        self._clock = clock
+        self._checked_at: Optional[float] = None
+        self._scores: "OrderedDict[str, Optional[dict]]" = OrderedDict()
+
+    async def _check_version(self, db) -> None:
+        now = self._clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+            return
+        version = (await db.execute(LATEST_VERSION_SQL)).scalar()
+        self._checked_at = now
+        if version != self.version:
+            self.version = version
+            self._scores.clear()
+
+    async def get(self, db, user_id: str) -> Optional[dict]:
+        """The user's latest score ({churn_score, model_version, score_version, scored_at}), or None."""
+        await self._check_version(db)
+        if user_id in self._scores:
+            self._scores.move_to_end(user_id)
+            return self._scores[user_id]
+        row = (await db.execute(USER_SCORE_SQL, {"user_id": user_id})).first()
+        score = None if row is None else {
+            "churn_score": row.churn_score,
+            "model_version": row.model_version,
+            "score_version": row.score_version,
+            "scored_at": row.scored_at.isoformat() if row.scored_at else None,
+        }
+        # Unscored users are cached too, until the next version
+        self._scores[user_id] = score
+        if len(self._scores) > self.max_size:
+            self._scores.popitem(last=False)
+        return score
+
+
+_cache: Optional[UserScoreCache] = None
+
+
+def get_score_cache() -> UserScoreCache:
+    global _cache
+    if _cache is None:
+        _cache = UserScoreCache(
+            max_size=int(os.getenv("USER_SCORES_CACHE_SIZE", "100000")),
+            check_seconds=float(os.getenv("USER_SCORES_VERSION_CHECK_SECONDS", "30")),
+        )
+    return _cache
@@ -0,0 +1,218 @@
+"""
+Job execution outside the API process.
+
+`WorkerPool` keeps a few long-lived worker processes (spawned, not forked)
+that run jobs from `app.jobs.JOB_REGISTRY`. Each job gets a wall-clock
+timeout and each worker an address-space limit; a worker that times out or
+dies is replaced, and workers are recycled after a number of jobs. Callers
+block in `run()`, so the API calls it through `run_in_executor` and its event
+loop only waits on a pipe.
+
+Run `python -m app.worker` to execute the scheduled jobs in a separate
+process instead of the API (set `JOB_RUNNER=external` on the API).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _limit_memory(memory_limit_mb: int) -> None:
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _worker_main(conn, memory_limit_mb: int) -> None:
+    """Worker loop: receive (job_name, kwargs), run it, send the result back."""
+    _limit_memory(memory_limit_mb)
+    from app.jobs import JOB_REGISTRY
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        name, kwargs = message
+        try:
+            result = JOB_REGISTRY[name](**kwargs)
+        except MemoryError:
+            result = {"status": "error", "job": name, "error": "memory limit exceeded"}
+        except Exception as e:
+            result = {"status": "error", "job": name, "error": str(e)}
+        conn.send(result)
+
+
+class _Worker:
+    def __init__(self, ctx, memory_limit_mb: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_limit_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_run = 0
+
+    def stop(self, timeout: float = 5) -> None:
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Fixed-size pool of job worker processes with per-job timeout and memory limit."""
+
+    def __init__(
+        self,
+        size: int = 2,
+        timeout_seconds: float = 1800,
+        memory_limit_mb: int = 2048,
+        max_jobs_per_worker: int = 50,
+    ):
+        self.size = size
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[Optional[_Worker]]" = queue.Queue()
+        self._workers: set = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if not self._started:
+                # Slots are filled lazily so an idle API never spawns workers
+                for _ in range(self.size):
+                    self._idle.put(None)
+                self._started = True
+
+    def run(self, job_name: str, kwargs: Optional[dict] = None, timeout: Optional[float] = None) -> dict:
+        """Run a registered job in a worker and return its result dict (blocking)."""
+        self._ensure_started()
+        timeout = timeout or self.timeout_seconds
+        worker = self._idle.get()
+        if worker is None or not worker.process.is_alive():
+            self._workers.discard(worker)
+            worker = _Worker(self._ctx, self.memory_limit_mb)
+            self._workers.add(worker)
+
+        started = time.monotonic()
+        try:
+            worker.conn.send((job_name, kwargs or {}))
+            if not worker.conn.poll(timeout):
+                logger.warning(f"Job {job_name} exceeded {timeout:g}s timeout; killing worker")
+                self._retire(worker, kill=True)
+                worker = None
+                return {"status": "error", "job": job_name, "error": f"timed out after {timeout:g}s"}
+            result = worker.conn.recv()
+        except (EOFError, BrokenPipeError, OSError):
+            # The worker died mid-job, typically from the memory limit
+            worker.process.join(1)
+            exitcode = worker.process.exitcode
+            self._retire(worker, kill=True)
+            worker = None
+            return {"status": "error", "job": job_name, "error": f"worker exited (code {exitcode})"}
+        finally:
+            if worker is not None:
+                worker.jobs_run += 1
+                if worker.jobs_run >= self.max_jobs_per_worker:
+                    self._retire(worker)
+                    worker = None
+            self._idle.put(worker)
+
+        result.setdefault("duration_seconds", round(time.monotonic() - started, 3))
+        return result
+
+    def _retire(self, worker: _Worker, kill: bool = False) -> None:
+        self._workers.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def shutdown(self) -> None:
+        """Stop all workers; a job still running is killed after a short grace period."""
+        with self._lock:
+            for worker in list(self._workers):
+                worker.stop(timeout=1)
+            self._workers.clear()
+
+
+_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool() -> WorkerPool:
+    """Process-wide pool configured from JOB_* environment variables."""
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool(
+            size=int(os.getenv("JOB_WORKERS", "2")),
+            timeout_seconds=float(os.getenv("JOB_TIMEOUT_SECONDS", "1800")),
+            memory_limit_mb=int(os.getenv("JOB_MEMORY_LIMIT_MB", "2048")),
+            max_jobs_per_worker=int(os.getenv("JOB_MAX_JOBS_PER_WORKER", "50")),
+        )
+    return _pool
+
+
+async def _serve() -> None:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    from app.jobs import add_scheduled_jobs, dispatch_job, ingest_relay
+    from app.leader import job_leader
+
+    scheduler = AsyncIOScheduler()
+    add_scheduled_jobs(scheduler, dispatch_job)
+    job_leader.start()
+    # Ingest happens in the API processes; their counts arrive over the relay
+    ingest_relay.start()
+    scheduler.start()
+    logger.info(f"Job worker {job_leader.node_id} started")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        scheduler.shutdown(wait=False)
+        await ingest_relay.stop()
+        await job_leader.stop()
+
+
+def main():
+    """Standalone scheduler: run the registered jobs on their intervals in this process's pool.
+
+    Several of these can run at once; only the elected leader dispatches jobs.
+    """
+    from app.logging_config import setup_structured_logging
+
+    setup_structured_logging()
+    try:
+        asyncio.run(_serve())
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        get_worker_pool().shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import { subscribeLeaderboard } from '../services/api';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
@@ -12,6 +13,9 @@ const Leaderboard = ({ currentUsername, limit = 10 }) => {
     fetchLeaderboard();
   }, [limit]);
 
+  // Keep the table current from server pushes instead of re-fetching
+  useEffect(() => subscribeLeaderboard('scores', limit, setLeaderboard), [limit]);
+
   const fetchLeaderboard = async () => {
     setLoading(true);
     setError('');
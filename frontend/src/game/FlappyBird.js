@@ -146,7 +146,11 @@ export class FlappyBirdGame {
       this.bird.velocity = this.bird.jump;
       this.onEvent('jump', 'player_jump', {
         bird_y: this.bird.y,
-        bird_velocity: this.bird.velocity
+        bird_velocity: this.bird.velocity,
+        // x, y and level place the event in the heatmap cube
+        x: Math.round(this.bird.x),
+        y: Math.round(this.bird.y),
+        level: '1'
       });
     } else if (this.gameOver) {
       this.restart();
@@ -283,7 +287,10 @@ export class FlappyBirdGame {
     this.onEvent('collision', 'game_over', {
       final_score: this.score,
       high_score: this.highScore,
-      pipes_passed: this.score
+      pipes_passed: this.score,
+      x: Math.round(this.bird.x),
+      y: Math.round(this.bird.y),
+      level: '1'
     });
   }
   
@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useRef, useState } from 'react';
-import { getLeaderboard, getSummary, getHeatmap } from '../services/api';
+import { getLeaderboard, getSummary, getHeatmap, subscribeLiveMetrics, subscribeLeaderboard } from '../services/api';
 import { Line, Bar } from 'react-chartjs-2';
 import {
   Chart as ChartJS,
@@ -30,6 +30,7 @@ export default function Dashboard({ currentUser }) {
   const [level, setLevel] = useState('1');
   const [date, setDate] = useState(new Date().toISOString().slice(0, 10));
   const [heatmap, setHeatmap] = useState(null);
+  const [live, setLive] = useState(null);
   const [loadingSummary, setLoadingSummary] = useState(true);
   const [loadingLeaderboard, setLoadingLeaderboard] = useState(true);
   const [loadingHeatmap, setLoadingHeatmap] = useState(true);
@@ -70,6 +71,12 @@ export default function Dashboard({ currentUser }) {
     loadInitialData();
   }, []);
 
+  // Live metrics are pushed by the server; no polling
+  useEffect(() => subscribeLiveMetrics(setLive), []);
+
+  // Leaderboard changes are pushed as diffs after the initial load
+  useEffect(() => subscribeLeaderboard('leaderboard', 10, setLeaderboard), []);
+
   // Load heatmap when level or date changes
   useEffect(() => {
     const loadHeatmap = async () => {
@@ -196,6 +203,38 @@ export default function Dashboard({ currentUser }) {
         <p style={styles.subtitle}>Real-time game analytics and player insights</p>
       </div>
 
+      {/* Live Metrics Section */}
+      <section style={styles.section}>
+        <h2 style={styles.sectionTitle}>⚡ Live Activity</h2>
+        {live ? (
+          <div style={styles.tableWrapper}>
+            <table style={styles.table}>
+              <thead>
+                <tr style={styles.headerRow}>
+                  <th style={styles.th}>Window</th>
+                  <th style={styles.th}>Events/sec</th>
+                  <th style={styles.th}>Game Overs/min</th>
+                </tr>
+              </thead>
+              <tbody>
+                {Object.entries(live.windows).map(([name, w], idx) => (
+                  <tr key={name} style={{...styles.row, ...(idx % 2 === 0 ? styles.rowEven : {})}}>
+                    <td style={styles.td}>{name}</td>
+                    <td style={styles.td}>
+                      {Object.values(w.events_per_sec).reduce((a, b) => a + b, 0).toFixed(2)}
+                    </td>
+                    <td style={styles.td}>{w.game_overs_per_min.toFixed(2)}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+            <p style={styles.legendText}>Active sessions: {live.active_sessions}</p>
+          </div>
+        ) : (
+          <div style={styles.loadingState}>Connecting to live feed...</div>
+        )}
+      </section>
+
       {/* Summary Chart Section */}
       <section style={styles.section}>
         <h2 style={styles.sectionTitle}>📈 Average Score Over Time</h2>
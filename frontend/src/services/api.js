@@ -16,12 +16,55 @@ export const getSummary = async ({ user_id, from, to } = {}) => {
   return res.data;
 };
 
-export const getHeatmap = async ({ level, date }) => {
-  const res = await axios.get(`${API_BASE}/api/v1/heatmap`, { 
-    params: { level, date },
-    headers: getAuthHeaders()
+export const getHeatmap = async ({ level, date, from, to }) => {
+  // Either a single date, or from/to for the sum over a date range
+  const params = from && to ? { level, from, to } : { level, date };
+  // Fetch the raw uint32 array (deflate-compressed on the wire) instead of nested JSON
+  const res = await axios.get(`${API_BASE}/api/v1/heatmap`, {
+    params,
+    headers: { ...getAuthHeaders(), Accept: 'application/octet-stream' },
+    responseType: 'arraybuffer'
   });
-  return res.data;
+  const [rows, cols] = res.headers['x-heatmap-shape'].split(',').map(Number);
+  const counts = new Uint32Array(res.data);
+  const matrix = [];
+  for (let y = 0; y < rows; y++) {
+    matrix.push(Array.from(counts.subarray(y * cols, (y + 1) * cols)));
+  }
+  return { ...JSON.parse(res.headers['x-heatmap-meta']), matrix };
+};
+
+/**
+ * Subscribe to live sliding-window metrics (Server-Sent Events)
+ * Returns a function that closes the stream
+ */
+export const subscribeLiveMetrics = (onMetrics) => {
+  const source = new EventSource(`${API_BASE}/api/v1/live/stream`);
+  source.addEventListener('metrics', (e) => onMetrics(JSON.parse(e.data)));
+  return () => source.close();
+};
+
+/**
+ * Subscribe to pushed leaderboard updates over WebSocket
+ * board: 'leaderboard' (aggregated sessions) or 'scores' (highest scores)
+ * Calls onEntries with the full ranked list after every snapshot/diff
+ * Returns a function that closes the socket
+ */
+export const subscribeLeaderboard = (board, top, onEntries) => {
+  const wsBase = API_BASE.replace(/^http/, 'ws');
+  const socket = new WebSocket(`${wsBase}/api/v1/leaderboard/ws?board=${board}&top=${top}`);
+  let entries = new Map();
+  socket.onmessage = (e) => {
+    const msg = JSON.parse(e.data);
+    if (msg.type === 'snapshot') {
+      entries = new Map(msg.entries.map(row => [row.user_id, row]));
+    } else {
+      msg.removed.forEach(userId => entries.delete(userId));
+      msg.upserts.forEach(row => entries.set(row.user_id, row));
+    }
+    onEntries([...entries.values()].sort((a, b) => a.rank - b.rank));
+  };
+  return () => socket.close();
 };
 
 /**
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""Historical backfill for heatmaps and session aggregates.
+
+Recomputes a date range after a schema change or bug fix:
+
+  python -m scripts.backfill --start 2025-09-01 --end 2025-11-30 --levels 1,2,3 \
+      --workers 4 --db-concurrency 2
+
+The range is split into units of one (task, level, date); the ETL has one
+unit per date. The pending units of a task and date run together as a
+batch, so a heatmap batch builds all of its levels from a single scan of
+that day. Batches run in a process pool of `--workers` processes. At most
+`--db-concurrency` batches talk to Postgres at the same time; the rest wait
+for a slot, so a wide pool cannot exhaust connections or swamp the primary.
+
+Each finished unit is recorded in `backfill_checkpoints` under the run name.
+Re-running the same command skips finished units, so an interrupted backfill
+resumes where it stopped, and adding a level to `--levels` only runs that
+level. Use `--run-name` to start a separate pass over the same range, or
+`--restart` to clear the run's checkpoints first.
+
+Units are idempotent:
+ - heatmap: the day's matrices for every level are recomputed and upserted,
+   with their settled counts up to the incremental accumulator's watermark
+   (scripts/heatmap_accumulate.py), and the day's `heatmap_cube` cells are
+   rebuilt. Run it over all history once after migration 013: the
+   accumulator only adds events after its watermark to the cube
+ - tiles (opt-in with --tasks): the day's tile pyramids are rebuilt and
+   replace the stored ones (scripts/tiles.py)
+ - etl: every session with events that day is rebuilt from its events up
+   to the incremental watermark and replaced in `session_aggregates`; the
+   incremental ETL then adds the events after the watermark as usual.
+   ETL units serialize with each other and with the incremental ETL on an
+   advisory lock.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from sqlalchemy import MetaData, Table, Column, String, Date, JSON, select, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP, insert as pg_insert
+
+from scripts import runtime
+
+TASKS = ("etl", "heatmap", "tiles")
+
+metadata = MetaData()
+
+backfill_checkpoints = Table(
+    "backfill_checkpoints",
+    metadata,
+    Column("run_name", String(100), primary_key=True),
+    Column("task", String(20), primary_key=True),
+    Column("level", String, primary_key=True),
+    Column("date", Date, primary_key=True),
+    Column("stats", JSON),
+    Column("completed_at", TIMESTAMP(timezone=True), server_default=func.now(), nullable=False),
+)
+
+
+class BackfillUnit(NamedTuple):
+    task: str
+    level: str  # heatmap level; "" for the ETL
+    date: date
+
+
+def date_range(start: date, end: date) -> List[date]:
+    """Every date from start to end, inclusive."""
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def plan_units(tasks: Iterable[str], levels: Iterable[str], start: date, end: date) -> List[BackfillUnit]:
+    levels = list(dict.fromkeys(levels))
+    units = []
+    for day in date_range(start, end):
+        if "etl" in tasks:
+            units.append(BackfillUnit("etl", "", day))
+        for task in ("heatmap", "tiles"):
+            if task in tasks:
+                units.extend(BackfillUnit(task, level, day) for level in levels)
+    return units
+
+
+def batch_units(units: Iterable[BackfillUnit]) -> List[List[BackfillUnit]]:
+    """Units grouped by (task, date), in plan order; each group is computed from one scan."""
+    batches: Dict[Tuple[str, date], List[BackfillUnit]] = {}
+    for unit in units:
+        batches.setdefault((unit.task, unit.date), []).append(unit)
+    return list(batches.values())
+
+
+def load_completed(conn, run_name: str) -> Set[BackfillUnit]:
+    rows = conn.execute(
+        select(backfill_checkpoints.c.task, backfill_checkpoints.c.level, backfill_checkpoints.c.date)
+        .where(backfill_checkpoints.c.run_name == run_name)
+    )
+    return {BackfillUnit(r.task, r.level, r.date) for r in rows}
+
+
+def mark_completed(conn, run_name: str, unit: BackfillUnit, stats: dict) -> None:
+    stmt = pg_insert(backfill_checkpoints).values(
+        run_name=run_name, task=unit.task, level=unit.level, date=unit.date, stats=stats
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            backfill_checkpoints.c.run_name,
+            backfill_checkpoints.c.task,
+            backfill_checkpoints.c.level,
+            backfill_checkpoints.c.date,
+        ],
+        set_={"stats": stmt.excluded.stats, "completed_at": func.now()},
+    )
+    conn.execute(stmt)
+
+
+# DB concurrency budget shared by the pool; set in each worker by _init_worker
+_db_slots = None
+
+
+def _init_worker(db_slots) -> None:
+    global _db_slots
+    _db_slots = db_slots
+
+
+def _run_heatmap_batch(engine, day: date, levels: List[str]) -> Dict[str, dict]:
+    from scripts.heatmap_accumulate import recompute_heatmaps
+
+    matrices, seen = recompute_heatmaps(engine, levels, day)
+    return {level: {"events": seen[level], "sum": float(matrices[level].sum())} for level in levels}
+
+
+def _run_tiles_batch(engine, day: date, levels: List[str]) -> Dict[str, dict]:
+    from scripts.tiles import build_tile_pyramids
+
+    written = build_tile_pyramids(engine, levels, day)
+    return {level: {"tiles": written.get(level, 0)} for level in levels}
+
+
+def _run_etl_batch(engine, day: date, levels: List[str]) -> Dict[str, dict]:
+    from scripts.etl_aggregate import recompute_sessions
+    from scripts.session_features import refresh_range
+
+    start = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        sessions = recompute_sessions(conn, start, start + timedelta(days=1))
+        features = refresh_range(conn, start, start + timedelta(days=1))
+    return {"": {"sessions": sessions, "features": features}}
+
+
+_BATCH_RUNNERS = {"heatmap": _run_heatmap_batch, "tiles": _run_tiles_batch, "etl": _run_etl_batch}
+
+
+def run_batch(run_name: str, batch: List[BackfillUnit]) -> Dict[str, dict]:
+    """Worker side: compute the units of one task and date inside a DB slot and checkpoint each; stats by level."""
+    engine = runtime.get_engine()
+    started = time.monotonic()
+    task, day = batch[0].task, batch[0].date
+    with _db_slots:
+        stats = _BATCH_RUNNERS[task](engine, day, [unit.level for unit in batch])
+        seconds = round(time.monotonic() - started, 3)
+        with engine.begin() as conn:
+            for unit in batch:
+                stats[unit.level]["seconds"] = seconds
+                mark_completed(conn, run_name, unit, stats[unit.level])
+    return stats
+
+
+def run_backfill(run_name: str, units: List[BackfillUnit], workers: int, db_concurrency: int) -> dict:
+    """Run the units not yet checkpointed for `run_name`; returns counts."""
+    engine = runtime.get_engine()
+    with engine.connect() as conn:
+        completed = load_completed(conn, run_name)
+    todo = [u for u in units if u not in completed]
+    summary = {"planned": len(units), "skipped": len(units) - len(todo), "done": 0, "failed": 0}
+    print(f"Backfill '{run_name}': {len(todo)} units to run, {summary['skipped']} already done")
+    if not todo:
+        return summary
+
+    ctx = multiprocessing.get_context("spawn")
+    db_slots = ctx.BoundedSemaphore(db_concurrency)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(db_slots,)
+    ) as pool:
+        futures = {pool.submit(run_batch, run_name, batch): batch for batch in batch_units(todo)}
+        for future in as_completed(futures):
+            batch = futures[future]
+            label = f"{batch[0].task} {','.join(u.level for u in batch) or '-'} {batch[0].date}"
+            try:
+                stats = future.result()
+                summary["done"] += len(batch)
+                print(f"[{summary['done'] + summary['failed']}/{len(todo)}] {label}: {stats}")
+            except Exception as e:
+                # Other batches keep going; the failed units are retried on the next run
+                summary["failed"] += len(batch)
+                print(f"[{summary['done'] + summary['failed']}/{len(todo)}] {label} FAILED: {e}")
+    return summary
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Recompute heatmaps and session aggregates over a date range.")
+    ap.add_argument("--start", required=True, help="First date (YYYY-MM-DD)")
+    ap.add_argument("--end", required=True, help="Last date, inclusive (YYYY-MM-DD)")
+    ap.add_argument("--tasks", default="etl,heatmap", help="Comma-separated tasks (etl, heatmap, tiles)")
+    ap.add_argument("--levels", default=os.getenv("HEATMAP_LEVELS", "1"), help="Comma-separated heatmap levels")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+    ap.add_argument("--db-concurrency", type=int, default=2, help="Units allowed to use the DB at once")
+    ap.add_argument("--run-name", help="Checkpoint namespace (default: derived from the range)")
+    ap.add_argument("--restart", action="store_true", help="Clear this run's checkpoints first")
+    ap.add_argument("--dry-run", action="store_true", help="List the units to run and exit")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        start = datetime.strptime(args.start, "%Y-%m-%d").date()
+        end = datetime.strptime(args.end, "%Y-%m-%d").date()
+    except ValueError:
+        raise SystemExit("Invalid --start/--end format; expected YYYY-MM-DD")
+    if end < start:
+        raise SystemExit("--end is before --start")
+    tasks = [t.strip() for t in args.tasks.split(",") if t.strip()]
+    unknown = set(tasks) - set(TASKS)
+    if unknown:
+        raise SystemExit(f"Unknown tasks: {sorted(unknown)}")
+    levels = [lvl.strip() for lvl in args.levels.split(",") if lvl.strip()]
+    run_name = args.run_name or f"{start.isoformat()}..{end.isoformat()}"
+
+    units = plan_units(tasks, levels, start, end)
+    if args.dry_run:
+        for unit in units:
+            print(f"{unit.task} {unit.level or '-'} {unit.date}")
+        print(f"{len(units)} units")
+        return
+
+    if args.restart:
+        with runtime.get_engine().begin() as conn:
+            conn.execute(backfill_checkpoints.delete().where(backfill_checkpoints.c.run_name == run_name))
+
+    summary = run_backfill(run_name, units, max(1, args.workers), max(1, args.db_concurrency))
+    print(f"Backfill '{run_name}' finished: {summary}")
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
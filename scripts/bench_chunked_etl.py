@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Benchmark: whole-result ETL vs chunked reduce/merge.
+
+Generates synthetic event rows shaped like the `events` query result and
+runs the session summary both ways, reporting peak traced memory and rows/sec:
+
+- full:    fetch every row, build one DataFrame, summarize
+- chunked: consume rows in chunks, summarize each, merge the partials
+
+Usage:
+  python -m scripts.bench_chunked_etl --rows 20000 80000 320000 --chunk-size 10000
+  python -m scripts.bench_chunked_etl --db --chunk-size 10000   # stream real events table
+"""
+import argparse
+import itertools
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from scripts.checkpoints import MIN_WATERMARK
+from scripts.chunked import iter_chunks, reduce_chunks
+from scripts.etl_aggregate import (
+    FETCH_EVENTS_SQL,
+    SESSION_SUMMARY_FIELDS,
+    get_engine,
+    merge_summaries,
+    summarize_sessions,
+)
+
+# Shape of the ETL's projected query: payload fields arrive as typed columns
+COLUMNS = ["id", "session_id", "event_type", "timestamp", "created_at", "payload_score"]
+EVENT_TYPES = ["position", "jump", "score", "collision"]
+
+
+def synthetic_rows(n: int, sessions: int = 500, seed: int = 42):
+    rnd = random.Random(seed)
+    session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    start = datetime(2025, 11, 16, tzinfo=timezone.utc)
+    for i in range(n):
+        ts = start + timedelta(milliseconds=i * 50)
+        event_type = rnd.choice(EVENT_TYPES)
+        score = float(rnd.randint(0, 50)) if event_type == "score" else None
+        yield (str(uuid.uuid4()), rnd.choice(session_ids), event_type, ts, ts, score)
+
+
+def row_chunks(rows, size):
+    it = iter(rows)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield pd.DataFrame.from_records(batch, columns=COLUMNS)
+
+
+def run_full(n: int):
+    rows = list(synthetic_rows(n))
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    return summarize_sessions(df)
+
+
+def run_chunked(n: int, chunk_size: int):
+    return reduce_chunks(row_chunks(synthetic_rows(n), chunk_size), summarize_sessions, merge_summaries)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_synthetic(sizes, chunk_size):
+    print(f"{'rows':>10} {'mode':>8} {'peak MiB':>10} {'rows/sec':>12}")
+    for n in sizes:
+        full, t_full, p_full = measure(run_full, n)
+        chunked, t_chunk, p_chunk = measure(run_chunked, n, chunk_size)
+        assert int(full["event_count"].sum()) == int(chunked["event_count"].sum()) == n
+        print(f"{n:>10} {'full':>8} {p_full / 2**20:>10.1f} {n / t_full:>12,.0f}")
+        print(f"{n:>10} {'chunked':>8} {p_chunk / 2**20:>10.1f} {n / t_chunk:>12,.0f}")
+
+
+def bench_db(chunk_size):
+    engine = get_engine()
+    params = {"last_created_at": MIN_WATERMARK[0], "last_id": MIN_WATERMARK[1], "lag_seconds": 0}
+
+    def run():
+        with engine.connect() as conn:
+            chunks = iter_chunks(
+                conn, FETCH_EVENTS_SQL, params, chunk_size=chunk_size, dtypes=SESSION_SUMMARY_FIELDS.dtypes
+            )
+            return reduce_chunks(chunks, summarize_sessions, merge_summaries)
+
+    result, elapsed, peak = measure(run)
+    rows = 0 if result is None else int(result["event_count"].sum())
+    print(f"db: {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec), peak {peak / 2**20:.1f} MiB")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark chunked vs whole-result ETL.")
+    ap.add_argument("--rows", type=int, nargs="+", default=[20000, 80000, 320000])
+    ap.add_argument("--chunk-size", type=int, default=10000)
+    ap.add_argument("--db", action="store_true", help="Stream the real events table instead of synthetic rows")
+    args = ap.parse_args()
+    if args.db:
+        bench_db(args.chunk_size)
+    else:
+        bench_synthetic(args.rows, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""Benchmark: per-level heatmap scans vs one multi-level pass.
+
+- per-level: the previous job path. For each level, scan all of the day's
+  events (any type), filter the level in Pandas, then np.histogram2d.
+- single-pass: scan the day's position events once and bin every level with
+  one np.bincount over the linearized (level, y bin, x bin) index.
+
+Synthetic mode reports rows touched and wall time for both paths. `--db`
+times both against the real events table for one date: the per-level path
+runs the previous `DATE(timestamp) = :date` query once per level, the
+single-pass path is `build_heatmaps`.
+
+Usage:
+  python -m scripts.bench_heatmap_levels --rows 200000 1000000 --levels 1 2 3 4 5
+  python -m scripts.bench_heatmap_levels --db --date 2025-11-16 --levels 1 2 3
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from scripts.grids import GridSpec
+from scripts.heatmap import GRID_SIZE, HEATMAP_FIELDS, bin_levels_chunk, build_heatmaps, get_engine
+
+EVENT_TYPES = np.array(["position", "jump", "score", "collision"])
+
+# The per-level query the job ran before the single-pass rewrite
+PER_LEVEL_SQL = text(
+    f"""
+    SELECT id, timestamp, event_type, {HEATMAP_FIELDS.select_sql()}
+    FROM events
+    WHERE DATE(timestamp) = :target_date
+    """
+)
+
+
+def synthetic_events(n: int, levels, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "event_type": EVENT_TYPES[rng.integers(0, len(EVENT_TYPES), n)],
+        "payload_x": rng.uniform(0, 400, n),
+        "payload_y": rng.uniform(0, 600, n),
+        "payload_level": pd.Categorical(rng.choice(list(levels), n)),
+    })
+
+
+def data_range(values: np.ndarray):
+    """(min, max) of the values, widened when zero-width; the per-level path's data-derived bounds."""
+    lo, hi = float(values.min()), float(values.max())
+    return (lo - 0.5, hi + 0.5) if lo == hi else (lo, hi)
+
+
+def run_per_level(df: pd.DataFrame, levels):
+    touched = 0
+    out = {}
+    for lvl in levels:
+        touched += len(df)  # every level re-reads the whole day
+        sub = df[df["payload_level"] == lvl]
+        x, y = sub["payload_x"].to_numpy(), sub["payload_y"].to_numpy()
+        hist, _, _ = np.histogram2d(
+            x, y, bins=GRID_SIZE, range=[data_range(x), data_range(y)]
+        )
+        out[lvl] = hist.T
+    return out, touched
+
+
+def run_single_pass(df: pd.DataFrame, levels):
+    positions = df[df["event_type"] == "position"]  # done by the WHERE clause in SQL
+    position = {lvl: i for i, lvl in enumerate(levels)}
+    level_index = positions["payload_level"].astype(object).map(position).fillna(-1).to_numpy(dtype=np.int64)
+    x, y = positions["payload_x"].to_numpy(), positions["payload_y"].to_numpy()
+    # Same bounds as the per-level path so both produce the same matrices
+    grids = [
+        GridSpec(
+            *data_range(x[level_index == i]),
+            *data_range(y[level_index == i]),
+            resolution=GRID_SIZE,
+        )
+        for i in range(len(levels))
+    ]
+    counts = bin_levels_chunk(level_index, x, y, grids)
+    return dict(zip(levels, counts)), len(positions)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_synthetic(rows, levels):
+    print(f"{'rows':>10} {'path':>12} {'rows touched':>14} {'seconds':>9}")
+    for n in rows:
+        df = synthetic_events(n, levels)
+        for name, fn in (("per-level", run_per_level), ("single-pass", run_single_pass)):
+            (_, touched), seconds = timed(fn, df, levels)
+            print(f"{n:>10} {name:>12} {touched:>14} {seconds:>9.3f}")
+
+
+def bench_db(target_date, levels):
+    engine = get_engine()
+
+    def per_level():
+        touched = 0
+        with engine.connect() as conn:
+            for lvl in levels:
+                df = pd.read_sql(PER_LEVEL_SQL, conn, params={"target_date": target_date})
+                touched += len(df)
+                sub = df[df["payload_level"] == lvl]
+                if not sub.empty:
+                    np.histogram2d(sub["payload_x"].fillna(0), sub["payload_y"].fillna(0), bins=GRID_SIZE)
+        return touched
+
+    def single_pass():
+        _, seen = build_heatmaps(engine, levels, target_date)
+        return sum(seen.values())
+
+    for name, fn in (("per-level", per_level), ("single-pass", single_pass)):
+        touched, seconds = timed(fn)
+        print(f"{name:>12}: {touched} rows in {seconds:.3f}s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark per-level vs single-pass heatmap builds.")
+    ap.add_argument("--rows", type=int, nargs="+", default=[200000, 1000000])
+    ap.add_argument("--levels", nargs="+", default=["1", "2", "3", "4", "5"])
+    ap.add_argument("--db", action="store_true", help="Benchmark against the events table")
+    ap.add_argument("--date", help="Date (YYYY-MM-DD) for --db")
+    args = ap.parse_args()
+    if args.db:
+        if not args.date:
+            raise SystemExit("--db requires --date")
+        bench_db(datetime.strptime(args.date, "%Y-%m-%d").date(), args.levels)
+    else:
+        bench_synthetic(args.rows, args.levels)
+
+
+if __name__ == "__main__":
+    main()
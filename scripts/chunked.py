@@ -0,0 +1,78 @@
+"""Bounded-memory readers for the batch jobs.
+
+`iter_chunks` streams a query through a server-side (named) cursor and yields
+fixed-size, typed DataFrames, so only one chunk is ever held in memory.
+`reduce_chunks` folds the stream into a single result by reducing each chunk
+to a small partial aggregate and merging the partials as it goes.
+
+Example:
+    with engine.connect() as conn:
+        total = reduce_chunks(
+            iter_chunks(conn, sql, params),
+            reduce_fn=lambda df: np.histogram2d(df.x, df.y, bins=50, range=r)[0],
+            merge_fn=np.add,
+        )
+"""
+import os
+from typing import Callable, Dict, Iterable, Iterator, Optional, TypeVar
+
+import pandas as pd
+
+T = TypeVar("T")
+
+
+def default_chunk_size() -> int:
+    return int(os.getenv("ETL_CHUNK_SIZE", "10000"))
+
+
+def iter_chunks(
+    conn,
+    sql,
+    params: Optional[dict] = None,
+    chunk_size: Optional[int] = None,
+    dtypes: Optional[Dict[str, str]] = None,
+    parse_dates: Iterable[str] = (),
+) -> Iterator[pd.DataFrame]:
+    """Yield the rows of `sql` as DataFrames of at most `chunk_size` rows.
+
+    `stream_results` makes psycopg2 use a named cursor, so Postgres keeps the
+    result set and the client fetches `chunk_size` rows at a time. The caller
+    must keep `conn` (and its transaction) open while iterating.
+
+    Args:
+        conn: SQLAlchemy connection (psycopg2 driver)
+        sql: text() or Core statement
+        params: Bound parameters
+        chunk_size: Rows per chunk (defaults to ETL_CHUNK_SIZE)
+        dtypes: Column -> dtype applied to every chunk (e.g. "category", "float64")
+        parse_dates: Columns converted to UTC datetime64
+    """
+    size = chunk_size or default_chunk_size()
+    result = conn.execution_options(stream_results=True, max_row_buffer=size).execute(sql, params or {})
+    columns = list(result.keys())
+    try:
+        for rows in result.partitions(size):
+            df = pd.DataFrame.from_records(rows, columns=columns)
+            for col in parse_dates:
+                df[col] = pd.to_datetime(df[col], utc=True, errors="coerce")
+            if dtypes:
+                df = df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+            yield df
+    finally:
+        result.close()
+
+
+def reduce_chunks(
+    chunks: Iterable[pd.DataFrame],
+    reduce_fn: Callable[[pd.DataFrame], T],
+    merge_fn: Callable[[T, T], T],
+    initial: Optional[T] = None,
+) -> Optional[T]:
+    """Reduce each chunk to a partial result and merge the partials left to right."""
+    total = initial
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        partial = reduce_fn(chunk)
+        total = partial if total is None else merge_fn(total, partial)
+    return total
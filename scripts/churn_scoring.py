@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""Batch churn scoring of every user.
+
+One run:
+
+1. aggregates per-user features in a single GROUP BY over `sessions` joined
+   to `session_features` (scripts/session_features.py), streamed in chunks;
+2. scores each chunk with a logistic regression loaded from a JSON file
+   (`CHURN_MODEL_PATH`, default scripts/models/churn_v1.json): standardize,
+   one `X @ coefficients` matmul, sigmoid. Missing features are imputed with
+   the model's means;
+3. COPYs the scores into a temporary table and upserts them into
+   `user_scores` with one statement, then records the run in
+   `user_score_runs`, all in one transaction.
+
+Every run has a new `score_version`; the API's score cache (app/user_scores.py)
+drops its entries when the latest version changes. The model file holds
+`version`, `features` (names from USER_FEATURES_SQL), `means`, `scales`,
+`coefficients` and `intercept`.
+
+Usage:
+  python -m scripts.churn_scoring [--model path/to/model.json]
+"""
+import argparse
+import io
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Float, Integer, String, func, text
+from sqlalchemy.dialects.postgresql import TIMESTAMP, UUID
+
+from scripts import runtime
+from scripts.chunked import iter_chunks
+
+JOB_NAME = "churn_scoring"
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "churn_v1.json")
+
+metadata = MetaData()
+
+user_scores = Table(
+    "user_scores",
+    metadata,
+    Column("user_id", UUID(as_uuid=False), primary_key=True),
+    Column("churn_score", Float, nullable=False),
+    Column("model_version", String(50), nullable=False),
+    Column("score_version", String(100), nullable=False),
+    Column("scored_at", TIMESTAMP(timezone=True), server_default=func.now(), nullable=False),
+)
+
+user_score_runs = Table(
+    "user_score_runs",
+    metadata,
+    Column("score_version", String(100), primary_key=True),
+    Column("model_version", String(50), nullable=False),
+    Column("users", Integer, nullable=False),
+    Column("finished_at", TIMESTAMP(timezone=True), server_default=func.now(), nullable=False),
+)
+
+# One row per user with sessions; every column but user_id is a model feature candidate
+USER_FEATURES_SQL = runtime.statement(
+    "churn_scoring.user_features",
+    """
+    SELECT s.user_id::text AS user_id,
+           count(*)::float8 AS sessions,
+           (count(*) FILTER (WHERE s.session_start >= CAST(:as_of AS timestamptz) - interval '7 days'))::float8
+               AS sessions_7d,
+           EXTRACT(EPOCH FROM (CAST(:as_of AS timestamptz) - max(s.session_start)))::float8 / 86400.0
+               AS days_since_last,
+           avg(s.duration_seconds)::float8 AS avg_duration,
+           avg(f.jumps_per_second) AS avg_jumps_per_second,
+           avg(f.collision_count)::float8 AS avg_collisions,
+           avg(f.score_max) AS avg_score,
+           avg(f.score_velocity) AS avg_score_velocity
+    FROM sessions s
+    LEFT JOIN session_features f ON f.session_id = s.id
+    GROUP BY s.user_id
+    """,
+)
+
+FEATURE_NAMES = (
+    "sessions",
+    "sessions_7d",
+    "days_since_last",
+    "avg_duration",
+    "avg_jumps_per_second",
+    "avg_collisions",
+    "avg_score",
+    "avg_score_velocity",
+)
+
+
+@dataclass(frozen=True)
+class ChurnModel:
+    """Logistic regression over standardized features."""
+
+    version: str
+    features: Sequence[str]
+    means: np.ndarray
+    scales: np.ndarray
+    coefficients: np.ndarray
+    intercept: float
+
+    def __post_init__(self):
+        unknown = set(self.features) - set(FEATURE_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown model features: {sorted(unknown)}")
+        n = len(self.features)
+        if not (len(self.means) == len(self.scales) == len(self.coefficients) == n):
+            raise ValueError(f"Model {self.version}: means, scales and coefficients must have {n} values")
+        if (self.scales <= 0).any():
+            raise ValueError(f"Model {self.version}: scales must be positive")
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        """Churn probability per row of a (users x features) matrix; NaN features count as the mean."""
+        z = (X - self.means) / self.scales
+        z[np.isnan(z)] = 0.0
+        return 1.0 / (1.0 + np.exp(-(z @ self.coefficients + self.intercept)))
+
+
+def model_path() -> str:
+    return os.getenv("CHURN_MODEL_PATH", DEFAULT_MODEL_PATH)
+
+
+def load_model(path: Optional[str] = None) -> ChurnModel:
+    with open(path or model_path()) as fh:
+        spec = json.load(fh)
+    return ChurnModel(
+        version=str(spec["version"]),
+        features=tuple(spec["features"]),
+        means=np.asarray(spec["means"], dtype=float),
+        scales=np.asarray(spec["scales"], dtype=float),
+        coefficients=np.asarray(spec["coefficients"], dtype=float),
+        intercept=float(spec["intercept"]),
+    )
+
+
+def score_frame(model: ChurnModel, features: pd.DataFrame) -> np.ndarray:
+    return model.score(features[list(model.features)].to_numpy(dtype=float, na_value=np.nan))
+
+
+def _copy_scores(cursor, user_ids, scores: np.ndarray) -> None:
+    buf = io.StringIO()
+    pd.DataFrame({"user_id": user_ids, "churn_score": scores}).to_csv(buf, header=False, index=False)
+    buf.seek(0)
+    cursor.copy_expert("COPY user_scores_stage (user_id, churn_score) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def score_users(engine, model: ChurnModel, chunk_size: Optional[int] = None, progress=None) -> dict:
+    """Score every user with sessions and publish the scores as a new version; returns statistics."""
+    as_of = datetime.now(timezone.utc)
+    score_version = f"{model.version}:{as_of.strftime('%Y%m%dT%H%M%S')}"
+    users = 0
+    with engine.connect() as read_conn, engine.begin() as write_conn:
+        write_conn.execute(text(
+            "CREATE TEMP TABLE user_scores_stage (user_id uuid, churn_score float8) ON COMMIT DROP"
+        ))
+        cursor = write_conn.connection.cursor()
+        for chunk in iter_chunks(read_conn, USER_FEATURES_SQL, {"as_of": as_of}, chunk_size=chunk_size):
+            if chunk.empty:
+                continue
+            _copy_scores(cursor, chunk["user_id"], score_frame(model, chunk))
+            users += len(chunk)
+            if progress is not None:
+                progress({"users": users})
+        write_conn.execute(text(
+            """
+            INSERT INTO user_scores (user_id, churn_score, model_version, score_version, scored_at)
+            SELECT user_id, churn_score, :model_version, :score_version, now() FROM user_scores_stage
+            ON CONFLICT (user_id) DO UPDATE SET
+                churn_score = EXCLUDED.churn_score,
+                model_version = EXCLUDED.model_version,
+                score_version = EXCLUDED.score_version,
+                scored_at = EXCLUDED.scored_at
+            """
+        ), {"model_version": model.version, "score_version": score_version})
+        write_conn.execute(
+            user_score_runs.insert().values(score_version=score_version, model_version=model.version, users=users)
+        )
+    print(f"Scored {users} users with {model.version} (score_version={score_version})")
+    return {"users": users, "model_version": model.version, "score_version": score_version}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Score churn risk for every user.")
+    ap.add_argument("--model", help="Model JSON (default: CHURN_MODEL_PATH or scripts/models/churn_v1.json)")
+    args = ap.parse_args(argv)
+    score_users(runtime.get_engine(), load_model(args.model))
+
+
+if __name__ == "__main__":
+    main()
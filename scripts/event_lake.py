@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""Incremental export of raw events to a partitioned Parquet lake.
+
+Events are appended to a Hive-partitioned Parquet dataset under
+`EVENT_LAKE_DIR`, one directory per UTC day and event type:
+
+    <EVENT_LAKE_DIR>/date=2025-11-16/event_type=position/part-<run>-<n>.parquet
+
+Strings are dictionary-encoded, the payload keys models use are typed
+columns (`payload_x`, `payload_score`, ... via scripts/projection.py) next to
+the raw payload JSON, and rows are sorted by timestamp within each file so
+row-group statistics are tight. Readers filtering on date and event type
+skip whole directories, and time filters skip row groups.
+
+Each run exports the events after the job's `(created_at, id)` watermark
+(scripts/checkpoints.py), older than `ETL_WATERMARK_LAG_SECONDS`. Files are
+written to a staging directory first and moved into the lake once the new
+watermark is committed; staged files of a run that crashed in between are
+promoted or discarded on the next run depending on whether its watermark
+was committed, so every event lands in the lake exactly once.
+
+Usage:
+  python -m scripts.event_lake export
+  python -m scripts.event_lake query --from 2025-11-01 --to 2025-11-30 \\
+      --event-types position,collision --columns timestamp,session_id,payload_x,payload_y --output out.parquet
+"""
+import argparse
+import json
+import os
+import shutil
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+from scripts import runtime
+from scripts.checkpoints import load_watermark, save_watermark, watermark_lag_seconds
+from scripts.chunked import iter_chunks
+from scripts.projection import PayloadField, Projection
+
+JOB_NAME = "event_lake_export"
+
+# Typed payload columns in the lake; the raw payload is kept as JSON text too
+LAKE_FIELDS = Projection([
+    PayloadField("x", "float64"),
+    PayloadField("y", "float64"),
+    PayloadField("score", "float64"),
+    PayloadField("final_score", "float64"),
+    PayloadField("level", "str"),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string()), ("event_type", pa.string())]), flavor="hive")
+
+# Columns stored in the files; date and event_type come from the partition path
+FILE_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("user_id", pa.dictionary(pa.int32(), pa.string())),
+        ("session_id", pa.dictionary(pa.int32(), pa.string())),
+        ("event_name", pa.dictionary(pa.int32(), pa.string())),
+        ("event_category", pa.dictionary(pa.int32(), pa.string())),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("payload", pa.string()),
+    ]
+    + [
+        (field.column, pa.float64() if field.dtype == "float64" else pa.dictionary(pa.int32(), pa.string()))
+        for field in LAKE_FIELDS.fields
+    ]
+)
+LAKE_SCHEMA = pa.schema(list(FILE_SCHEMA) + list(PARTITIONING.schema))
+
+FETCH_EVENTS_SQL = runtime.statement(
+    "event_lake.fetch_events",
+    f"""
+    SELECT id::text AS id, user_id::text AS user_id, session_id::text AS session_id,
+           event_type, event_name, event_category, timestamp, created_at,
+           payload::text AS payload, {LAKE_FIELDS.select_sql()}
+    FROM events
+    WHERE (created_at, id) > (:last_created_at, CAST(:last_id AS uuid))
+      AND created_at < now() - make_interval(secs => :lag_seconds)
+    ORDER BY created_at, id
+    """,
+)
+
+
+def lake_dir() -> str:
+    return os.getenv("EVENT_LAKE_DIR", os.path.join("var", "event_lake"))
+
+
+def row_group_rows() -> int:
+    return int(os.getenv("EVENT_LAKE_ROW_GROUP_ROWS", "100000"))
+
+
+def _staging_root(root: str) -> str:
+    # Dataset discovery ignores paths starting with "_"
+    return os.path.join(root, "_staging")
+
+
+def chunk_table(chunk: pd.DataFrame) -> pa.Table:
+    """One chunk of event rows as a lake table (partition columns included), sorted by timestamp."""
+    chunk = chunk.copy()
+    for col in ("timestamp", "created_at"):
+        chunk[col] = pd.to_datetime(chunk[col], utc=True)
+    chunk["date"] = chunk["timestamp"].dt.strftime("%Y-%m-%d")
+    chunk = chunk.sort_values(["date", "event_type", "timestamp"], kind="stable")
+    return pa.Table.from_pandas(chunk[LAKE_SCHEMA.names], schema=LAKE_SCHEMA, preserve_index=False)
+
+
+def write_tables(tables: Iterable[pa.Table], target: str, run_id: str) -> int:
+    """Write a run's lake tables under `target`, one file per partition; returns rows written.
+
+    Batches are buffered per partition into row groups of
+    `EVENT_LAKE_ROW_GROUP_ROWS`, so chunk boundaries do not leave small files.
+    """
+    rows = 0
+
+    def batches():
+        nonlocal rows
+        for table in tables:
+            rows += table.num_rows
+            yield from table.to_batches()
+
+    parquet = ds.ParquetFileFormat()
+    ds.write_dataset(
+        batches(),
+        target,
+        schema=LAKE_SCHEMA,
+        format=parquet,
+        partitioning=PARTITIONING,
+        basename_template=f"part-{run_id}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=row_group_rows(),
+        min_rows_per_group=row_group_rows(),
+        file_options=parquet.make_write_options(compression="zstd", use_dictionary=True),
+    )
+    return rows
+
+
+def _promote(staged: str, root: str) -> None:
+    """Move a staged run's files into the lake, keeping their partition paths."""
+    for dirpath, _, files in os.walk(staged):
+        for name in files:
+            if not name.endswith(".parquet"):
+                continue
+            dest = os.path.join(root, os.path.relpath(dirpath, staged))
+            os.makedirs(dest, exist_ok=True)
+            os.replace(os.path.join(dirpath, name), os.path.join(dest, name))
+    shutil.rmtree(staged)
+
+
+def recover_staged(root: str, watermark) -> List[str]:
+    """Finish runs that crashed after staging: promote committed ones, drop the others.
+
+    Returns the run ids promoted.
+    """
+    staging = _staging_root(root)
+    if not os.path.isdir(staging):
+        return []
+    promoted = []
+    for run_id in sorted(os.listdir(staging)):
+        staged = os.path.join(staging, run_id)
+        try:
+            with open(os.path.join(staged, "_run.json")) as fh:
+                upto = json.load(fh)["upto"]
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(staged, ignore_errors=True)
+            continue
+        if (datetime.fromisoformat(upto[0]), upto[1]) <= (watermark[0], str(watermark[1])):
+            _promote(staged, root)
+            promoted.append(run_id)
+        else:
+            shutil.rmtree(staged)
+    return promoted
+
+
+def export_events(engine, chunk_size: Optional[int] = None, progress=None) -> dict:
+    """Append the events after the watermark to the lake; returns statistics."""
+    root = lake_dir()
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    staged = os.path.join(_staging_root(root), run_id)
+    with engine.connect() as conn:
+        # Serialize runs; held until this connection's transaction ends
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:job))"), {"job": JOB_NAME})
+        watermark = load_watermark(conn, JOB_NAME)
+        promoted = recover_staged(root, watermark)
+        last = None
+        exported = 0
+
+        def tables():
+            nonlocal last, exported
+            chunks = iter_chunks(conn, FETCH_EVENTS_SQL, {
+                "last_created_at": watermark[0], "last_id": watermark[1], "lag_seconds": watermark_lag_seconds(),
+            }, chunk_size=chunk_size)
+            for chunk in chunks:
+                if chunk.empty:
+                    continue
+                tail = chunk.iloc[-1]
+                last = (pd.Timestamp(tail["created_at"]).to_pydatetime(), str(tail["id"]))
+                yield chunk_table(chunk)
+                exported += len(chunk)
+                if progress is not None:
+                    progress({"rows": exported})
+
+        rows = write_tables(tables(), staged, run_id)
+        if last is not None:
+            with open(os.path.join(staged, "_run.json"), "w") as fh:
+                json.dump({"upto": [last[0].isoformat(), last[1]]}, fh)
+            save_watermark(conn, JOB_NAME, last[0], last[1])
+        conn.commit()
+    if last is not None:
+        _promote(staged, root)
+    else:
+        shutil.rmtree(staged, ignore_errors=True)
+    stats = {"rows": rows, "run_id": run_id, "recovered_runs": promoted}
+    if last is not None:
+        stats["watermark"] = last[0].isoformat()
+    print(f"Event lake export: {rows} events written to {root}")
+    return stats
+
+
+def lake_filter(
+    start: Optional[date] = None, end: Optional[date] = None, event_types: Optional[Sequence[str]] = None
+) -> Optional[ds.Expression]:
+    """Partition predicates (skip directories) plus timestamp bounds (skip row groups), both inclusive of `end`."""
+    parts = []
+    if start is not None:
+        parts.append(ds.field("date") >= start.isoformat())
+        parts.append(ds.field("timestamp") >= pa.scalar(datetime.combine(start, time(), tzinfo=timezone.utc)))
+    if end is not None:
+        parts.append(ds.field("date") <= end.isoformat())
+        next_day = datetime.combine(end + timedelta(days=1), time(), tzinfo=timezone.utc)
+        parts.append(ds.field("timestamp") < pa.scalar(next_day))
+    if event_types:
+        parts.append(ds.field("event_type").isin(list(event_types)))
+    expression = None
+    for part in parts:
+        expression = part if expression is None else expression & part
+    return expression
+
+
+def open_lake(root: Optional[str] = None) -> ds.Dataset:
+    return ds.dataset(root or lake_dir(), format="parquet", partitioning=PARTITIONING, schema=LAKE_SCHEMA)
+
+
+def query_lake(
+    columns: Optional[Sequence[str]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    event_types: Optional[Sequence[str]] = None,
+    root: Optional[str] = None,
+) -> pa.Table:
+    """The lake rows matching the filters, reading only `columns` (all by default)."""
+    if columns:
+        unknown = set(columns) - set(LAKE_SCHEMA.names)
+        if unknown:
+            raise ValueError(f"Unknown lake columns: {sorted(unknown)}")
+    return open_lake(root).to_table(
+        columns=list(columns) if columns else None, filter=lake_filter(start, end, event_types)
+    )
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        raise SystemExit(f"Invalid date {value!r}; expected YYYY-MM-DD")
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export events to the Parquet lake, or query it.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", help="Append events after the watermark")
+    query = sub.add_parser("query", help="Read a column subset with date and event type filters")
+    query.add_argument("--from", dest="date_from", help="First date (YYYY-MM-DD), inclusive")
+    query.add_argument("--to", dest="date_to", help="Last date (YYYY-MM-DD), inclusive")
+    query.add_argument("--event-types", help="Comma-separated event types")
+    query.add_argument("--columns", help=f"Comma-separated columns of: {', '.join(LAKE_SCHEMA.names)}")
+    query.add_argument("--output", help="Write the result to this Parquet file instead of printing it")
+    args = ap.parse_args(argv)
+
+    if args.command == "export":
+        export_events(runtime.get_engine())
+        return
+    try:
+        table = query_lake(
+            _split(args.columns), _parse_date(args.date_from), _parse_date(args.date_to), _split(args.event_types)
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    if args.output:
+        pq.write_table(table, args.output)
+        print(f"Wrote {table.num_rows} rows to {args.output}")
+    else:
+        print(table.to_pandas())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Fixed world-coordinate grids for heatmaps.
+
+Every level is binned over the same world bounds and resolution every day,
+so stored daily matrices of a level line up cell for cell and can be summed
+into weekly or monthly heatmaps without touching raw events. The grid is
+stored with each heatmap row; matrices are only added up when their grids
+are equal.
+
+Grids are configured per level with `HEATMAP_GRIDS` (JSON), e.g.:
+
+    HEATMAP_GRIDS='{"1": {"x_min": 0, "x_max": 700, "y_min": 0, "y_max": 560, "resolution": 50}}'
+
+Levels without an entry use `DEFAULT_GRID`, which covers the game canvas.
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    """World bounds (closed on the max edge) and square resolution of a heatmap grid."""
+
+    x_min: float
+    x_max: float
+    y_min: float
+    y_max: float
+    resolution: int = 50
+
+    def __post_init__(self):
+        if self.x_max <= self.x_min or self.y_max <= self.y_min:
+            raise ValueError(f"Empty grid bounds: {self}")
+        if self.resolution <= 0:
+            raise ValueError(f"Invalid grid resolution: {self.resolution}")
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GridSpec":
+        return cls(
+            x_min=float(data["x_min"]),
+            x_max=float(data["x_max"]),
+            y_min=float(data["y_min"]),
+            y_max=float(data["y_max"]),
+            resolution=int(data.get("resolution", 50)),
+        )
+
+    def with_bounds(self, x_min=None, x_max=None, y_min=None, y_max=None) -> "GridSpec":
+        """A copy with the given bounds overridden."""
+        return replace(
+            self,
+            x_min=self.x_min if x_min is None else x_min,
+            x_max=self.x_max if x_max is None else x_max,
+            y_min=self.y_min if y_min is None else y_min,
+            y_max=self.y_max if y_max is None else y_max,
+        )
+
+
+# The game canvas is at most 700x550 (see frontend/src/game/FlappyBird.js)
+DEFAULT_GRID = GridSpec(x_min=0.0, x_max=700.0, y_min=0.0, y_max=560.0, resolution=50)
+
+
+def load_grids() -> Dict[str, GridSpec]:
+    """Per-level grids from HEATMAP_GRIDS."""
+    raw = os.getenv("HEATMAP_GRIDS", "").strip()
+    if not raw:
+        return {}
+    return {str(level): GridSpec.from_dict(spec) for level, spec in json.loads(raw).items()}
+
+
+def grid_for(level: Optional[str]) -> GridSpec:
+    """The configured grid of `level` (DEFAULT_GRID if none is configured)."""
+    if level is None:
+        return DEFAULT_GRID
+    return load_grids().get(str(level), DEFAULT_GRID)
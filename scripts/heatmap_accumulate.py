@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+"""Incremental heatmap accumulation.
+
+Instead of re-binning every event of the day on each run, the heatmap job
+keeps count arrays per heatmap cube cell (level, date, platform, version,
+event type; scripts/heatmap_cube.py) and per daily heatmap (the position
+slice of the cube) and only bins events it has not seen:
+
+- settled counts (`base_data` of heatmaps and heatmap_cube) hold every event up to
+  the level's `(created_at, id)` watermark (scripts/checkpoints.py, one per
+  level). Each run adds the events between the old watermark and
+  `now() - tail window` and advances the watermark to that cutoff. A level
+  added to `HEATMAP_LEVELS` later starts without a watermark, so its first
+  run settles its whole history; levels whose watermarks agree share a scan.
+- events newer than the cutoff form the tail. The tail is re-scanned on
+  every run and added on top of the settled counts to produce the published
+  `matrix`, without being stored.
+
+Events are keyed by the UTC date of their `timestamp`, so an event that
+arrives days late still lands in the right day's heatmap. The tail re-scan
+is what catches rows committed late by slow ingest transactions (their
+`created_at` is the transaction start): as long as a transaction commits
+within `HEATMAP_TAIL_WINDOW_MINUTES`, its rows are still in the tail when
+they become visible, and are settled exactly once on a later run. Each run
+reads a bounded window: new events plus the tail. (The first run settles
+every existing position event once.)
+
+Settled counts, published matrices of both tables and the watermarks are
+written in one transaction. Full recomputes (`recompute_heatmaps`: the admin endpoint, the
+backfill and the CLI) store settled counts up to the same watermarks, and
+take the accumulator lock in shared mode so they never interleave with an
+incremental run. Recomputes of the same (level, date) are serialized by a
+transaction-level advisory lock around their rewrite of its cube cells.
+
+Usage:
+  python -m scripts.heatmap_accumulate --levels 1,2,3
+"""
+import argparse
+import logging
+import os
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select, text, tuple_
+
+from scripts import heatmap as heatmap_mod
+from scripts import heatmap_store, runtime
+from scripts.checkpoints import MIN_WATERMARK, load_watermark, save_watermark
+from scripts.chunked import iter_chunks
+from scripts.grids import GridSpec, grid_for
+from scripts.heatmap_codec import decode_counts
+from scripts.heatmap_cube import (
+    CUBE_DTYPES,
+    CUBE_EVENTS_SQL,
+    CubeKey,
+    bin_cube_chunk,
+    cube_event_types,
+    cube_table,
+    position_totals,
+)
+
+JOB_NAME = "heatmap_accumulate"
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of the uuid ordering: a cutoff watermark covers every id at its created_at
+MAX_UUID = "ffffffff-ffff-ffff-ffff-ffffffffffff"
+
+_AFTER = "(e.created_at, e.id) > (:after_created_at, CAST(:after_id AS uuid))"
+_UPTO = "(e.created_at, e.id) <= (:upto_created_at, CAST(:upto_id AS uuid))"
+
+# Cube events between two watermarks, past the settled watermark, and of one day
+SETTLE_SQL = runtime.statement(
+    "heatmap.accumulate.settle", CUBE_EVENTS_SQL.format(settled_column="", where=f"{_AFTER} AND {_UPTO}")
+)
+TAIL_SQL = runtime.statement("heatmap.accumulate.tail", CUBE_EVENTS_SQL.format(settled_column="", where=_AFTER))
+DAY_SQL = runtime.statement(
+    "heatmap.accumulate.day",
+    CUBE_EVENTS_SQL.format(
+        settled_column=f", {_UPTO} AS settled", where="e.timestamp >= :start AND e.timestamp < :end"
+    ),
+)
+
+# (level, date) for heatmaps, CubeKey for the cube; the level always comes first
+Key = Tuple
+
+
+def tail_window_minutes() -> float:
+    """Events younger than this are re-scanned on every run rather than settled."""
+    return float(os.getenv("HEATMAP_TAIL_WINDOW_MINUTES", "10"))
+
+
+@contextmanager
+def accumulator_lock(engine, shared: bool = False):
+    """Hold the accumulator's advisory lock on a dedicated connection.
+
+    The incremental run takes it exclusively; full recomputes take it shared,
+    so they run alongside each other but never interleave with a run that is
+    moving settled counts and the watermark.
+    """
+    lock, unlock = (
+        ("pg_advisory_lock_shared", "pg_advisory_unlock_shared") if shared
+        else ("pg_advisory_lock", "pg_advisory_unlock")
+    )
+    with engine.connect() as conn:
+        conn.execute(text(f"SELECT {lock}(hashtext(:job))"), {"job": JOB_NAME})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text(f"SELECT {unlock}(hashtext(:job))"), {"job": JOB_NAME})
+            conn.commit()
+
+
+def level_job(level: str) -> str:
+    """Checkpoint name of one level's watermark."""
+    return f"{JOB_NAME}:{level}"
+
+
+def load_level_watermarks(conn, table, levels: Sequence[str]) -> Dict[str, Tuple]:
+    """Settled watermark per level.
+
+    Before watermarks were kept per level, runs saved a single one under
+    `JOB_NAME`; it still applies to a level without its own that already has
+    settled counts. Any other level without a watermark starts from the
+    beginning.
+    """
+    legacy = load_watermark(conn, JOB_NAME)
+    watermarks = {}
+    for level in levels:
+        watermark = load_watermark(conn, level_job(level))
+        if watermark == MIN_WATERMARK and legacy != MIN_WATERMARK:
+            settled = conn.execute(
+                select(table.c.level).where(table.c.level == level, table.c.base_data.isnot(None)).limit(1)
+            ).first()
+            if settled is not None:
+                watermark = legacy
+        watermarks[level] = watermark
+    return watermarks
+
+
+def group_levels(levels: Sequence[str], *watermarks: Mapping[str, Tuple]) -> Dict[Tuple, List[str]]:
+    """Levels grouped by their watermarks in each of `watermarks`, so each group is one scan."""
+    groups: Dict[Tuple, List[str]] = {}
+    for level in levels:
+        groups.setdefault(tuple(w[level] for w in watermarks), []).append(level)
+    return groups
+
+
+def advance_watermark(current: Tuple, cutoff) -> Tuple:
+    """The new settled watermark: `cutoff` (every id at it), never moving backwards."""
+    if cutoff > current[0]:
+        return cutoff, MAX_UUID
+    return current
+
+
+def accumulate_chunks(chunks: Iterable[pd.DataFrame], levels: Sequence[str]) -> Tuple[Dict[CubeKey, np.ndarray], int]:
+    """Fold chunks into per-cube-cell counts; returns (counts, events read)."""
+    totals: Dict[CubeKey, np.ndarray] = {}
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        _add_into(totals, bin_cube_chunk(chunk, levels))
+    return totals, rows
+
+
+def _add_into(totals: Dict, counts: Mapping) -> None:
+    for key, matrix in counts.items():
+        if key in totals:
+            totals[key] += matrix
+        else:
+            totals[key] = matrix.astype(np.int64)
+
+
+def _stored_grid(row) -> GridSpec | None:
+    if row.x_min is None or row.grid_size is None:
+        return None
+    return GridSpec(row.x_min, row.x_max, row.y_min, row.y_max, resolution=int(row.grid_size))
+
+
+def combine(
+    stored: Mapping[Key, Tuple[GridSpec | None, np.ndarray | None]],
+    settled: Mapping[Key, np.ndarray],
+    tail: Mapping[Key, np.ndarray],
+) -> Dict[Key, Tuple[np.ndarray, np.ndarray, GridSpec]]:
+    """New (base, published matrix, grid) for every key with settled or tail events.
+
+    A stored base is only extended when it was binned on the level's current
+    grid; otherwise it restarts from zero (recompute the date to restore it).
+    """
+    out = {}
+    for key in set(settled) | set(tail):
+        grid = grid_for(key[0])
+        stored_grid, stored_base = stored.get(key, (None, None))
+        base = np.zeros((grid.resolution, grid.resolution), dtype=np.int64)
+        if stored_base is not None:
+            if stored_grid == grid:
+                base = stored_base.astype(np.int64)
+            else:
+                logger.warning(
+                    f"Grid of heatmap {key[0]} {key[1]} changed; settled counts restart (recompute that date)"
+                )
+        if key in settled:
+            base = base + settled[key]
+        published = base + tail[key] if key in tail else base
+        out[key] = (base, published, grid)
+    return out
+
+
+def _load_stored(conn, table, keys: Iterable[Key]) -> Dict[Key, Tuple[GridSpec | None, np.ndarray | None]]:
+    """Stored grid and settled counts of `keys`, given in primary key column order."""
+    keys = [tuple(key) for key in keys]
+    if not keys:
+        return {}
+    pk = list(table.primary_key.columns)
+    rows = conn.execute(
+        select(
+            *pk, table.c.base_data, table.c.matrix_shape, table.c.matrix_dtype,
+            table.c.grid_size, table.c.x_min, table.c.x_max, table.c.y_min, table.c.y_max,
+        ).where(tuple_(*pk).in_(keys))
+    )
+    return {
+        tuple(getattr(r, c.name) for c in pk): (
+            _stored_grid(r),
+            decode_counts(r.base_data, r.matrix_shape, r.matrix_dtype) if r.base_data is not None else None,
+        )
+        for r in rows
+    }
+
+
+def _cube_row(key: CubeKey, matrix, grid: GridSpec, base=None) -> dict:
+    row = heatmap_mod.heatmap_row(key.level, key.date, matrix, grid, base=base)
+    row.update(platform=key.platform, game_version=key.game_version, event_type=key.event_type)
+    return row
+
+
+def accumulate(engine, levels: Sequence[str], progress=None) -> dict:
+    """One incremental run: settle events up to the cutoff, re-scan the tail, publish; returns statistics."""
+    table = heatmap_mod.heatmaps_table()
+    cube = cube_table()
+    levels = list(dict.fromkeys(levels))
+    event_types = cube_event_types()
+    with accumulator_lock(engine):
+        with engine.connect() as conn:
+            previous = load_level_watermarks(conn, table, levels)
+            cutoff = conn.execute(
+                text("SELECT now() - make_interval(secs => :secs)"), {"secs": tail_window_minutes() * 60}
+            ).scalar()
+            watermarks = {level: advance_watermark(previous[level], cutoff) for level in levels}
+            settled, tail = {}, {}
+            settled_rows = tail_rows = 0
+            for (after, upto), group in group_levels(levels, previous, watermarks).items():
+                counts, rows = accumulate_chunks(
+                    iter_chunks(conn, SETTLE_SQL, {
+                        "after_created_at": after[0], "after_id": after[1],
+                        "upto_created_at": upto[0], "upto_id": upto[1],
+                        "levels": group, "event_types": event_types,
+                    }, dtypes=CUBE_DTYPES),
+                    group,
+                )
+                settled.update(counts)
+                settled_rows += rows
+            for (after,), group in group_levels(levels, watermarks).items():
+                counts, rows = accumulate_chunks(
+                    iter_chunks(conn, TAIL_SQL, {
+                        "after_created_at": after[0], "after_id": after[1],
+                        "levels": group, "event_types": event_types,
+                    }, dtypes=CUBE_DTYPES),
+                    group,
+                )
+                tail.update(counts)
+                tail_rows += rows
+        stats = {"settled_events": settled_rows, "tail_events": tail_rows, "heatmaps": 0, "cube_cells": 0}
+        if progress is not None:
+            progress(dict(stats))
+
+        settled_maps, tail_maps = position_totals(settled), position_totals(tail)
+        with engine.begin() as conn:
+            combined = combine(_load_stored(conn, table, set(settled_maps) | set(tail_maps)), settled_maps, tail_maps)
+            cells = combine(_load_stored(conn, cube, set(settled) | set(tail)), settled, tail)
+            heatmap_mod.upsert_heatmaps(conn, table, [
+                heatmap_mod.heatmap_row(level, day, published, grid, base=base)
+                for (level, day), (base, published, grid) in combined.items()
+            ])
+            heatmap_mod.upsert_heatmaps(conn, cube, [
+                _cube_row(key, published, grid, base=base) for key, (base, published, grid) in cells.items()
+            ])
+            for level, watermark in watermarks.items():
+                save_watermark(conn, level_job(level), watermark[0], watermark[1])
+        heatmap_store.publish({key: (grid, published) for key, (_, published, grid) in combined.items()})
+        stats["heatmaps"] = len(combined)
+        stats["cube_cells"] = len(cells)
+        stats["dates"] = sorted({key[1].isoformat() for key in cells})
+        stats["watermark"] = min(w[0] for w in watermarks.values()).isoformat()
+    print(
+        f"Heatmap accumulation: {settled_rows} events settled, {tail_rows} in the tail, "
+        f"{stats['heatmaps']} heatmaps and {stats['cube_cells']} cube cells updated"
+    )
+    if progress is not None:
+        progress(dict(stats))
+    return stats
+
+
+def scan_day(engine, levels: Sequence[str], target_date: date, watermark) -> Tuple[Dict, Dict, Dict[str, int]]:
+    """Cube counts of one day from a single scan: (all events, events up to `watermark`, position events per level)."""
+    start, end = heatmap_mod.day_range(target_date)
+    everything: Dict[CubeKey, np.ndarray] = {}
+    settled: Dict[CubeKey, np.ndarray] = {}
+    seen = {level: 0 for level in levels}
+    with engine.connect() as conn:
+        chunks = iter_chunks(conn, DAY_SQL, {
+            "start": start, "end": end, "levels": list(levels), "event_types": cube_event_types(),
+            "upto_created_at": watermark[0], "upto_id": watermark[1],
+        }, dtypes=CUBE_DTYPES)
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            _add_into(everything, bin_cube_chunk(chunk, levels))
+            _add_into(settled, bin_cube_chunk(chunk[chunk["settled"].to_numpy(dtype=bool)], levels))
+            positions = chunk.loc[chunk["event_type"].astype(object) == "position", "payload_level"].astype(object)
+            for level, count in positions.value_counts().items():
+                if level in seen:
+                    seen[level] += int(count)
+    return everything, settled, seen
+
+
+def recompute_heatmaps(engine, levels: Sequence[str], target_date: date):
+    """Rebuild one date's heatmaps and cube cells from all of its events, keeping settled counts consistent.
+
+    Settled counts are replaced by the counts up to the level's accumulator
+    watermark, so the next incremental run adds exactly the events after it.
+    Before a level's first incremental run there is nothing to keep
+    consistent and its settled counts are left alone. Returns (matrices, seen) like
+    `build_heatmaps`.
+    """
+    table = heatmap_mod.heatmaps_table()
+    cube = cube_table()
+    levels = list(dict.fromkeys(levels))
+    with accumulator_lock(engine, shared=True):
+        with engine.connect() as conn:
+            watermarks = load_level_watermarks(conn, table, levels)
+        everything, settled, seen = {}, {}, {level: 0 for level in levels}
+        for (watermark,), group in group_levels(levels, watermarks).items():
+            group_everything, group_settled, group_seen = scan_day(engine, group, target_date, watermark)
+            everything.update(group_everything)
+            settled.update(group_settled)
+            seen.update(group_seen)
+        keep_base = {level: watermark != MIN_WATERMARK for level, watermark in watermarks.items()}
+
+        maps, settled_maps = position_totals(everything), position_totals(settled)
+        rows, matrices, stored = [], {}, {}
+        for level in levels:
+            grid = grid_for(level)
+            zeros = np.zeros((grid.resolution, grid.resolution), dtype=np.int64)
+            matrix = maps.get((level, target_date), zeros)
+            base = settled_maps.get((level, target_date), zeros) if keep_base[level] else None
+            rows.append(heatmap_mod.heatmap_row(level, target_date, matrix, grid, base=base))
+            matrices[level] = matrix.astype(float)
+            stored[(level, target_date)] = (grid, matrix)
+        cube_rows = [
+            _cube_row(key, matrix, grid_for(key.level), base=settled.get(key, np.zeros_like(matrix)))
+            if keep_base[key.level] else _cube_row(key, matrix, grid_for(key.level))
+            for key, matrix in everything.items()
+        ]
+        with engine.begin() as conn:
+            # Another recompute of the same day must not delete and insert the same cells concurrently
+            for level in sorted(levels):
+                conn.execute(
+                    text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+                    {"key": f"{JOB_NAME}:{level}:{target_date.isoformat()}"},
+                )
+            heatmap_mod.upsert_heatmaps(conn, table, rows)
+            conn.execute(delete(cube).where(cube.c.level.in_(levels), cube.c.date == target_date))
+            if cube_rows:
+                conn.execute(cube.insert(), cube_rows)
+        heatmap_store.publish(stored)
+    print(f"Recomputed heatmaps for date={target_date} (levels {levels}; {len(cube_rows)} cube cells).")
+    return matrices, seen
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Add new events to the stored heatmaps and heatmap cube.")
+    ap.add_argument("--levels", default=os.getenv("HEATMAP_LEVELS", "1"), help="Comma-separated levels")
+    args = ap.parse_args(argv)
+    levels = [lvl.strip() for lvl in args.levels.split(",") if lvl.strip()]
+    accumulate(runtime.get_engine(), levels)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Binary encoding of heatmap count matrices.
+
+Heatmap cells are event counts, so matrices are stored as little-endian
+uint32 arrays compressed with zlib in `bytea` columns, next to their shape
+and dtype. Sparse grids compress to a small fraction of the JSON float
+lists they replace, and the saving grows with the resolution.
+
+zlib output is also the HTTP `deflate` content coding, so the API can send
+a stored matrix to clients as-is.
+"""
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+STORAGE_DTYPE = "<u4"
+COMPRESSION_LEVEL = 6
+
+_MAX_COUNT = np.iinfo(np.uint32).max
+
+
+def to_counts(matrix) -> np.ndarray:
+    """`matrix` as a contiguous uint32 array; raises ValueError if it is not a valid count matrix."""
+    values = np.asarray(matrix)
+    if values.size and (values.min() < 0 or values.max() > _MAX_COUNT):
+        raise ValueError(f"Heatmap counts out of uint32 range: [{values.min()}, {values.max()}]")
+    return np.ascontiguousarray(values, dtype=STORAGE_DTYPE)
+
+
+def encode_counts(matrix) -> Tuple[bytes, List[int], str]:
+    """Compress a count matrix; returns (data, shape, dtype) for storage."""
+    counts = to_counts(matrix)
+    return zlib.compress(counts.tobytes(), COMPRESSION_LEVEL), list(counts.shape), STORAGE_DTYPE
+
+
+def decode_counts(data: bytes, shape, dtype: str = STORAGE_DTYPE) -> np.ndarray:
+    """Inverse of `encode_counts`."""
+    return np.frombuffer(zlib.decompress(data), dtype=dtype).reshape(tuple(shape))
@@ -0,0 +1,132 @@
+"""Heatmap cube: count arrays per (level, date, platform, game_version, event_type).
+
+The heatmap pipeline bins every event type with coordinates (position, jump
+and collision by default, `HEATMAP_CUBE_EVENT_TYPES`), joined to its session
+for platform and game version, into one count array per cube cell, stored in
+`heatmap_cube` on the level's fixed grid. A question such as "collision
+positions on mobile in v1.2" is then answered by summing the stored arrays
+that match, never by scanning events. The daily `heatmaps` matrix of a level
+is the position slice of its cube, summed over platforms and versions.
+
+Cells are maintained by the same incremental accumulator and full recompute
+as the daily heatmaps (scripts/heatmap_accumulate.py), from the same scan.
+Events without a session or with a NULL platform/version are filed under
+"unknown".
+"""
+import os
+from datetime import date
+from typing import Dict, NamedTuple, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, String, Date, Float, JSON, LargeBinary
+
+from scripts import runtime
+from scripts.grids import grid_for
+from scripts.heatmap import HEATMAP_FIELDS, bin_levels_chunk
+
+DIMENSIONS = ("level", "date", "platform", "game_version", "event_type")
+UNKNOWN = "unknown"
+
+
+class CubeKey(NamedTuple):
+    level: str
+    date: date
+    platform: str
+    game_version: str
+    event_type: str
+
+
+def cube_event_types() -> list:
+    """Event types binned into the cube; their payloads carry x, y and level.
+
+    Position is always included: the daily heatmaps are its slice.
+    """
+    raw = os.getenv("HEATMAP_CUBE_EVENT_TYPES", "position,jump,collision")
+    return list(dict.fromkeys(["position"] + [t.strip() for t in raw.split(",") if t.strip()]))
+
+
+# Event columns plus session dimensions for the cube; {where} selects the events
+# and {settled_column} optionally flags those at or before a watermark
+CUBE_EVENTS_SQL = f"""
+    SELECT {HEATMAP_FIELDS.select_sql()},
+           e.timestamp AS timestamp,
+           e.event_type AS event_type,
+           s.platform AS platform,
+           s.game_version AS game_version
+           {{settled_column}}
+    FROM events e
+    LEFT JOIN sessions s ON s.id = e.session_id
+    WHERE {{where}}
+      AND e.event_type = ANY(:event_types)
+      AND e.payload->>'level' = ANY(:levels)
+"""
+
+CUBE_DTYPES = {**HEATMAP_FIELDS.dtypes, "event_type": "category", "platform": "category", "game_version": "category"}
+
+
+def _define_cube(meta: MetaData) -> Table:
+    return Table(
+        "heatmap_cube",
+        meta,
+        Column("level", String, primary_key=True),
+        Column("date", Date, primary_key=True),
+        Column("platform", String(50), primary_key=True),
+        Column("game_version", String(50), primary_key=True),
+        Column("event_type", String(100), primary_key=True),
+        Column("grid_size", String, nullable=False),
+        Column("x_min", Float),
+        Column("x_max", Float),
+        Column("y_min", Float),
+        Column("y_max", Float),
+        # Same encoding as heatmaps (scripts/heatmap_codec.py)
+        Column("matrix_data", LargeBinary, nullable=False),
+        Column("matrix_shape", JSON, nullable=False),
+        Column("matrix_dtype", String(16), nullable=False),
+        Column("base_data", LargeBinary),
+    )
+
+
+def cube_table(create: bool = True):
+    """The `heatmap_cube` table, reflected once per process (created if missing when `create`)."""
+    return runtime.get_table("heatmap_cube", create=_define_cube if create else None)
+
+
+def bin_cube_chunk(chunk: pd.DataFrame, levels: Sequence[str]) -> Dict[CubeKey, np.ndarray]:
+    """Counts of one chunk per cube cell (UTC date of `timestamp`), each on its level's grid."""
+    level_ok = chunk["payload_level"].astype(object).isin(list(levels)).to_numpy()
+    ts = pd.to_datetime(chunk["timestamp"], utc=True)
+    keep = level_ok & ts.notna().to_numpy()
+    if not keep.any():
+        return {}
+    days = ts[keep].dt.tz_localize(None).dt.normalize()
+    dims = pd.MultiIndex.from_arrays([
+        chunk["payload_level"].astype(object)[keep].to_numpy(),
+        days.to_numpy(),
+        chunk["platform"].astype(object)[keep].fillna(UNKNOWN).to_numpy(),
+        chunk["game_version"].astype(object)[keep].fillna(UNKNOWN).to_numpy(),
+        chunk["event_type"].astype(object)[keep].to_numpy(),
+    ])
+    codes, uniques = dims.factorize()
+    keys = [
+        CubeKey(str(level), pd.Timestamp(day).date(), str(platform), str(version), str(event_type))
+        for level, day, platform, version, event_type in uniques
+    ]
+    counts = bin_levels_chunk(
+        np.asarray(codes, dtype=np.int64),
+        chunk["payload_x"].to_numpy(dtype=float)[keep],
+        chunk["payload_y"].to_numpy(dtype=float)[keep],
+        [grid_for(key.level) for key in keys],
+    )
+    return dict(zip(keys, counts))
+
+
+def position_totals(cube: Dict[CubeKey, np.ndarray]) -> Dict[Tuple[str, date], np.ndarray]:
+    """The daily heatmaps in a set of cube cells: position counts per (level, date)."""
+    totals: Dict[Tuple[str, date], np.ndarray] = {}
+    for key, counts in cube.items():
+        if key.event_type != "position":
+            continue
+        day_key = (key.level, key.date)
+        totals[day_key] = totals[day_key] + counts if day_key in totals else counts.astype(np.int64)
+    return totals
@@ -0,0 +1,291 @@
+"""Memory-mapped local store of daily heatmaps.
+
+One `.npy` file per (level, month) holds a days x H x W uint32 array on the
+level's fixed grid (scripts/grids.py); day d of the month is slot d - 1. The
+API maps the files read-only, so a single date is a view of mapped pages and
+a date range is one slice-and-sum per month, with no database round trip
+and no matrix decoding.
+
+A JSON sidecar next to each file records, per day, whether the slot holds
+the stored heatmap, whether the day has no heatmap, or whether its heatmap
+is on a different grid (those slots stay zero, so summing a slice only adds
+stored heatmaps), the row's `updated_at` it was loaded from, and when it was
+last checked.
+
+The store is a cache of the `heatmaps` table:
+
+- jobs on this host write through (`put_days`) whenever they store heatmaps;
+- the API loads the days it has no entry for from Postgres and puts them.
+  Every entry, however old the day, expires after
+  `HEATMAP_STORE_TTL_SECONDS` (`stale_days`); expired days are revalidated
+  with one query for their rows' `updated_at` (`revalidate`) and only the
+  days whose row changed are loaded again. Late events settled into old
+  days, backfills and jobs on other hosts therefore show up within the TTL
+  without re-reading unchanged matrices.
+
+Writers and readers of a month take an exclusive or shared `flock` on a
+lock file next to it (no locking where `fcntl` is unavailable). The calls
+block on file I/O and locks, so the API runs them in a worker thread.
+`HEATMAP_STORE_DIR` is the root directory.
+"""
+import calendar
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from scripts.grids import GridSpec, grid_for
+from scripts.heatmap_codec import STORAGE_DTYPE, to_counts
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STORED = "stored"
+ABSENT = "absent"
+OTHER_GRID = "other_grid"
+
+# Read-only maps of month files, by path; reopened when the file is replaced
+_maps: Dict[str, Tuple[int, np.memmap]] = {}
+
+
+def store_dir() -> str:
+    return os.getenv("HEATMAP_STORE_DIR", os.path.join("var", "heatmap_store"))
+
+
+def ttl_seconds() -> float:
+    return float(os.getenv("HEATMAP_STORE_TTL_SECONDS", "60"))
+
+
+def month_path(level: str, year: int, month: int) -> str:
+    # Levels come from query parameters: quote them so they cannot leave the store
+    return os.path.join(store_dir(), f"level={quote(str(level), safe='')}", f"{year:04d}-{month:02d}.npy")
+
+
+def _months(start: date, end: date) -> Iterator[Tuple[int, int, date, date]]:
+    """(year, month, first day, last day) of every month overlapping [start, end]."""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        last = date(year, month, calendar.monthrange(year, month)[1])
+        yield year, month, max(start, date(year, month, 1)), min(end, last)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+@contextmanager
+def _locked(path: str, exclusive: bool):
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _meta_path(path: str) -> str:
+    return path[:-len(".npy")] + ".json"
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    try:
+        with open(_meta_path(path)) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    tmp = _meta_path(path) + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, _meta_path(path))
+
+
+def _create(path: str, year: int, month: int, grid: GridSpec) -> dict:
+    """A zeroed month file on `grid` (replacing any file on another grid) and its empty sidecar."""
+    days = calendar.monthrange(year, month)[1]
+    tmp = path + ".tmp"
+    np.lib.format.open_memmap(tmp, mode="w+", dtype=STORAGE_DTYPE, shape=(days, grid.resolution, grid.resolution))
+    os.replace(tmp, path)
+    meta = {"grid": grid.to_dict(), "days": {}}
+    _write_meta(path, meta)
+    return meta
+
+
+def _mapped(path: str) -> np.memmap:
+    inode = os.stat(path).st_ino
+    cached = _maps.get(path)
+    if cached is None or cached[0] != inode:
+        cached = (inode, np.load(path, mmap_mode="r"))
+        _maps[path] = cached
+    return cached[1]
+
+
+def _is_fresh(entry: Optional[dict], now: float) -> bool:
+    return entry is not None and now - entry["loaded_at"] < ttl_seconds()
+
+
+def _current_meta(level: str, year: int, month: int) -> Optional[dict]:
+    """The month's sidecar, or None if missing or on another grid than the level's."""
+    meta = _read_meta(month_path(level, year, month))
+    if meta is not None and GridSpec.from_dict(meta["grid"]) != grid_for(level):
+        return None
+    return meta
+
+
+def _by_month(days) -> Dict[Tuple[int, int], list]:
+    months: Dict[Tuple[int, int], list] = {}
+    for day in days:
+        months.setdefault((day.year, day.month), []).append(day)
+    return months
+
+
+def stale_days(level: str, start: date, end: date) -> List[date]:
+    """Days in [start, end] to revalidate against Postgres before reading the range."""
+    now = time.time()
+    stale = []
+    for year, month, first, last in _months(start, end):
+        meta = _current_meta(level, year, month)
+        days = meta["days"] if meta else {}
+        for i in range((last - first).days + 1):
+            day = first + timedelta(days=i)
+            if not _is_fresh(days.get(day.isoformat()), now):
+                stale.append(day)
+    return stale
+
+
+def revalidate(level: str, days: List[date], versions: Mapping[date, str]) -> List[date]:
+    """Days of `days` to load again: no entry, or a row `updated_at` (`versions`; absent = no row) that changed.
+
+    The other entries are marked fresh for another TTL.
+    """
+    now = time.time()
+    reload: List[date] = []
+    for (year, month), entries in _by_month(days).items():
+        path = month_path(level, year, month)
+        if _current_meta(level, year, month) is None:
+            reload.extend(entries)
+            continue
+        with _locked(path, exclusive=True):
+            meta = _current_meta(level, year, month)
+            if meta is None:
+                reload.extend(entries)
+                continue
+            for day in entries:
+                entry = meta["days"].get(day.isoformat())
+                current = versions.get(day)
+                if entry is None:
+                    unchanged = False
+                elif current is None:
+                    unchanged = entry["state"] == ABSENT
+                else:
+                    # Write-throughs carry no version, so their day is reloaded once
+                    unchanged = entry.get("version") == current
+                if unchanged:
+                    entry["loaded_at"] = now
+                else:
+                    reload.append(day)
+            _write_meta(path, meta)
+    return reload
+
+
+def put_days(
+    level: str,
+    days: Mapping[date, Optional[Tuple[Optional[GridSpec], np.ndarray]]],
+    versions: Optional[Mapping[date, str]] = None,
+) -> None:
+    """Store (grid, counts) per day; None marks a day without a heatmap.
+
+    `versions` are the rows' `updated_at` the counts were read at, for
+    `revalidate`. Counts on another grid than the level's are recorded but
+    not stored. A month whose days all have no heatmap is not created.
+    """
+    if not days:
+        return
+    grid = grid_for(level)
+    now = time.time()
+    by_month: Dict[Tuple[int, int], list] = {}
+    for day, value in days.items():
+        by_month.setdefault((day.year, day.month), []).append((day, value))
+    for (year, month), entries in by_month.items():
+        path = month_path(level, year, month)
+        meta = _read_meta(path)
+        if meta is None and all(value is None for _, value in entries):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _locked(path, exclusive=True):
+            meta = _read_meta(path)
+            if meta is None or GridSpec.from_dict(meta["grid"]) != grid or not os.path.exists(path):
+                meta = _create(path, year, month, grid)
+            cube = np.load(path, mmap_mode="r+")
+            for day, value in entries:
+                if value is not None and value[0] == grid:
+                    cube[day.day - 1] = to_counts(value[1])
+                    state = STORED
+                else:
+                    cube[day.day - 1] = 0
+                    state = ABSENT if value is None else OTHER_GRID
+                meta["days"][day.isoformat()] = {
+                    "state": state, "loaded_at": now, "version": (versions or {}).get(day),
+                }
+            cube.flush()
+            del cube
+            _write_meta(path, meta)
+
+
+def publish(matrices: Mapping[Tuple[str, date], Tuple[GridSpec, np.ndarray]]) -> None:
+    """Write heatmaps just stored in Postgres through to the store; a failure only costs a later reload."""
+    by_level: Dict[str, dict] = {}
+    for (level, day), value in matrices.items():
+        by_level.setdefault(level, {})[day] = value
+    for level, days in by_level.items():
+        try:
+            put_days(level, days)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Heatmap store not updated for level {level}: {exc}")
+
+
+def read_range(level: str, start: date, end: date) -> Tuple[np.ndarray, List[date], List[date]]:
+    """(sum of the stored heatmaps in [start, end], days summed, days on another grid).
+
+    Empty and other-grid slots are zero, so each month is one slice of the
+    mapped array summed over its day axis. A single day is copied out of the
+    mapped file while the month is locked, so a concurrent `put_days` cannot
+    change it under the caller.
+    """
+    grid = grid_for(level)
+    total = None
+    stored: List[date] = []
+    other: List[date] = []
+    for year, month, first, last in _months(start, end):
+        path = month_path(level, year, month)
+        if not os.path.exists(path):
+            continue
+        with _locked(path, exclusive=False):
+            meta = _read_meta(path)
+            if meta is None or GridSpec.from_dict(meta["grid"]) != grid:
+                continue
+            days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+            states = [meta["days"].get(day.isoformat(), {}).get("state") for day in days]
+            if STORED not in states:
+                other.extend(day for day, state in zip(days, states) if state == OTHER_GRID)
+                continue
+            cube = _mapped(path)[first.day - 1:last.day]
+            part = np.array(cube[0]) if len(cube) == 1 else cube.sum(axis=0, dtype=np.uint64)
+        total = part if total is None else total.astype(np.uint64) + part
+        stored.extend(day for day, state in zip(days, states) if state == STORED)
+        other.extend(day for day, state in zip(days, states) if state == OTHER_GRID)
+    if total is None:
+        total = np.zeros((grid.resolution, grid.resolution), dtype=STORAGE_DTYPE)
+    return total, stored, other
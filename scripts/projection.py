@@ -0,0 +1,74 @@
+"""Payload projection pushdown for the batch jobs.
+
+Each job declares the payload keys it needs and their dtypes. The projection
+renders one SQL expression per key (`payload->>'x'`, cast in Postgres), so the
+reader receives plain typed columns instead of a JSON dict per event, and the
+chunk DataFrames come back as NumPy float64/category columns named
+`payload_<key>`.
+
+Example:
+    HEATMAP = Projection([PayloadField("x", "float64"), PayloadField("y", "float64")])
+    sql = f"SELECT id, {HEATMAP.select_sql()} FROM events WHERE ..."
+    for chunk in iter_chunks(conn, text(sql), params, dtypes=HEATMAP.dtypes):
+        xs = chunk["payload_x"].to_numpy()
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable
+
+# Values that can be cast to float8 safely; anything else becomes NULL
+NUMERIC_RE = r'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$'
+
+_KEY_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Supported dtype -> Pandas dtype applied to each chunk
+_DTYPES = {
+    "float64": "float64",
+    "str": "category",
+}
+
+
+@dataclass(frozen=True)
+class PayloadField:
+    """One payload key extracted in SQL. `dtype` is "float64" or "str"."""
+
+    key: str
+    dtype: str = "float64"
+
+    def __post_init__(self):
+        # Keys are interpolated into SQL, so only plain identifiers are accepted
+        if not _KEY_RE.match(self.key):
+            raise ValueError(f"Invalid payload key: {self.key!r}")
+        if self.dtype not in _DTYPES:
+            raise ValueError(f"Unsupported dtype {self.dtype!r}; expected one of {sorted(_DTYPES)}")
+
+    @property
+    def column(self) -> str:
+        return f"payload_{self.key}"
+
+    def expr(self) -> str:
+        """SQL expression producing the typed value (NULL when missing or malformed)."""
+        raw = f"payload->>'{self.key}'"
+        if self.dtype == "float64":
+            return f"CASE WHEN {raw} ~ '{NUMERIC_RE}' THEN ({raw})::float8 END"
+        return raw
+
+
+class Projection:
+    """The set of payload fields a job reads."""
+
+    def __init__(self, fields: Iterable[PayloadField]):
+        self.fields = list(fields)
+        self._by_key = {f.key: f for f in self.fields}
+
+    def expr(self, key: str) -> str:
+        return self._by_key[key].expr()
+
+    def select_sql(self) -> str:
+        """Comma-separated `<expr> AS payload_<key>` list for a SELECT clause."""
+        return ", ".join(f"{f.expr()} AS {f.column}" for f in self.fields)
+
+    @property
+    def dtypes(self) -> Dict[str, str]:
+        """Column -> Pandas dtype, for `iter_chunks(dtypes=...)`."""
+        return {f.column: _DTYPES[f.dtype] for f in self.fields}
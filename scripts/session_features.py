@@ -0,0 +1,193 @@
+"""Per-session behavioral features for model training exports.
+
+`session_features` holds one row per session, computed from all of the
+session's events:
+
+- event_count, first_event_at, last_event_at, active_seconds (first to last
+  event)
+- jump_count, collision_count, jumps_per_second
+- score_max and score_velocity (score_max / active_seconds), from `score`
+  events like session_aggregates
+- inter_jump_mean/std/min/max: seconds between consecutive jumps
+
+The incremental ETL (scripts/etl_aggregate.py) refreshes the features of
+every session its chunk touched, and ETL backfill units those of the day's
+sessions, so `export_sessions` reads them with a join on the primary key
+instead of recomputing from raw events.
+
+Features are computed without a Python loop per session: events are read
+sorted by (session_id, timestamp), and per-session counts and extrema are
+`np.add.reduceat` / `np.maximum.reduceat` over the segment starts.
+"""
+import os
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, BigInteger, Float, Integer, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP, UUID, insert as pg_insert
+
+from scripts import runtime
+from scripts.projection import PayloadField, Projection
+
+metadata = MetaData()
+
+session_features = Table(
+    "session_features",
+    metadata,
+    Column("session_id", UUID(as_uuid=False), primary_key=True),
+    Column("event_count", BigInteger, nullable=False),
+    Column("first_event_at", TIMESTAMP(timezone=True)),
+    Column("last_event_at", TIMESTAMP(timezone=True)),
+    Column("active_seconds", Float, nullable=False),
+    Column("jump_count", Integer, nullable=False),
+    Column("collision_count", Integer, nullable=False),
+    Column("jumps_per_second", Float),
+    Column("score_max", Float),
+    Column("score_velocity", Float),
+    Column("inter_jump_mean", Float),
+    Column("inter_jump_std", Float),
+    Column("inter_jump_min", Float),
+    Column("inter_jump_max", Float),
+    Column("updated_at", TIMESTAMP(timezone=True), server_default=func.now(), nullable=False),
+)
+
+FEATURE_COLUMNS = [c.name for c in session_features.columns if c.name not in ("session_id", "updated_at")]
+
+FEATURE_FIELDS = Projection([PayloadField("score", "float64")])
+
+# All events of the given sessions in segment order; served by ix_events_session_id_timestamp
+FETCH_SESSION_EVENTS_SQL = runtime.statement(
+    "session_features.fetch_events",
+    f"""
+    SELECT session_id::text AS session_id, event_type, timestamp, {FEATURE_FIELDS.select_sql()}
+    FROM events
+    WHERE session_id = ANY(CAST(:session_ids AS uuid[]))
+    ORDER BY session_id, timestamp
+    """,
+)
+
+
+SESSIONS_IN_RANGE_SQL = runtime.statement(
+    "session_features.sessions_in_range",
+    """
+    SELECT DISTINCT session_id::text FROM events
+    WHERE timestamp >= :start AND timestamp < :end AND session_id IS NOT NULL
+    """,
+)
+
+
+def batch_sessions() -> int:
+    """Sessions whose events are read and featurized together."""
+    return int(os.getenv("SESSION_FEATURES_BATCH", "500"))
+
+
+def _per_segment(ufunc, values: np.ndarray, segment: np.ndarray, n: int) -> np.ndarray:
+    """`ufunc.reduceat` of sorted-by-segment values into n slots; NaN for segments with no values."""
+    out = np.full(n, np.nan)
+    if len(values):
+        present, starts = np.unique(segment, return_index=True)
+        out[present] = ufunc.reduceat(values, starts)
+    return out
+
+
+def compute_features(events: pd.DataFrame) -> pd.DataFrame:
+    """One feature row per session from events sorted by (session_id, timestamp).
+
+    Columns: session_id plus FEATURE_COLUMNS.
+    """
+    if events.empty:
+        return pd.DataFrame(columns=["session_id"] + FEATURE_COLUMNS)
+    session = events["session_id"].astype(object).to_numpy()
+    starts = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+    n = len(starts)
+    # Segment number of every event
+    segment = np.cumsum(np.r_[False, session[1:] != session[:-1]])
+
+    ts = pd.to_datetime(events["timestamp"], utc=True).dt.tz_convert(None).to_numpy()
+    # Seconds since the earliest event of the batch, so float64 keeps microseconds
+    seconds = (ts - ts.min()) / np.timedelta64(1, "s")
+    event_type = events["event_type"].astype(str).str.lower().to_numpy()
+    is_jump = event_type == "jump"
+    is_collision = event_type == "collision"
+    score = np.where(event_type == "score", events["payload_score"].to_numpy(dtype=float), np.nan)
+
+    first = np.minimum.reduceat(ts, starts)
+    last = np.maximum.reduceat(ts, starts)
+    active = (last - first) / np.timedelta64(1, "s")
+    jumps = np.add.reduceat(is_jump.astype(np.int64), starts)
+    collisions = np.add.reduceat(is_collision.astype(np.int64), starts)
+    score_max = np.fmax.reduceat(score, starts)
+
+    # Gaps between consecutive jumps of the same session (jump rows stay in segment order)
+    jump_seconds, jump_segment = seconds[is_jump], segment[is_jump]
+    same = jump_segment[1:] == jump_segment[:-1]
+    gaps, gap_segment = np.diff(jump_seconds)[same], jump_segment[1:][same]
+    gap_count = np.bincount(gap_segment, minlength=n)
+    gap_sum = _per_segment(np.add, gaps, gap_segment, n)
+    gap_sumsq = _per_segment(np.add, gaps * gaps, gap_segment, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap_mean = gap_sum / gap_count
+        gap_std = np.sqrt(np.maximum(gap_sumsq / gap_count - gap_mean ** 2, 0.0))
+        per_second = np.where(active > 0, 1.0 / active, np.nan)
+
+    return pd.DataFrame({
+        "session_id": session[starts],
+        "event_count": np.diff(np.r_[starts, len(session)]),
+        "first_event_at": pd.to_datetime(first, utc=True),
+        "last_event_at": pd.to_datetime(last, utc=True),
+        "active_seconds": active,
+        "jump_count": jumps,
+        "collision_count": collisions,
+        "jumps_per_second": jumps * per_second,
+        "score_max": score_max,
+        "score_velocity": score_max * per_second,
+        "inter_jump_mean": gap_mean,
+        "inter_jump_std": gap_std,
+        "inter_jump_min": _per_segment(np.minimum, gaps, gap_segment, n),
+        "inter_jump_max": _per_segment(np.maximum, gaps, gap_segment, n),
+    })
+
+
+def _value(v):
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    if isinstance(v, (np.integer,)):
+        return int(v)
+    if isinstance(v, (float, np.floating)):
+        return None if np.isnan(v) else float(v)
+    return v
+
+
+def upsert_features(conn, features: pd.DataFrame) -> int:
+    """Replace the stored features of these sessions; returns rows written."""
+    if features.empty:
+        return 0
+    rows = [
+        {col: _value(v) for col, v in zip(features.columns, r)}
+        for r in features.itertuples(index=False, name=None)
+    ]
+    stmt = pg_insert(session_features)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[session_features.c.session_id],
+        set_={**{col: stmt.excluded[col] for col in FEATURE_COLUMNS}, "updated_at": func.now()},
+    )
+    conn.execute(stmt, rows)
+    return len(rows)
+
+
+def refresh_sessions(conn, session_ids: Iterable[str]) -> int:
+    """Recompute the features of these sessions from all of their events; returns sessions written."""
+    ids: List[str] = sorted({str(s) for s in session_ids if s is not None and not pd.isna(s)})
+    written = 0
+    size = batch_sessions()
+    for i in range(0, len(ids), size):
+        result = conn.execute(FETCH_SESSION_EVENTS_SQL, {"session_ids": ids[i:i + size]})
+        events = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+        written += upsert_features(conn, compute_features(events))
+    return written
+
+
+def refresh_range(conn, start, end) -> int:
+    """Recompute the features of every session with events in [start, end); returns sessions written."""
+    return refresh_sessions(conn, conn.execute(SESSIONS_IN_RANGE_SQL, {"start": start, "end": end}).scalars())
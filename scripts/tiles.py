@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""Multi-resolution heatmap tile pyramids.
+
+The daily 50x50 matrices are fine for an overview but too coarse up close,
+and a single fine matrix is too large to send to the dashboard. A pyramid
+stores each (level, date) at several zooms, cut into square tiles of
+`HEATMAP_TILE_SIZE` cells:
+
+- zoom `HEATMAP_MAX_ZOOM` is binned once from the day's position events on
+  the level's world grid (scripts/grids.py) at tile_size * 2**max_zoom cells
+  per side;
+- every coarser zoom is the one below summed over 2x2 cells
+  (`reshape(n/2, 2, n/2, 2).sum(axis=(1, 3))`), down to zoom 0, a single
+  tile covering the whole world.
+
+Only non-empty tiles are stored, compressed like the daily matrices
+(scripts/heatmap_codec.py), in `heatmap_tiles`. A viewport at a given zoom
+needs at most a few tiles, so the API payload stays the same size however
+fine the finest zoom is.
+
+Usage:
+  python -m scripts.tiles --date 2025-11-16 --levels 1,2,3
+"""
+import argparse
+import math
+import os
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import MetaData, Table, Column, String, Date, Float, Integer, LargeBinary, SmallInteger, delete
+
+from scripts import runtime
+from scripts.grids import GridSpec, grid_for
+from scripts.heatmap import build_heatmaps
+from scripts.heatmap_codec import encode_counts
+
+
+def tile_size() -> int:
+    return int(os.getenv("HEATMAP_TILE_SIZE", "64"))
+
+
+def max_zoom() -> int:
+    return int(os.getenv("HEATMAP_MAX_ZOOM", "4"))
+
+
+def _define_tiles(meta: MetaData) -> Table:
+    return Table(
+        "heatmap_tiles",
+        meta,
+        Column("level", String, primary_key=True),
+        Column("date", Date, primary_key=True),
+        Column("zoom", SmallInteger, primary_key=True),
+        Column("tile_x", Integer, primary_key=True),
+        Column("tile_y", Integer, primary_key=True),
+        # World bounds of the whole pyramid (the level's grid)
+        Column("x_min", Float, nullable=False),
+        Column("x_max", Float, nullable=False),
+        Column("y_min", Float, nullable=False),
+        Column("y_max", Float, nullable=False),
+        Column("tile_size", Integer, nullable=False),
+        Column("data", LargeBinary, nullable=False),
+    )
+
+
+def tiles_table(create: bool = True):
+    """The `heatmap_tiles` table, reflected once per process (created if missing when `create`)."""
+    return runtime.get_table("heatmap_tiles", create=_define_tiles if create else None)
+
+
+def pyramid_grid(level: str, size: int | None = None, zoom: int | None = None) -> GridSpec:
+    """The level's world grid at the resolution of the finest zoom."""
+    size = size or tile_size()
+    zoom = max_zoom() if zoom is None else zoom
+    grid = grid_for(level)
+    return GridSpec(grid.x_min, grid.x_max, grid.y_min, grid.y_max, resolution=size * 2 ** zoom)
+
+
+def build_pyramid(finest: np.ndarray, size: int) -> List[np.ndarray]:
+    """Every zoom of a square matrix of size * 2**k cells, coarsest (zoom 0, one tile) first.
+
+    Each coarser zoom sums 2x2 blocks of the one below, so counts are
+    preserved exactly at every zoom.
+    """
+    tiles_per_side = finest.shape[0] // size
+    if finest.shape[0] % size or tiles_per_side & (tiles_per_side - 1):
+        raise ValueError(f"Matrix side {finest.shape[0]} is not tile size {size} times a power of two")
+    zooms = [finest]
+    while zooms[-1].shape[0] > size:
+        n = zooms[-1].shape[0] // 2
+        zooms.append(zooms[-1].reshape(n, 2, n, 2).sum(axis=(1, 3)))
+    zooms.reverse()
+    return zooms
+
+
+def split_tiles(matrix: np.ndarray, size: int) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """(tile_x, tile_y, tile) for the non-empty size x size tiles of a matrix (rows=Y)."""
+    n = matrix.shape[0] // size
+    # (tile_y, row, tile_x, col) -> (tile_y, tile_x, row, col)
+    blocks = matrix.reshape(n, size, n, size).swapaxes(1, 2)
+    nonempty = blocks.sum(axis=(2, 3)) > 0
+    for ty, tx in zip(*np.nonzero(nonempty)):
+        yield int(tx), int(ty), blocks[ty, tx]
+
+
+def tiles_for_viewport(
+    grid: GridSpec, zoom: int, x_min: float, x_max: float, y_min: float, y_max: float
+) -> Tuple[range, range]:
+    """Tile x and y ranges at `zoom` covering a world-coordinate viewport (clamped to the grid)."""
+    n = 2 ** zoom
+
+    def span(lo, hi, g_lo, g_hi):
+        first = math.floor((lo - g_lo) / (g_hi - g_lo) * n)
+        last = math.ceil((hi - g_lo) / (g_hi - g_lo) * n) - 1
+        return range(max(first, 0), min(max(last, first), n - 1) + 1)
+
+    return span(x_min, x_max, grid.x_min, grid.x_max), span(y_min, y_max, grid.y_min, grid.y_max)
+
+
+def tile_bounds(grid: GridSpec, zoom: int, tile_x: int, tile_y: int) -> dict:
+    n = 2 ** zoom
+    dx, dy = (grid.x_max - grid.x_min) / n, (grid.y_max - grid.y_min) / n
+    return {
+        "x_min": grid.x_min + tile_x * dx,
+        "x_max": grid.x_min + (tile_x + 1) * dx,
+        "y_min": grid.y_min + tile_y * dy,
+        "y_max": grid.y_min + (tile_y + 1) * dy,
+    }
+
+
+def pyramid_rows(level: str, target_date: date, finest: np.ndarray, grid: GridSpec, size: int) -> List[dict]:
+    rows = []
+    for zoom, matrix in enumerate(build_pyramid(finest, size)):
+        for tx, ty, tile in split_tiles(matrix, size):
+            rows.append({
+                "level": level,
+                "date": target_date,
+                "zoom": zoom,
+                "tile_x": tx,
+                "tile_y": ty,
+                "x_min": grid.x_min,
+                "x_max": grid.x_max,
+                "y_min": grid.y_min,
+                "y_max": grid.y_max,
+                "tile_size": size,
+                "data": encode_counts(tile)[0],
+            })
+    return rows
+
+
+def build_tile_pyramids(engine, levels: Sequence[str], target_date: date) -> Dict[str, int]:
+    """Bin one scan of the day at the finest zoom for every level and replace its stored tiles.
+
+    Returns {level: tiles written}.
+    """
+    size, zoom = tile_size(), max_zoom()
+    levels = list(dict.fromkeys(levels))
+    grids = {level: pyramid_grid(level, size, zoom) for level in levels}
+    finest_matrices, _ = build_heatmaps(engine, levels, target_date, grids=grids)
+
+    table = tiles_table()
+    written = {}
+    with engine.begin() as conn:
+        for level, finest in finest_matrices.items():
+            rows = pyramid_rows(level, target_date, finest, grids[level], size)
+            conn.execute(delete(table).where(table.c.level == level, table.c.date == target_date))
+            if rows:
+                conn.execute(table.insert(), rows)
+            written[level] = len(rows)
+    print(f"Stored tile pyramids for date={target_date}: {written}")
+    return written
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build heatmap tile pyramids for a date.")
+    ap.add_argument("--date", required=True, help="Date (YYYY-MM-DD)")
+    ap.add_argument("--levels", default=os.getenv("HEATMAP_LEVELS", "1"), help="Comma-separated levels")
+    args = ap.parse_args(argv)
+    try:
+        target_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+    except ValueError:
+        raise SystemExit("Invalid --date format; expected YYYY-MM-DD")
+    levels = [lvl.strip() for lvl in args.levels.split(",") if lvl.strip()]
+    build_tile_pyramids(runtime.get_engine(), levels, target_date)
+
+
+if __name__ == "__main__":
+    main()
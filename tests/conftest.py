@@ -0,0 +1,60 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import get_db
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def heatmap_store_dir(tmp_path, monkeypatch):
+    """Each test gets an empty local heatmap store (scripts/heatmap_store.py)."""
+    monkeypatch.setenv("HEATMAP_STORE_DIR", str(tmp_path / "heatmap_store"))
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class FakeDb:
+    """Stands in for the session `get_db` yields.
+
+    `execute` records (sql, params) in `calls` and answers with `rows`, or with
+    `respond(sql, params)` when given.
+    """
+
+    def __init__(self, rows=(), respond=None):
+        self.rows = rows
+        self.respond = respond
+        self.calls = []
+
+    @property
+    def params(self):
+        return self.calls[-1][1] if self.calls else None
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        self.calls.append((sql, params))
+        return FakeResult(self.rows if self.respond is None else self.respond(sql, params))
+
+
+@pytest.fixture
+def db_client():
+    """`db_client(rows)` or `db_client(respond=...)`: a TestClient whose `get_db` yields a FakeDb, and the FakeDb."""
+    def make(rows=(), respond=None):
+        db = FakeDb(rows, respond)
+
+        async def fake_db():
+            yield db
+
+        app.dependency_overrides[get_db] = fake_db
+        return TestClient(app), db
+
+    yield make
+    app.dependency_overrides.pop(get_db, None)
@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Insert
+
+from scripts import backfill
+from scripts.backfill import BackfillUnit, batch_units, plan_units
+
+
+def test_plan_units_covers_range_inclusive():
+    units = plan_units(["etl", "heatmap"], ["1", "2"], date(2025, 11, 30), date(2025, 12, 1))
+    assert units == [
+        BackfillUnit("etl", "", date(2025, 11, 30)),
+        BackfillUnit("heatmap", "1", date(2025, 11, 30)),
+        BackfillUnit("heatmap", "2", date(2025, 11, 30)),
+        BackfillUnit("etl", "", date(2025, 12, 1)),
+        BackfillUnit("heatmap", "1", date(2025, 12, 1)),
+        BackfillUnit("heatmap", "2", date(2025, 12, 1)),
+    ]
+
+
+def test_plan_units_single_task():
+    units = plan_units(["heatmap"], ["1"], date(2025, 1, 1), date(2025, 1, 3))
+    assert [u.date.day for u in units] == [1, 2, 3]
+    assert all(u.task == "heatmap" for u in units)
+
+
+def test_units_of_a_task_and_date_run_as_one_batch():
+    units = plan_units(["etl", "heatmap"], ["1", "2"], date(2025, 1, 1), date(2025, 1, 2))
+    assert [[(u.task, u.level) for u in batch] for batch in batch_units(units)] == [
+        [("etl", "")], [("heatmap", "1"), ("heatmap", "2")],
+    ] * 2
+
+
+class _Checkpoints:
+    """Engine whose connections read and upsert `backfill_checkpoints` rows in memory."""
+
+    def __init__(self):
+        self.rows = {}
+        self.lock = threading.Lock()
+
+    def connect(self):
+        return _CheckpointConn(self)
+
+    begin = connect
+
+
+class _CheckpointConn:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement):
+        if isinstance(statement, Insert):
+            params = statement.compile(dialect=postgresql.dialect()).params
+            key = (params["run_name"], params["task"], params["level"], params["date"])
+            with self.engine.lock:
+                self.engine.rows[key] = params["stats"]
+            return None
+        return [BackfillUnit(task, level, day) for (_, task, level, day) in self.engine.rows]
+
+
+class _Pool(ThreadPoolExecutor):
+    """Thread stand-in for the spawn process pool."""
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        super().__init__(max_workers, initializer=initializer, initargs=initargs)
+
+
+def _backfill(monkeypatch, engine, fail_days=()):
+    calls = []
+
+    def recompute_heatmaps(engine, levels, day):
+        calls.append((day, list(levels)))
+        if day in fail_days:
+            raise RuntimeError("connection reset")
+        return {level: np.ones((2, 2)) for level in levels}, {level: 4 for level in levels}
+
+    monkeypatch.setattr(backfill.runtime, "get_engine", lambda: engine)
+    monkeypatch.setattr("scripts.heatmap_accumulate.recompute_heatmaps", recompute_heatmaps)
+    monkeypatch.setattr(backfill, "ProcessPoolExecutor", _Pool)
+    return calls
+
+
+def test_resume_skips_done_units_and_retries_failed_ones(monkeypatch):
+    engine = _Checkpoints()
+    days = backfill.date_range(date(2025, 1, 1), date(2025, 1, 3))
+
+    calls = _backfill(monkeypatch, engine, fail_days={days[1]})
+    units = plan_units(["heatmap"], ["1", "2"], days[0], days[-1])
+    summary = backfill.run_backfill("history", units, workers=3, db_concurrency=2)
+    assert summary == {"planned": 6, "skipped": 0, "done": 4, "failed": 2}
+    assert sorted(calls) == [(day, ["1", "2"]) for day in days]
+    # Every finished unit has its own checkpoint with its level's stats
+    assert engine.rows[("history", "heatmap", "2", days[0])]["events"] == 4
+    assert {key[2:] for key in engine.rows} == {(level, day) for level in "12" for day in (days[0], days[2])}
+
+    # Next run adds level 3: the failed day runs in full, the others only for the new level
+    calls = _backfill(monkeypatch, engine)
+    units = plan_units(["heatmap"], ["1", "2", "3"], days[0], days[-1])
+    summary = backfill.run_backfill("history", units, workers=3, db_concurrency=2)
+    assert summary == {"planned": 9, "skipped": 4, "done": 5, "failed": 0}
+    assert sorted(calls) == [(days[0], ["3"]), (days[1], ["1", "2", "3"]), (days[2], ["3"])]
+    assert len(engine.rows) == 9
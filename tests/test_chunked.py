@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from scripts.chunked import reduce_chunks
+from scripts.etl_aggregate import merge_summaries, summarize_sessions
+from scripts.grids import GridSpec
+from scripts.heatmap import GRID_SIZE, bin_levels_chunk, compute_heatmap
+
+
+def _events(n):
+    return pd.DataFrame({
+        "session_id": [f"s{i % 3}" for i in range(n)],
+        "event_type": ["score" if i % 2 else "jump" for i in range(n)],
+        "timestamp": pd.date_range("2025-11-16", periods=n, freq="s", tz="UTC"),
+        "payload_score": np.arange(n, dtype=float),
+    })
+
+
+def _split(df, size):
+    return [df.iloc[i:i + size].reset_index(drop=True) for i in range(0, len(df), size)]
+
+
+def test_chunked_session_summary_matches_full():
+    df = _events(50)
+    full = summarize_sessions(df.copy()).set_index("session_id").sort_index()
+    merged = reduce_chunks(_split(df, 7), summarize_sessions, merge_summaries).set_index("session_id").sort_index()
+    pd.testing.assert_frame_equal(full, merged, check_dtype=False)
+
+
+def test_chunked_heatmap_matches_full():
+    df = pd.DataFrame({"payload_x": np.arange(40) % 7, "payload_y": np.arange(40) % 5})
+    full = compute_heatmap(df)
+    grid = GridSpec(0.0, 6.0, 0.0, 4.0, resolution=GRID_SIZE)
+
+    def binned(chunk):
+        x, y = chunk["payload_x"].to_numpy(dtype=float), chunk["payload_y"].to_numpy(dtype=float)
+        return bin_levels_chunk(np.zeros(len(chunk), dtype=np.int64), x, y, [grid])[0]
+
+    summed = reduce_chunks(_split(df, 9), binned, np.add)
+    np.testing.assert_array_equal(full, summed)
+
+
+def test_reduce_chunks_empty_stream():
+    assert reduce_chunks([], len, lambda a, b: a + b) is None
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.user_scores import LATEST_VERSION_SQL, UserScoreCache
+from scripts.churn_scoring import FEATURE_NAMES, ChurnModel, load_model, score_frame
+
+
+def test_default_model_scores_one_matmul():
+    model = load_model()
+    rng = np.random.default_rng(1)
+    features = pd.DataFrame(rng.uniform(0, 20, (1000, len(FEATURE_NAMES))), columns=FEATURE_NAMES)
+    scores = score_frame(model, features)
+    X = features[list(model.features)].to_numpy()
+    expected = [
+        1 / (1 + np.exp(-(sum(c * (x - m) / s for x, m, s, c in zip(row, model.means, model.scales, model.coefficients))
+                          + model.intercept)))
+        for row in X[:20]
+    ]
+    np.testing.assert_allclose(scores[:20], expected)
+    assert ((scores > 0) & (scores < 1)).all()
+
+
+def test_missing_features_count_as_the_mean():
+    model = load_model()
+    features = pd.DataFrame([[None] * len(FEATURE_NAMES)], columns=FEATURE_NAMES)
+    assert score_frame(model, features)[0] == pytest.approx(1 / (1 + np.exp(-model.intercept)))
+
+
+def test_model_validation():
+    with pytest.raises(ValueError):
+        ChurnModel("x", ("nope",), np.zeros(1), np.ones(1), np.zeros(1), 0.0)
+    with pytest.raises(ValueError):
+        ChurnModel("x", ("sessions",), np.zeros(2), np.ones(1), np.zeros(1), 0.0)
+
+
+def test_scores_a_million_users():
+    model = load_model()
+    X = np.random.default_rng(2).uniform(0, 20, (1_000_000, len(model.features)))
+    assert model.score(X).shape == (1_000_000,)
+
+
+class _Db:
+    def __init__(self):
+        self.version = "v1"
+        self.score = 0.25
+        self.reads = 0
+
+    async def execute(self, statement, params=None):
+        if statement is LATEST_VERSION_SQL:
+            return SimpleNamespace(scalar=lambda: self.version)
+        self.reads += 1
+        row = SimpleNamespace(
+            churn_score=self.score, model_version="churn-v1", score_version=self.version,
+            scored_at=datetime(2025, 11, 16, tzinfo=timezone.utc),
+        )
+        return SimpleNamespace(first=lambda: row)
+
+
+def test_cache_invalidates_on_new_version():
+    now = [0.0]
+    cache = UserScoreCache(max_size=2, check_seconds=30, clock=lambda: now[0])
+    db = _Db()
+
+    async def run():
+        assert (await cache.get(db, "a"))["churn_score"] == 0.25
+        await cache.get(db, "a")
+        assert db.reads == 1
+
+        # A new run is only noticed at the next version check
+        db.version, db.score = "v2", 0.75
+        assert (await cache.get(db, "a"))["churn_score"] == 0.25
+        now[0] = 31
+        assert (await cache.get(db, "a"))["score_version"] == "v2"
+        assert db.reads == 2
+
+        # Least recently used entries are evicted
+        await cache.get(db, "b")
+        await cache.get(db, "c")
+        await cache.get(db, "a")
+        assert db.reads == 5
+
+    asyncio.run(run())
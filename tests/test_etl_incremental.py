@@ -0,0 +1,88 @@
+import pandas as pd
+
+from scripts import etl_aggregate
+from scripts.checkpoints import MIN_WATERMARK
+from scripts.etl_aggregate import after_watermark, summarize_sessions
+
+
+def test_summarize_sessions_chunk():
+    df = pd.DataFrame([
+        {"session_id": "s1", "event_type": "score", "timestamp": "2025-11-16T12:00:00Z", "payload_score": 3.0},
+        {"session_id": "s1", "event_type": "score", "timestamp": "2025-11-16T12:00:05Z", "payload_score": 7.0},
+        {"session_id": "s1", "event_type": "jump", "timestamp": "2025-11-16T12:00:06Z", "payload_score": 99.0},
+        {"session_id": "s2", "event_type": "jump", "timestamp": "2025-11-16T12:01:00Z", "payload_score": None},
+    ])
+    result = summarize_sessions(df).set_index("session_id")
+    assert result.loc["s1", "event_count"] == 3
+    # Only score events contribute to the max
+    assert result.loc["s1", "max_score"] == 7
+    assert pd.isna(result.loc["s2", "max_score"])
+    assert result.loc["s1", "last_event_at"] == pd.Timestamp("2025-11-16T12:00:06Z")
+
+
+def test_summarize_sessions_empty():
+    assert summarize_sessions(pd.DataFrame()).empty
+
+
+class _Conn:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        self.log.append(str(statement).split("(")[0].replace("SELECT ", ""))
+
+    def commit(self):
+        pass
+
+
+class _Engine:
+    def __init__(self):
+        self.log = []
+
+    def connect(self):
+        return _Conn(self.log)
+
+    begin = connect
+
+
+def test_run_holds_lock_and_reads_watermark_under_it(monkeypatch):
+    engine = _Engine()
+    chunk = pd.DataFrame([{
+        "id": "00000000-0000-0000-0000-000000000002", "session_id": "s1", "event_type": "jump",
+        "timestamp": pd.Timestamp("2025-11-16T12:00:00Z"), "created_at": pd.Timestamp("2025-11-16T12:00:00Z"),
+        "payload_score": None,
+    }])
+    monkeypatch.setattr(etl_aggregate, "get_engine", lambda: engine)
+    monkeypatch.setattr(etl_aggregate, "load_watermark", lambda conn, job: engine.log.append("load") or MIN_WATERMARK)
+    monkeypatch.setattr(etl_aggregate, "iter_chunks", lambda *a, **k: iter([chunk]))
+    monkeypatch.setattr(etl_aggregate, "merge_session_aggregates", lambda conn, summary: len(summary))
+    monkeypatch.setattr(etl_aggregate.session_features, "refresh_sessions", lambda conn, ids: len(ids))
+    monkeypatch.setattr(etl_aggregate, "save_watermark", lambda *a: engine.log.append("save"))
+
+    assert etl_aggregate.main()["rows"] == 1
+    assert engine.log[0] == "pg_advisory_lock"
+    assert engine.log[1] == "load"
+    # Re-read under the per-chunk lock
+    assert engine.log[2:4] == ["pg_advisory_xact_lock", "load"]
+    assert engine.log[-1] == "pg_advisory_unlock"
+    assert "save" in engine.log
+
+
+def test_after_watermark_drops_merged_rows():
+    ts = pd.Timestamp("2025-11-16T12:00:00Z")
+    df = pd.DataFrame({
+        "id": ["00000000-0000-0000-0000-00000000000a", "00000000-0000-0000-0000-00000000000b",
+               "00000000-0000-0000-0000-000000000001"],
+        "created_at": [ts, ts, ts + pd.Timedelta(seconds=1)],
+    })
+    kept = after_watermark(df, (ts.to_pydatetime(), "00000000-0000-0000-0000-00000000000a"))
+    assert list(kept["id"].str[-1]) == ["b", "1"]
+    later = (ts + pd.Timedelta(seconds=1)).to_pydatetime()
+    assert after_watermark(df, (later, "ffffffff-0000-0000-0000-000000000000")).empty
+    assert len(after_watermark(df, MIN_WATERMARK)) == 3
@@ -0,0 +1,71 @@
+import json
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from scripts import event_lake
+
+DAY = datetime(2025, 11, 16, tzinfo=timezone.utc)
+
+
+def _events(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": [str(uuid.uuid4()) for _ in range(n)],
+        "user_id": [str(uuid.uuid4()) for _ in range(n)],
+        "session_id": rng.choice(["s1", "s2", None], n),
+        "event_type": rng.choice(["position", "collision"], n),
+        "event_name": "tick",
+        "event_category": None,
+        "timestamp": [DAY + timedelta(hours=int(h)) for h in rng.integers(-30, 30, n)],
+        "created_at": [DAY] * n,
+        "payload": "{}",
+        "payload_x": rng.uniform(0, 700, n),
+        "payload_y": rng.uniform(0, 560, n),
+        "payload_score": np.nan,
+        "payload_final_score": np.nan,
+        "payload_level": rng.choice(["1", "2"], n),
+    })
+
+
+def test_partitioned_write_and_filtered_read(tmp_path):
+    df = _events(2000)
+    rows = event_lake.write_tables([event_lake.chunk_table(df[:800]), event_lake.chunk_table(df[800:])], tmp_path, "r1")
+    assert rows == 2000
+
+    # One file per partition for the run, strings dictionary-encoded
+    files = event_lake.open_lake(str(tmp_path)).files
+    assert len(files) == 8
+    assert all("/date=" in f and "/event_type=" in f for f in files)
+    assert pq.read_schema(files[0]).field("session_id").type.value_type == "string"
+
+    table = event_lake.query_lake(
+        ["timestamp", "payload_x"], date(2025, 11, 16), date(2025, 11, 16), ["collision"], root=str(tmp_path)
+    )
+    assert table.column_names == ["timestamp", "payload_x"]
+    ts = pd.to_datetime(df["timestamp"], utc=True)
+    expected = ((df["event_type"] == "collision") & (ts.dt.date == date(2025, 11, 16))).sum()
+    assert table.num_rows == expected
+
+
+def test_unknown_columns_rejected(tmp_path):
+    with pytest.raises(ValueError, match="nope"):
+        event_lake.query_lake(["nope"], root=str(tmp_path))
+
+
+def test_recover_staged_promotes_committed_runs_only(tmp_path):
+    staging = os.path.join(tmp_path, "_staging")
+    for run_id, upto in (("committed", DAY), ("uncommitted", DAY + timedelta(hours=1))):
+        event_lake.write_tables([event_lake.chunk_table(_events(50))], os.path.join(staging, run_id), run_id)
+        with open(os.path.join(staging, run_id, "_run.json"), "w") as fh:
+            json.dump({"upto": [upto.isoformat(), str(uuid.UUID(int=5))]}, fh)
+
+    promoted = event_lake.recover_staged(str(tmp_path), (DAY, str(uuid.UUID(int=5))))
+    assert promoted == ["committed"]
+    assert os.listdir(staging) == []
+    assert event_lake.query_lake(root=str(tmp_path)).num_rows == 50
@@ -0,0 +1,44 @@
+import asyncio
+import io
+import uuid
+from datetime import datetime, timezone
+
+import pyarrow.parquet as pq
+
+from app.api.exports import SESSION_EXPORT_SCHEMA, parquet_stream
+
+
+def _rows(n):
+    start = datetime(2025, 11, 16, tzinfo=timezone.utc)
+    return [
+        (str(uuid.uuid4()), str(uuid.uuid4()), start, None, 30, "web", "1.0", None if i % 2 else float(i),
+         4, 1, 30.0, 4 / 30, 0.5, 2.0, 0.5, 1.0, 3.0)
+        for i in range(n)
+    ]
+
+
+def _collect(partitions):
+    async def run():
+        async def source():
+            for rows in partitions:
+                yield rows
+
+        return [chunk async for chunk in parquet_stream(source())]
+
+    return asyncio.run(run())
+
+
+def test_one_row_group_per_partition_streamed_as_written():
+    chunks = _collect([_rows(10), _rows(10), _rows(5)])
+    # A chunk per row group plus the footer
+    assert len(chunks) == 4 and all(chunks)
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.schema == SESSION_EXPORT_SCHEMA and table.num_rows == 25
+    assert table.column("final_score").null_count == 12
+
+
+def test_empty_export_is_a_valid_file():
+    table = pq.read_table(io.BytesIO(b"".join(_collect([]))))
+    assert table.num_rows == 0 and table.schema == SESSION_EXPORT_SCHEMA
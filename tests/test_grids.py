@@ -0,0 +1,18 @@
+import pytest
+
+from scripts.grids import DEFAULT_GRID, GridSpec, grid_for
+
+
+def test_grid_for_uses_configured_level(monkeypatch):
+    monkeypatch.setenv("HEATMAP_GRIDS", '{"2": {"x_min": 0, "x_max": 100, "y_min": 0, "y_max": 80, "resolution": 20}}')
+    assert grid_for("2") == GridSpec(0, 100, 0, 80, resolution=20)
+    assert grid_for("1") == DEFAULT_GRID
+    assert grid_for(None) == DEFAULT_GRID
+
+
+def test_overrides_and_validation():
+    grid = DEFAULT_GRID.with_bounds(x_max=350)
+    assert grid.x_max == 350 and grid.y_max == DEFAULT_GRID.y_max
+    assert GridSpec.from_dict(grid.to_dict()) == grid
+    with pytest.raises(ValueError):
+        GridSpec(10, 10, 0, 1)
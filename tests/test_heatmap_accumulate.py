@@ -0,0 +1,133 @@
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData
+
+from scripts.grids import DEFAULT_GRID
+from scripts.heatmap import bin_levels_chunk
+from scripts.checkpoints import MIN_WATERMARK
+from scripts.heatmap_accumulate import (
+    JOB_NAME,
+    MAX_UUID,
+    accumulate_chunks,
+    advance_watermark,
+    combine,
+    group_levels,
+    level_job,
+    load_level_watermarks,
+)
+from scripts.heatmap_cube import CubeKey
+
+DAY = datetime(2025, 11, 16, tzinfo=timezone.utc)
+
+
+def _events(n, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "payload_x": rng.uniform(0, 700, n),
+        "payload_y": rng.uniform(0, 560, n),
+        "payload_level": rng.choice(["1", "2", "9"], n),
+        "timestamp": [DAY + timedelta(hours=int(h)) for h in rng.integers(-30, 30, n)],
+        "event_type": rng.choice(["position", "collision"], n),
+        "platform": rng.choice(["web", "mobile", None], n),
+        "game_version": "1.0",
+    })
+
+
+def test_cube_cells_key_on_utc_event_date():
+    df = _events(3000)
+    counts, _ = accumulate_chunks([df], ["1", "2"])
+    days = {date(2025, 11, 14), date(2025, 11, 15), date(2025, 11, 16), date(2025, 11, 17)}
+    assert {(key.level, key.date) for key in counts} == {(lvl, d) for lvl in ("1", "2") for d in days}
+    day = pd.to_datetime(df["timestamp"], utc=True).dt.date
+    platform = df["platform"].fillna("unknown")
+    for key, matrix in counts.items():
+        pick = (
+            (df["payload_level"] == key.level) & (day == key.date)
+            & (platform == key.platform) & (df["event_type"] == key.event_type)
+        ).to_numpy()
+        expected = bin_levels_chunk(
+            np.zeros(pick.sum(), dtype=np.int64),
+            df["payload_x"].to_numpy()[pick], df["payload_y"].to_numpy()[pick], [DEFAULT_GRID],
+        )[0]
+        np.testing.assert_array_equal(matrix, expected)
+
+
+def test_settled_plus_tail_matches_full_recompute():
+    df = _events(4000, seed=11)
+    full, rows = accumulate_chunks([df], ["1", "2"])
+    assert rows == 4000
+
+    # First run settles part of the stream; the rest is still in the tail
+    settled1, _ = accumulate_chunks([df.iloc[:1500]], ["1", "2"])
+    tail1, _ = accumulate_chunks([df.iloc[1500:]], ["1", "2"])
+    run1 = combine({}, settled1, tail1)
+    # Second run settles more of the tail on top of the stored bases
+    stored = {key: (grid, base) for key, (base, _, grid) in run1.items()}
+    settled2, _ = accumulate_chunks([df.iloc[1500:3000]], ["1", "2"])
+    tail2, _ = accumulate_chunks([df.iloc[3000:]], ["1", "2"])
+    run2 = combine(stored, settled2, tail2)
+
+    for key, expected in full.items():
+        base, published, _ = run2.get(key, run1.get(key))
+        np.testing.assert_array_equal(published, expected)
+    for key, (base, _, _) in run2.items():
+        np.testing.assert_array_equal(base, accumulate_chunks([df.iloc[:3000]], ["1", "2"])[0][key])
+
+
+def test_base_restarts_when_grid_changed(caplog):
+    key = CubeKey("1", date(2025, 11, 16), "web", "1.0", "position")
+    other = DEFAULT_GRID.with_bounds(x_max=100)
+    stale = np.ones((DEFAULT_GRID.resolution,) * 2, dtype=np.int64)
+    out = combine({key: (other, stale)}, {key: np.zeros((50, 50), dtype=np.int64)}, {})
+    assert out[key][0].sum() == 0
+    assert "settled counts restart" in caplog.text
+
+
+def test_watermark_only_moves_forward():
+    current = (DAY, "00000000-0000-0000-0000-000000000007")
+    assert advance_watermark(current, DAY + timedelta(minutes=1)) == (DAY + timedelta(minutes=1), MAX_UUID)
+    assert advance_watermark(current, DAY - timedelta(minutes=1)) == current
+
+
+def test_levels_group_by_watermark():
+    old, new = (DAY, MAX_UUID), MIN_WATERMARK
+    previous = {"1": old, "2": old, "3": new}
+    assert group_levels(["1", "2", "3"], previous) == {(old,): ["1", "2"], (new,): ["3"]}
+    advanced = {level: (DAY + timedelta(minutes=5), MAX_UUID) for level in previous}
+    assert list(group_levels(["1", "2", "3"], previous, advanced).values()) == [["1", "2"], ["3"]]
+
+
+class _CheckpointConn:
+    """Answers checkpoint lookups from `saved` and the settled-counts probe from `settled_levels`."""
+
+    def __init__(self, saved, settled_levels):
+        self.saved = saved
+        self.settled_levels = settled_levels
+
+    def execute(self, statement):
+        params = statement.compile().params
+        if "etl_checkpoints" in str(statement):
+            found = self.saved.get(params["job_name_1"])
+            return _First((SimpleNamespace(last_created_at=found[0], last_id=found[1]),) if found else ())
+        return _First(("x",) if params["level_1"] in self.settled_levels else ())
+
+
+class _First:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+
+def test_level_watermarks_fall_back_to_the_legacy_one_only_for_settled_levels():
+    from scripts import heatmap as heatmap_mod
+
+    legacy, own = (DAY, MAX_UUID), (DAY + timedelta(hours=1), MAX_UUID)
+    conn = _CheckpointConn({JOB_NAME: legacy, level_job("2"): own}, settled_levels={"1", "2"})
+    table = heatmap_mod._define_heatmaps(MetaData())
+    # "3" was added to HEATMAP_LEVELS later: its history is settled from the start
+    assert load_level_watermarks(conn, table, ["1", "2", "3"]) == {"1": legacy, "2": own, "3": MIN_WATERMARK}
@@ -0,0 +1,77 @@
+import base64
+import json
+import zlib
+from collections import namedtuple
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.api.heatmap_api import BASE64_MEDIA_TYPE, BINARY_MEDIA_TYPE, JSON_MEDIA_TYPE, negotiate
+from scripts.heatmap_codec import decode_counts, encode_counts
+
+Row = namedtuple(
+    "Row", "date grid_size x_min x_max y_min y_max matrix_data matrix_shape matrix_dtype updated_at"
+)
+
+
+def _counts(seed=5, resolution=50):
+    rng = np.random.default_rng(seed)
+    counts = np.zeros((resolution, resolution), dtype=np.int64)
+    counts[rng.integers(0, resolution, 200), rng.integers(0, resolution, 200)] = rng.integers(1, 5000, 200)
+    return counts
+
+
+def test_roundtrip_and_size():
+    counts = _counts(resolution=200)
+    data, shape, dtype = encode_counts(counts.astype(float))
+    np.testing.assert_array_equal(decode_counts(data, shape, dtype), counts)
+    assert len(data) * 20 < len(json.dumps(counts.astype(float).tolist()))
+
+
+def test_rejects_values_outside_uint32():
+    with pytest.raises(ValueError):
+        encode_counts(np.array([[-1, 2]]))
+    with pytest.raises(ValueError):
+        encode_counts(np.array([[2 ** 32]]))
+
+
+def test_negotiate():
+    assert negotiate(None) == JSON_MEDIA_TYPE
+    assert negotiate("*/*") == JSON_MEDIA_TYPE
+    assert negotiate("application/octet-stream") == BINARY_MEDIA_TYPE
+    assert negotiate(f"application/json;q=0.5, {BASE64_MEDIA_TYPE}") == BASE64_MEDIA_TYPE
+    assert negotiate("text/html") is None
+
+
+def _row(day, counts):
+    data, shape, dtype = encode_counts(counts)
+    return Row(day, "50", 0.0, 700.0, 0.0, 560.0, data, shape, dtype, datetime(2025, 11, 18, tzinfo=timezone.utc))
+
+
+def test_heatmap_endpoint_formats(db_client):
+    counts = _counts()
+    client, _ = db_client([_row(date(2025, 11, 16), counts)])
+    params = {"level": "1", "date": "2025-11-16"}
+
+    body = client.get("/api/v1/heatmap", params=params).json()
+    assert body["matrix"] == counts.tolist() and body["grid"]["resolution"] == 50
+
+    body = client.get("/api/v1/heatmap", params=params, headers={"Accept": BASE64_MEDIA_TYPE}).json()
+    raw = zlib.decompress(base64.b64decode(body["matrix"]["data"]))
+    np.testing.assert_array_equal(np.frombuffer(raw, dtype=body["matrix"]["dtype"]).reshape(50, 50), counts)
+
+    res = client.get("/api/v1/heatmap", params=params, headers={"Accept": BINARY_MEDIA_TYPE})
+    assert res.headers["x-heatmap-shape"] == "50,50"
+    assert json.loads(res.headers["x-heatmap-meta"])["date"] == "2025-11-16"
+    np.testing.assert_array_equal(np.frombuffer(res.content, dtype="<u4").reshape(50, 50), counts)
+
+    assert client.get("/api/v1/heatmap", params=params, headers={"Accept": "text/html"}).status_code == 406
+
+
+def test_heatmap_range_sums_binary_rows(db_client):
+    a, b = _counts(1), _counts(2)
+    client, _ = db_client([_row(date(2025, 11, 17), b), _row(date(2025, 11, 16), a)])
+    body = client.get("/api/v1/heatmap", params={"level": "1", "from": "2025-11-16", "to": "2025-11-17"}).json()
+    assert body["days"] == 2
+    np.testing.assert_array_equal(np.array(body["matrix"]), a + b)
@@ -0,0 +1,98 @@
+from collections import namedtuple
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from scripts.heatmap_codec import encode_counts
+from scripts.heatmap_cube import CubeKey, bin_cube_chunk, cube_event_types, position_totals
+
+Row = namedtuple(
+    "Row",
+    "date platform game_version event_type grid_size x_min x_max y_min y_max matrix_data matrix_shape matrix_dtype",
+)
+DAY = date(2025, 11, 16)
+
+
+def test_bin_cube_chunk_files_missing_dimensions_as_unknown():
+    ts = datetime(2025, 11, 16, 12, tzinfo=timezone.utc)
+    chunk = pd.DataFrame({
+        "payload_x": [10.0, 20.0, 30.0, 40.0],
+        "payload_y": [10.0, 20.0, 30.0, 40.0],
+        "payload_level": ["1", "1", "1", "7"],
+        "timestamp": [ts] * 4,
+        "event_type": ["position", "position", "collision", "position"],
+        "platform": ["web", None, "web", "web"],
+        "game_version": ["1.2", None, "1.2", "1.2"],
+    })
+    cube = bin_cube_chunk(chunk, ["1"])
+    assert {key: int(m.sum()) for key, m in cube.items()} == {
+        CubeKey("1", DAY, "web", "1.2", "position"): 1,
+        CubeKey("1", DAY, "unknown", "unknown", "position"): 1,
+        CubeKey("1", DAY, "web", "1.2", "collision"): 1,
+    }
+    totals = position_totals(cube)
+    assert list(totals) == [("1", DAY)] and totals[("1", DAY)].sum() == 2
+
+
+def test_cube_event_types_always_include_position(monkeypatch):
+    monkeypatch.setenv("HEATMAP_CUBE_EVENT_TYPES", "collision, jump")
+    assert cube_event_types() == ["position", "collision", "jump"]
+
+
+def _cell(day, platform, event_type, value, x_max=700.0):
+    counts = np.zeros((50, 50), dtype=np.int64)
+    counts[0, 0] = value
+    data, shape, dtype = encode_counts(counts)
+    return Row(day, platform, "1.2", event_type, "50", 0.0, x_max, 0.0, 560.0, data, shape, dtype)
+
+
+def test_cube_sums_matching_cells(db_client):
+    rows = [
+        _cell(date(2025, 11, 17), "web", "collision", 3),
+        _cell(DAY, "mobile", "collision", 5),
+        _cell(DAY, "web", "collision", 7, x_max=100.0),  # stale grid
+    ]
+    client, db = db_client(rows)
+    params = {
+        "level": "1", "from": "2025-11-16", "to": "2025-11-17", "event_type": "collision", "platform": "web,mobile",
+    }
+    body = client.get("/api/v1/heatmap/cube", params=params).json()
+    assert db.params["event_type"] == ["collision"] and db.params["platform"] == ["web", "mobile"]
+    assert "game_version" not in db.params
+    assert body["cells"] == 2 and body["skipped_cells"] == 1
+    assert body["matrix"][0][0] == 8
+
+
+def test_cube_group_by(db_client):
+    client, _ = db_client([_cell(DAY, "web", "position", 2), _cell(DAY, "mobile", "position", 4)])
+    params = {"level": "1", "date": "2025-11-16", "group_by": "platform"}
+    body = client.get("/api/v1/heatmap/cube", params=params).json()
+    assert [(g["platform"], g["matrix"][0][0]) for g in body["groups"]] == [("mobile", 4), ("web", 2)]
+
+    res = client.get("/api/v1/heatmap/cube", params={"level": "1", "date": "2025-11-16", "group_by": "level"})
+    assert res.status_code == 400
+    res = client.get(
+        "/api/v1/heatmap/cube",
+        params={"level": "1", "date": "2025-11-16", "group_by": "platform"},
+        headers={"Accept": "application/octet-stream"},
+    )
+    assert res.status_code == 406
+
+
+def test_cube_404_without_cells(db_client):
+    client, _ = db_client([])
+    assert client.get("/api/v1/heatmap/cube", params={"level": "1", "date": "2025-11-16"}).status_code == 404
+
+
+def test_cube_sums_on_the_level_grid_not_the_latest_row(db_client):
+    # The newest cell was binned on another grid: it is skipped, not used to label the others
+    client, _ = db_client([
+        _cell(date(2025, 11, 17), "web", "position", 9, x_max=100.0), _cell(DAY, "web", "position", 2),
+    ])
+    body = client.get("/api/v1/heatmap/cube", params={"level": "1", "from": "2025-11-16", "to": "2025-11-17"}).json()
+    assert body["grid"]["x_max"] == 700.0
+    assert body["cells"] == 1 and body["skipped_cells"] == 1 and body["matrix"][0][0] == 2
+
+    client, _ = db_client([_cell(DAY, "web", "position", 9, x_max=100.0)])
+    assert client.get("/api/v1/heatmap/cube", params={"level": "1", "date": "2025-11-16"}).status_code == 409
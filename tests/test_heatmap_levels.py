@@ -0,0 +1,39 @@
+import numpy as np
+
+from scripts.grids import GridSpec
+from scripts.heatmap import GRID_SIZE, bin_levels_chunk
+
+
+def test_single_pass_matches_histogram2d_per_level():
+    rng = np.random.default_rng(7)
+    n = 5000
+    level_index = rng.integers(-1, 3, n)  # -1: level not requested
+    x = rng.uniform(0, 400, n)
+    y = rng.uniform(-50, 600, n)
+    x[::97] = np.nan
+
+    # Levels may have different bounds and resolutions
+    grids = [
+        GridSpec(0, 400, -50, 600, resolution=GRID_SIZE),
+        GridSpec(100, 300, 0, 500, resolution=20),
+        GridSpec(0, 400, -50, 600, resolution=7),
+    ]
+
+    counts = bin_levels_chunk(level_index, x, y, grids)
+    assert [c.shape for c in counts] == [(GRID_SIZE, GRID_SIZE), (20, 20), (7, 7)]
+    for lvl, grid in enumerate(grids):
+        pick = (level_index == lvl) & ~np.isnan(x)
+        expected, _, _ = np.histogram2d(
+            x[pick], y[pick], bins=grid.resolution,
+            range=[(grid.x_min, grid.x_max), (grid.y_min, grid.y_max)],
+        )
+        np.testing.assert_array_equal(counts[lvl], expected.T)
+
+
+def test_points_outside_range_are_dropped():
+    counts = bin_levels_chunk(
+        np.array([0, 0, 0]), np.array([-1.0, 5.0, 11.0]), np.array([5.0, 5.0, 5.0]),
+        [GridSpec(0, 10, 0, 10, resolution=2)],
+    )
+    assert counts[0].sum() == 1
+    assert counts[0][1, 1] == 1
@@ -0,0 +1,127 @@
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from scripts import heatmap_store
+from scripts.grids import DEFAULT_GRID
+from scripts.heatmap_codec import encode_counts
+
+Row = namedtuple(
+    "Row", "date grid_size x_min x_max y_min y_max matrix_data matrix_shape matrix_dtype updated_at"
+)
+UPDATED = datetime(2025, 11, 17, tzinfo=timezone.utc)
+
+
+def _counts(value):
+    return np.full((DEFAULT_GRID.resolution,) * 2, value, dtype=np.int64)
+
+
+def test_range_sum_spans_months_and_skips_other_grids():
+    other = DEFAULT_GRID.with_bounds(x_max=100)
+    heatmap_store.put_days("1", {
+        date(2025, 10, 31): (DEFAULT_GRID, _counts(1)),
+        date(2025, 11, 1): (DEFAULT_GRID, _counts(2)),
+        date(2025, 11, 2): (other, _counts(50)),
+        date(2025, 11, 3): None,
+    })
+    total, stored, skipped = heatmap_store.read_range("1", date(2025, 10, 1), date(2025, 11, 30))
+    assert (total == 3).all()
+    assert stored == [date(2025, 10, 31), date(2025, 11, 1)] and skipped == [date(2025, 11, 2)]
+
+    single, stored, _ = heatmap_store.read_range("1", date(2025, 11, 1), date(2025, 11, 1))
+    assert (single == 2).all() and stored == [date(2025, 11, 1)]
+    # Copied out under the lock: a later write to the day does not change it
+    assert not isinstance(single, np.memmap)
+    heatmap_store.put_days("1", {date(2025, 11, 1): (DEFAULT_GRID, _counts(9))})
+    assert (single == 2).all()
+
+
+def test_stale_days():
+    day = date(2025, 11, 1)
+    assert heatmap_store.stale_days("1", day, day + timedelta(days=1)) == [day, day + timedelta(days=1)]
+    heatmap_store.put_days("1", {day: (DEFAULT_GRID, _counts(1)), day + timedelta(days=1): None})
+    assert heatmap_store.stale_days("1", day, day + timedelta(days=1)) == []
+
+
+def test_every_day_expires_and_is_revalidated_by_version(monkeypatch):
+    monkeypatch.setenv("HEATMAP_STORE_TTL_SECONDS", "0")
+    old, absent, written = date(2025, 11, 1), date(2025, 11, 2), date(2025, 11, 3)
+    heatmap_store.put_days("1", {old: (DEFAULT_GRID, _counts(1)), absent: None}, {old: "v1"})
+    # Written through by a job: no version yet
+    heatmap_store.put_days("1", {written: (DEFAULT_GRID, _counts(1))})
+    days = [old, absent, written]
+    assert heatmap_store.stale_days("1", old, written) == days
+
+    assert heatmap_store.revalidate("1", days, {old: "v1", written: "v1"}) == [written]
+    assert heatmap_store.revalidate("1", days, {old: "v2", absent: "v1"}) == [old, absent, written]
+    monkeypatch.setenv("HEATMAP_STORE_TTL_SECONDS", "60")
+    assert heatmap_store.stale_days("1", old, written) == []
+
+
+def test_months_without_heatmaps_are_not_created():
+    heatmap_store.put_days("1", {date(2025, 11, 1): None})
+    assert not os.path.exists(heatmap_store.month_path("1", 2025, 11))
+
+
+def test_level_cannot_escape_store():
+    path = heatmap_store.month_path("../../etc", 2025, 11)
+    assert os.path.dirname(os.path.dirname(path)) == heatmap_store.store_dir()
+
+
+def test_rejects_negative_counts():
+    with pytest.raises(ValueError):
+        heatmap_store.put_days("1", {date(2025, 11, 1): (DEFAULT_GRID, _counts(-1))})
+
+
+def test_api_reads_days_from_postgres_once(db_client, monkeypatch):
+    data, shape, dtype = encode_counts(_counts(3))
+    rows = [Row(date(2025, 11, 16), "50", 0.0, 700.0, 0.0, 560.0, data, shape, dtype, UPDATED)]
+    client, db = db_client(rows)
+
+    def calls():
+        return [("matrix" if "matrix_data" in sql else "version", params["dates"]) for sql, params in db.calls]
+
+    params = {"level": "1", "from": "2025-11-15", "to": "2025-11-17"}
+    for _ in range(2):
+        body = client.get("/api/v1/heatmap", params=params).json()
+        assert body["days"] == 1 and body["matrix"][0][0] == 3
+    days = [date(2025, 11, 15), date(2025, 11, 16), date(2025, 11, 17)]
+    assert calls() == [("version", days), ("matrix", days)]
+
+    # Expired but unchanged: one version query, no matrix reads
+    monkeypatch.setenv("HEATMAP_STORE_TTL_SECONDS", "0")
+    db.calls.clear()
+    assert client.get("/api/v1/heatmap", params=params).json()["matrix"][0][0] == 3
+    assert calls() == [("version", days)]
+
+
+def test_binary_from_store_is_deflated_when_accepted(db_client):
+    data, shape, dtype = encode_counts(_counts(3))
+    client, _ = db_client([Row(date(2025, 11, 16), "50", 0.0, 700.0, 0.0, 560.0, data, shape, dtype, UPDATED)])
+    params = {"level": "1", "date": "2025-11-16"}
+    deflated = client.get(
+        "/api/v1/heatmap", params=params,
+        headers={"Accept": "application/octet-stream", "Accept-Encoding": "deflate"},
+    )
+    raw = client.get(
+        "/api/v1/heatmap", params=params,
+        headers={"Accept": "application/octet-stream", "Accept-Encoding": "identity"},
+    )
+    assert deflated.headers["content-encoding"] == "deflate"
+    assert "content-encoding" not in raw.headers
+    # The client inflates the body; both carry the same uint32 array
+    expected = _counts(3).astype("<u4").tobytes()
+    assert deflated.content == expected and raw.content == expected
+    assert int(deflated.headers["content-length"]) < len(expected)
+
+
+def test_publish_logs_store_failures(monkeypatch, caplog):
+    def fail(level, days):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(heatmap_store, "put_days", fail)
+    heatmap_store.publish({("1", date(2025, 11, 1)): (DEFAULT_GRID, _counts(1))})
+    assert "Heatmap store not updated for level 1: disk full" in caplog.text
@@ -0,0 +1,158 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.jobs import INGEST_CHANNEL, IngestRelay, IngestTrigger
+from app.leader import job_leader
+
+
+def _trigger():
+    return IngestTrigger("etl", event_threshold=100, max_staleness_seconds=60, max_idle_seconds=3600)
+
+
+def test_decisions():
+    trigger = _trigger()
+    now = time.monotonic()
+    assert trigger.decide(now) == "no_work"
+
+    trigger.record(10)
+    assert trigger.decide(now) == "no_work"
+    assert trigger.decide(now + 61) == "staleness"
+
+    trigger.record(95)
+    assert trigger.decide(now) == "volume"
+
+    idle = _trigger()
+    assert idle.decide(now + 3601) == "idle_timeout"
+
+
+def test_check_dispatches_and_resets(monkeypatch):
+    monkeypatch.setattr(job_leader, "is_leader", True)
+    trigger = _trigger()
+    calls = []
+
+    async def dispatch(job_name):
+        calls.append(job_name)
+        return {"status": "ok"}
+
+    async def run():
+        trigger.record(150)
+        await trigger.check(dispatch)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await trigger.check(dispatch)
+
+    asyncio.run(run())
+    assert calls == ["etl"]
+    assert trigger.pending == 0
+    assert trigger.decisions == {"volume": 1, "no_work": 1}
+
+
+def test_failed_run_keeps_events_pending(monkeypatch):
+    monkeypatch.setattr(job_leader, "is_leader", True)
+    trigger = _trigger()
+
+    async def dispatch(job_name):
+        return {"status": "error", "error": "db down"}
+
+    async def run():
+        trigger.record(150)
+        await trigger.check(dispatch)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert trigger.pending == 150
+    assert not trigger.running
+
+
+def test_followers_drop_their_counts(monkeypatch):
+    monkeypatch.setattr(job_leader, "is_leader", False)
+    trigger = _trigger()
+    trigger.record(150)
+
+    async def dispatch(job_name):
+        raise AssertionError("followers must not dispatch")
+
+    asyncio.run(trigger.check(dispatch))
+    assert trigger.pending == 0
+    assert trigger.decisions == {"not_leader": 1}
+
+
+class _Postgres:
+    """Delivers each NOTIFY to every connection LISTENing on its channel, as Postgres does."""
+
+    def __init__(self):
+        self.connections = []
+
+    async def connect(self, dsn):
+        conn = _Conn(self, pid=len(self.connections) + 1)
+        self.connections.append(conn)
+        return conn
+
+
+class _Conn:
+    def __init__(self, server, pid):
+        self.server = server
+        self.pid = pid
+        self.listeners = {}
+
+    def get_server_pid(self):
+        return self.pid
+
+    def add_termination_listener(self, callback):
+        pass
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    async def execute(self, sql, channel, payload):
+        assert "pg_notify" in sql
+        for conn in self.server.connections:
+            if channel in conn.listeners:
+                conn.listeners[channel](conn, self.pid, channel, payload)
+
+    async def close(self):
+        self.server.connections.remove(self)
+
+
+def test_leader_triggers_on_counts_ingested_by_another_process():
+    server = _Postgres()
+    # Two processes: only the first holds the leader lock, only the second ingests
+    leader = {"etl": _trigger()}
+    follower = {"etl": _trigger()}
+    relays = [IngestRelay(triggers, dsn="postgresql://db", flush_seconds=0.01, connect=server.connect)
+              for triggers in (leader, follower)]
+    calls = []
+
+    async def dispatch(job_name):
+        calls.append(job_name)
+        return {"status": "ok"}
+
+    async def run():
+        for relay in relays:
+            relay.start()
+        await asyncio.sleep(0.02)
+        assert [conn.listeners.keys() for conn in server.connections] == [{INGEST_CHANNEL}] * 2
+
+        # What record_ingest does in the ingesting process
+        for count in (60, 50):
+            follower["etl"].record(count)
+            relays[1].queue(count)
+        await asyncio.sleep(0.05)
+        assert leader["etl"].pending == 110
+        assert relays[1].unpublished == 0
+        # A process does not count its own notifications twice
+        assert follower["etl"].pending == 110
+
+        await follower["etl"].check(dispatch, leader=SimpleNamespace(is_leader=False))
+        await leader["etl"].check(dispatch, leader=SimpleNamespace(is_leader=True))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        for relay in relays:
+            await relay.stop()
+
+    asyncio.run(run())
+    assert calls == ["etl"]
+    assert leader["etl"].decisions == {"volume": 1} and leader["etl"].pending == 0
+    assert follower["etl"].decisions == {"not_leader": 1}
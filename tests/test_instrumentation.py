@@ -0,0 +1,132 @@
+import asyncio
+import sqlite3
+
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pydantic import BaseModel
+from sqlalchemy import create_engine, text
+from sqlalchemy.util import greenlet_spawn
+
+from app.instrumentation import (
+    TimedJSONResponse,
+    TimedQueuePool,
+    current_timings,
+    end_request,
+    instrument_engine,
+    instrument_serialization,
+    start_request,
+)
+from app.metrics import MetricsMiddleware
+
+
+def _engine():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    return engine
+
+
+def test_engine_hooks_count_queries():
+    engine = _engine()
+    timings = start_request()
+    try:
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+    finally:
+        end_request()
+    assert timings.db_queries == 3
+    assert timings.db_seconds > 0
+
+    # Outside a request nothing is recorded
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert current_timings() is None
+    assert timings.db_queries == 3
+
+
+def test_pool_checkouts_are_timed_inside_the_driver_greenlet():
+    pool = TimedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0)
+
+    def checkout_twice():
+        for _ in range(2):
+            pool.connect().close()
+
+    async def run():
+        timings = start_request()
+        # Like AsyncSession: pool access happens in a greenlet sharing the request's context
+        await greenlet_spawn(checkout_twice)
+        end_request()
+        return timings
+
+    assert asyncio.run(run()).pool_wait_seconds > 0
+
+
+def test_middleware_exports_histograms_and_server_timing():
+    engine = _engine()
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    app.add_middleware(MetricsMiddleware, server_timing_header=True)
+
+    @app.get("/instrumented/{item_id}")
+    def item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            value = conn.execute(text("SELECT :v"), {"v": item_id}).scalar()
+        return {"items": [value] * 1000}
+
+    labels = {"method": "GET", "route": "/instrumented/{item_id}"}
+    before = REGISTRY.get_sample_value("http_request_db_queries_sum", labels) or 0
+    response = TestClient(app).get("/instrumented/7")
+
+    assert response.json()["items"][0] == 7
+    header = response.headers["server-timing"]
+    assert 'desc="2 queries"' in header
+    assert "pool;dur=" in header and "serialize;dur=" in header
+    assert REGISTRY.get_sample_value("http_request_db_queries_sum", labels) - before == 2
+    assert REGISTRY.get_sample_value("http_request_serialize_seconds_count", labels) >= 1
+    assert REGISTRY.get_sample_value("http_request_pool_wait_seconds_count", labels) >= 1
+
+
+def test_server_timing_header_is_off_by_default():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/plain")
+    def plain():
+        return {}
+
+    assert "server-timing" not in TestClient(app).get("/plain").headers
+
+
+class _Point(BaseModel):
+    x: float
+    y: float
+    label: str
+
+
+class _Track(BaseModel):
+    points: List[_Point]
+
+
+def test_response_model_pass_is_timed_apart_from_rendering():
+    instrument_serialization()
+    instrument_serialization()  # idempotent
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    app.add_middleware(MetricsMiddleware, server_timing_header=True)
+
+    @app.get("/track", response_model=_Track)
+    async def track():
+        return {"points": [{"x": i, "y": i / 2, "label": f"p{i}"} for i in range(5000)]}
+
+    labels = {"method": "GET", "route": "/track"}
+    before = REGISTRY.get_sample_value("http_request_response_model_seconds_count", labels) or 0
+    response = TestClient(app).get("/track")
+
+    assert len(response.json()["points"]) == 5000
+    durations = dict(part.split(";")[:2] for part in response.headers["server-timing"].split(", "))
+    assert float(durations["model"].split("=")[1]) > 0
+    assert float(durations["serialize"].split("=")[1]) > 0
+    assert REGISTRY.get_sample_value("http_request_response_model_seconds_count", labels) - before == 1
+    assert REGISTRY.get_sample_value("http_request_response_model_seconds_sum", labels) > 0
@@ -0,0 +1,71 @@
+import uuid
+
+from sqlalchemy import select
+
+from app import jobs
+from app.job_runs import job_runs, normalize_params, params_hash, run_job_run
+from scripts import runtime
+
+
+def test_equivalent_submissions_share_a_hash():
+    tasks_a, params_a = normalize_params(["heatmap", "etl"], ["2", "1"], "2025-11-16")
+    tasks_b, params_b = normalize_params(["etl", "heatmap", "etl"], ["1", "2", "2"], "2025-11-16")
+    assert tasks_a == ["etl", "heatmap"]
+    assert params_hash(tasks_a, params_a) == params_hash(tasks_b, params_b)
+    assert params_hash(*normalize_params(["etl"], None, None)) != params_hash(tasks_a, params_a)
+
+
+def test_unknown_task_rejected():
+    try:
+        normalize_params(["drop_tables"], None, None)
+    except ValueError as e:
+        assert "drop_tables" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def _setup(tmp_path, monkeypatch, cancel_requested=False):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'jobs.db'}")
+    runtime.reset()
+    engine = runtime.get_engine()
+    job_runs.metadata.create_all(engine, tables=[job_runs])
+    run_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(job_runs.insert().values(
+            id=run_id, tasks=["etl"], params={}, params_hash="h", status="queued",
+            progress={}, cancel_requested=cancel_requested,
+        ))
+
+    def fake_etl(chunk_size=None, progress=None):
+        progress({"rows": 10, "chunks": 1, "sessions": 2})
+        return {"rows": 10, "chunks": 1, "sessions": 2}
+
+    monkeypatch.setattr(jobs.etl_aggregate, "main", fake_etl)
+    return engine, run_id
+
+
+def test_run_records_progress_and_result(tmp_path, monkeypatch):
+    engine, run_id = _setup(tmp_path, monkeypatch)
+    try:
+        result = run_job_run(str(run_id))
+        assert result["status"] == "succeeded"
+        with engine.connect() as conn:
+            row = conn.execute(select(job_runs).where(job_runs.c.id == run_id)).one()
+        assert row.status == "succeeded"
+        assert row.progress == {"etl": {"rows": 10, "chunks": 1, "sessions": 2}}
+        assert row.result["results"][0]["rows"] == 10
+        assert row.finished_at is not None
+        # A run is claimed once; executing it again is a no-op
+        assert run_job_run(str(run_id))["status"] == "cancelled"
+    finally:
+        runtime.reset()
+
+
+def test_cancel_requested_stops_run(tmp_path, monkeypatch):
+    engine, run_id = _setup(tmp_path, monkeypatch, cancel_requested=True)
+    try:
+        assert run_job_run(str(run_id))["status"] == "cancelled"
+        with engine.connect() as conn:
+            assert conn.execute(select(job_runs.c.status).where(job_runs.c.id == run_id)).scalar() == "cancelled"
+    finally:
+        runtime.reset()
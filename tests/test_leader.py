@@ -0,0 +1,44 @@
+import asyncio
+
+from app import jobs
+from app.leader import LeaderElector, job_leader
+
+
+def test_dispatch_skipped_when_not_leader(monkeypatch):
+    monkeypatch.setattr(job_leader, "is_leader", False)
+    assert asyncio.run(jobs.dispatch_job("etl")) is None
+
+
+def test_disabled_elector_is_always_leader():
+    elector = LeaderElector(lock_key=1, enabled=False)
+    assert elector.is_leader
+    assert elector.status()["enabled"] is False
+
+
+def test_step_down_on_renew_failure_and_reacquire():
+    elector = LeaderElector(lock_key=1, renew_seconds=0.01)
+    calls = {"acquire": 0, "renew": 0}
+
+    async def acquire():
+        calls["acquire"] += 1
+        elector.is_leader = True
+
+    async def renew():
+        calls["renew"] += 1
+        if calls["renew"] == 1:
+            raise RuntimeError("connection lost")
+
+    elector._try_acquire = acquire
+    elector._renew = renew
+
+    async def run():
+        elector.start()
+        await asyncio.sleep(0.1)
+        await elector.stop()
+
+    asyncio.run(run())
+    # Lost the lease once, then acquired it again on a later attempt
+    assert calls["acquire"] >= 2
+    assert calls["renew"] >= 2
+    assert elector.last_error is None or "connection lost" in elector.last_error
+    assert not elector.is_leader
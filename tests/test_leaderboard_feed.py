@@ -0,0 +1,186 @@
+import asyncio
+import json
+
+from app.leaderboard_feed import (
+    CHANNEL,
+    FEEDS,
+    LeaderboardFeed,
+    ScoreListener,
+    diff_entries,
+    handle_notification,
+    listen_dsn,
+    notify_score,
+)
+
+
+def _row(rank, user_id, score):
+    return {"rank": rank, "user_id": user_id, "username": user_id, "highest_score": score}
+
+
+def test_diff_entries_reports_changes_within_top():
+    old = [_row(1, "a", 30), _row(2, "b", 20), _row(3, "c", 10)]
+    new = [_row(1, "a", 30), _row(2, "d", 25), _row(3, "b", 20)]
+    upserts, removed = diff_entries(old, new, 2)
+    assert upserts == [_row(2, "d", 25)]
+    assert removed == ["b"]
+    # Below the requested top nothing is reported
+    assert diff_entries(old, new, 1) == ([], [])
+
+
+def test_feed_coalesces_offers_and_skips_unchanged_reloads():
+    boards = [[_row(1, "a", 30)], [_row(1, "a", 30)], [_row(1, "b", 40), _row(2, "a", 30)]]
+    calls = []
+
+    async def loader(limit):
+        calls.append(limit)
+        return boards[len(calls) - 1]
+
+    async def run():
+        feed = LeaderboardFeed("scores", loader, "highest_score")
+        assert await feed.refresh() is True
+        assert feed.version == 1
+        first = json.loads(feed.message(None, 10))
+        assert first["type"] == "snapshot"
+
+        # Nothing offered: no reload
+        assert await feed.refresh() is False
+        assert len(calls) == 1
+
+        # A burst of offers results in a single reload
+        feed.offer("a", 31)
+        feed.offer("a", 32)
+        assert await feed.refresh() is False
+        assert len(calls) == 2
+        assert feed.version == 1
+
+        feed.offer("b", 40)
+        assert await feed.refresh() is True
+        diff = json.loads(feed.message(1, 10))
+        assert diff["type"] == "diff"
+        assert [e["user_id"] for e in diff["upserts"]] == ["b", "a"]
+        assert feed.has_changes(1, 10) is True
+        assert feed.has_changes(feed.version, 10) is False
+
+    asyncio.run(run())
+
+
+def test_empty_board_still_publishes_a_first_snapshot():
+    async def loader(limit):
+        return []
+
+    async def run():
+        feed = LeaderboardFeed("leaderboard", loader, "best_score")
+        assert await feed.refresh() is True
+        assert feed.version == 1
+        assert json.loads(feed.message(None, 10)) == {
+            "type": "snapshot", "board": "leaderboard", "version": 1, "entries": [],
+        }
+        # Still empty: nothing new to publish
+        feed.offer("a", 1)
+        assert await feed.refresh() is False and feed.version == 1
+
+    asyncio.run(run())
+
+
+def test_socket_opened_before_any_score_gets_an_empty_snapshot(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    async def loader(limit):
+        return []
+
+    feed = LeaderboardFeed("scores", loader, "highest_score")
+    asyncio.run(feed.refresh())
+    monkeypatch.setitem(FEEDS, "scores", feed)
+    with TestClient(app).websocket_connect("/api/v1/leaderboard/ws?board=scores&top=5") as ws:
+        assert json.loads(ws.receive_text()) == {"type": "snapshot", "board": "scores", "version": 1, "entries": []}
+
+
+def _settled_feed(name, score_field):
+    """Feed holding a full, unchanged top N with nothing pending."""
+    async def loader(limit):
+        return [{**_row(i + 1, f"u{i}", 0), score_field: 1000 - i} for i in range(limit)]
+
+    feed = LeaderboardFeed(name, loader, score_field)
+    asyncio.run(feed.refresh())
+    return feed
+
+
+def test_notify_score_queues_pg_notify_in_the_write_transaction():
+    calls = []
+
+    class _Db:
+        async def execute(self, statement, params):
+            calls.append((str(statement), params))
+
+    asyncio.run(notify_score(_Db(), "scores", "u1", 42))
+    (sql, params), = calls
+    assert "pg_notify" in sql
+    assert params["channel"] == CHANNEL
+    assert json.loads(params["payload"]) == {"board": "scores", "user_id": "u1", "score": 42}
+
+
+def test_notifications_offer_scores_to_the_named_feed(monkeypatch):
+    feed = _settled_feed("scores", "highest_score")
+    monkeypatch.setitem(FEEDS, "scores", feed)
+    # Too low to reach the top N: stays clean
+    assert handle_notification(json.dumps({"board": "scores", "user_id": "x", "score": 1})) is True
+    assert feed._dirty is False
+    assert handle_notification(json.dumps({"board": "scores", "user_id": "x", "score": 5000})) is True
+    assert feed._dirty is True
+    assert handle_notification(json.dumps({"board": "nope", "user_id": "x", "score": 5000})) is False
+    assert handle_notification("not json") is False
+    assert handle_notification(json.dumps({"board": "scores"})) is False
+
+
+def test_listener_invalidates_feeds_on_connect_and_reconnects(monkeypatch):
+    feeds = [_settled_feed("leaderboard", "best_score"), _settled_feed("scores", "highest_score")]
+    for feed in feeds:
+        monkeypatch.setitem(FEEDS, feed.name, feed)
+    connects = []
+
+    class _Conn:
+        def __init__(self):
+            self.closed = False
+
+        def add_termination_listener(self, callback):
+            self.terminate = callback
+
+        async def add_listener(self, channel, callback):
+            self.channel = channel
+            self.callback = callback
+
+        async def close(self):
+            self.closed = True
+
+    async def connect(dsn):
+        conn = _Conn()
+        connects.append(conn)
+        return conn
+
+    async def run():
+        listener = ScoreListener("postgresql://db", retry_seconds=0, connect=connect)
+        listener.start()
+        await asyncio.sleep(0.01)
+        conn = connects[0]
+        assert conn.channel == CHANNEL
+        assert all(feed._dirty for feed in feeds)
+
+        for feed in feeds:
+            feed._dirty = False
+        conn.callback(conn, 1, CHANNEL, json.dumps({"board": "leaderboard", "user_id": "new", "score": 5000}))
+        assert [feed._dirty for feed in feeds] == [True, False]
+
+        # A dropped connection is closed and replaced
+        conn.terminate(conn)
+        await asyncio.sleep(0.01)
+        assert conn.closed is True
+        assert len(connects) >= 2
+        await listener.stop()
+
+    asyncio.run(run())
+
+
+def test_listen_dsn_drops_the_sqlalchemy_driver():
+    assert listen_dsn("postgresql+asyncpg://u:p@h:5432/db") == "postgresql://u:p@h:5432/db"
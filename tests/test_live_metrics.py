@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.live_metrics import LiveMetrics, RingCounter, Subscriber
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _event(event_type, event_name="e", session_id=None):
+    return SimpleNamespace(event_type=event_type, event_name=event_name, session_id=session_id)
+
+
+def test_ring_counter_expires_old_buckets():
+    counter = RingCounter(horizon=10)
+    counter.add(100, 3)
+    counter.add(105, 2)
+    assert counter.total(105, 10) == 5
+    assert counter.total(105, 3) == 2
+    # Slot 100 % 10 is reused by second 110; the old count must not leak in
+    counter.add(110, 1)
+    assert counter.total(110, 10) == 3
+
+
+def test_live_metrics_windows_and_sessions():
+    clock = FakeClock()
+    metrics = LiveMetrics(clock=clock)
+    metrics.record_session_start("s1")
+    metrics.record_events([_event("jump", session_id="s1")] * 60)
+    metrics.record_events([_event("collision", "game_over", session_id="s2")])
+
+    clock.now += 120
+    metrics.record_events([_event("jump")] * 30)
+    snap = metrics.snapshot()
+
+    assert snap["active_sessions"] == 2
+    assert snap["windows"]["1m"]["events_per_sec"]["jump"] == 0.5
+    assert snap["windows"]["5m"]["events_per_sec"]["jump"] == 0.3
+    assert snap["windows"]["1m"]["game_overs_per_min"] == 0
+    assert snap["windows"]["5m"]["game_overs_per_min"] == 0.2
+
+    metrics.record_session_end("s1")
+    assert metrics.snapshot()["active_sessions"] == 1
+
+
+def test_live_metrics_drops_event_types_idle_for_the_horizon():
+    clock = FakeClock()
+    metrics = LiveMetrics(horizon=60, clock=clock)
+    metrics.record_events([_event("typo-1"), _event("jump")])
+
+    clock.now += 30
+    metrics.record_events([_event("jump")])
+    assert set(metrics.snapshot()["windows"]["1m"]["events_per_sec"]) == {"typo-1", "jump"}
+
+    clock.now += 30
+    assert set(metrics.snapshot()["windows"]["1m"]["events_per_sec"]) == {"jump"}
+    assert set(metrics._events_by_type) == {"jump"}
+
+
+def test_live_metrics_caps_tracked_event_types():
+    metrics = LiveMetrics(clock=FakeClock(), max_event_types=2)
+    metrics.record_events([_event("jump"), _event("land")] + [_event(f"junk-{i}") for i in range(100)])
+    metrics.record_events([_event("jump")])
+
+    rates = metrics.snapshot()["windows"]["1m"]["events_per_sec"]
+    assert set(rates) == {"jump", "land", "other"}
+    assert rates["other"] == round(100 / 60, 3)
+    assert rates["jump"] == round(2 / 60, 3)
+
+
+def test_subscriber_coalesces_to_latest():
+    async def run():
+        sub = Subscriber()
+        sub.offer("a")
+        sub.offer("b")
+        sub.offer("c")
+        assert sub.dropped == 2
+        assert await sub.get(timeout=0.1) == "c"
+        assert await sub.get(timeout=0.01) is None
+
+    asyncio.run(run())
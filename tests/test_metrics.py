@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry
+from prometheus_client.multiprocess import MultiProcessCollector
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.jobs import IngestTrigger
+from app.main import app
+from app.metrics import inc_events
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _samples(text):
+    return {
+        (s.name, tuple(sorted(s.labels.items()))): s.value
+        for family in text_string_to_metric_families(text) for s in family.samples
+    }
+
+
+def test_exposition_has_counters_histograms_and_triggers():
+    client = TestClient(app)
+    before = _samples(client.get("/metrics").text)
+    inc_events(5)
+    IngestTrigger("metrics_test", event_threshold=100, max_staleness_seconds=60, max_idle_seconds=60).record(7)
+    client.get("/")
+    client.get("/no-such-route")
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    after = _samples(response.text)
+    assert after[("events_received_total", ())] - before.get(("events_received_total", ()), 0) == 5
+    assert after[("job_trigger_pending_events", (("job", "metrics_test"),))] == 7
+    root = (("method", "GET"), ("route", "/"), ("status", "200"))
+    assert after[("http_request_duration_seconds_count", root)] >= 1
+    unmatched = (("method", "GET"), ("route", "unmatched"), ("status", "404"))
+    assert after[("http_request_duration_seconds_count", unmatched)] >= 1
+
+
+def test_workers_are_summed_through_shared_files(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for n in (3, 4):
+        script = f"from app.metrics import inc_events, inc_sessions; inc_events({n}); inc_sessions()"
+        subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=ROOT, env=env, check=True,
+        )
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path=str(tmp_path))
+    assert registry.get_sample_value("events_received_total") == 7
+    assert registry.get_sample_value("sessions_created_total") == 2
@@ -0,0 +1,19 @@
+import pytest
+
+from scripts.projection import PayloadField, Projection
+
+
+def test_projection_renders_typed_sql():
+    proj = Projection([PayloadField("x", "float64"), PayloadField("level", "str")])
+    sql = proj.select_sql()
+    assert "(payload->>'x')::float8" in sql
+    assert "AS payload_x" in sql
+    assert "payload->>'level' AS payload_level" in sql
+    assert proj.dtypes == {"payload_x": "float64", "payload_level": "category"}
+
+
+def test_payload_field_rejects_unsafe_keys():
+    with pytest.raises(ValueError):
+        PayloadField("x'; DROP TABLE events; --")
+    with pytest.raises(ValueError):
+        PayloadField("x", "json")
@@ -0,0 +1,107 @@
+import logging
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.db import get_db
+from app.instrumentation import capture_queries, instrument_engine, normalize_sql
+from app.jwt import get_current_user
+from app.main import app as main_app
+from app.metrics import MetricsMiddleware
+
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT * FROM t WHERE id = $1 AND n > 10") == "SELECT * FROM t WHERE id = ? AND n > ?"
+    assert normalize_sql("SELECT x::text FROM t WHERE a IN (%(a_1)s, %(a_2)s)\n  AND b = 'it''s'") == (
+        "SELECT x::text FROM t WHERE a IN (?) AND b = ?"
+    )
+    assert normalize_sql("INSERT INTO t (a) VALUES ($1), ($2), ($3)") == "INSERT INTO t (a) VALUES (?)"
+    assert normalize_sql("SELECT :v FROM ix_1") == "SELECT ? FROM ix_1"
+
+
+@pytest.fixture
+def client():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items")
+    def items(n: int = 3):
+        with engine.connect() as conn:
+            ids = conn.execute(text("SELECT value FROM json_each(:ids)"), {"ids": str(list(range(n)))}).scalars().all()
+            # One query per item: the pattern the detector is for
+            return [conn.execute(text("SELECT :id * 2"), {"id": i}).scalar() for i in ids]
+
+    return TestClient(app)
+
+
+def test_budget_passes_and_fails(client):
+    with capture_queries() as captured:
+        assert client.get("/items", params={"n": 2}).json() == [0, 2]
+    captured.assert_budget(max_queries=3, max_repeats=2, route="/items")
+    assert captured.traces[0].counts() == {"SELECT value FROM json_each(?)": 1, "SELECT ? * ?": 2}
+
+    with capture_queries() as captured:
+        client.get("/items", params={"n": 10})
+    with pytest.raises(AssertionError, match="10x SELECT \\? \\* \\?"):
+        captured.assert_budget(max_repeats=5)
+    with pytest.raises(AssertionError, match="11 queries"):
+        captured.assert_budget(max_queries=5)
+
+    # Nothing is recorded once the capture is closed
+    client.get("/items")
+    assert len(captured.traces) == 1
+
+
+def test_n_plus_one_and_slow_queries_are_logged(client, caplog, monkeypatch):
+    monkeypatch.setenv("QUERY_TRACE_MAX_REPEATS", "3")
+    monkeypatch.setenv("QUERY_TRACE_SLOW_MS", "0")
+    with caplog.at_level(logging.WARNING, logger="app.instrumentation"), capture_queries():
+        client.get("/items", params={"n": 4})
+    messages = [r.getMessage() for r in caplog.records]
+    assert "Possible N+1 in GET /items: 4 executions of SELECT ? * ?" in messages
+    assert any(m.startswith("Slow query in GET /items") for m in messages)
+
+
+class _BulkSession:
+    """Records what create_events asks of the session; commit assigns ids like a flush would."""
+
+    def __init__(self):
+        self.added = []
+        self.refreshed = 0
+
+    def add_all(self, objects):
+        self.added.extend(objects)
+
+    async def commit(self):
+        for obj in self.added:
+            obj.id = obj.id or uuid.uuid4()
+
+    async def refresh(self, obj):
+        self.refreshed += 1
+
+    async def rollback(self):
+        pass
+
+
+def test_create_events_does_not_refresh_each_event():
+    session = _BulkSession()
+
+    async def fake_db():
+        yield session
+
+    main_app.dependency_overrides[get_db] = fake_db
+    main_app.dependency_overrides[get_current_user] = lambda: None
+    try:
+        user_id = str(uuid.uuid4())
+        events = [{"user_id": user_id, "event_type": "jump", "event_name": "jump"} for _ in range(50)]
+        response = TestClient(main_app).post("/api/v1/events", json={"events": events})
+    finally:
+        main_app.dependency_overrides.clear()
+    assert response.status_code == 201
+    assert response.json()["inserted_event_ids"] == [str(e.id) for e in session.added]
+    assert session.refreshed == 0
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, MetaData, Table
+
+from scripts import runtime
+
+
+def _define_items(meta: MetaData) -> Table:
+    return Table("items", meta, Column("id", Integer, primary_key=True))
+
+
+def test_engine_and_tables_are_cached_per_process(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'jobs.db'}")
+    runtime.reset()
+    try:
+        engine = runtime.get_engine()
+        assert runtime.get_engine() is engine
+
+        assert runtime.get_table("items") is None
+        created = runtime.get_table("items", create=_define_items)
+        assert runtime.get_table("items") is created
+
+        # A fresh process (simulated by a reset) reflects the existing table
+        runtime.reset()
+        reflected = runtime.get_table("items")
+        assert reflected is not None and "id" in reflected.c
+    finally:
+        runtime.reset()
+
+
+def test_statement_registry_returns_same_object():
+    first = runtime.statement("test.select_one", "SELECT 1")
+    assert runtime.statement("test.select_one", "SELECT 1") is first
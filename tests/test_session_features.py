@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from scripts.session_features import FEATURE_COLUMNS, compute_features
+
+START = datetime(2025, 11, 16, 12, tzinfo=timezone.utc)
+
+
+def _events(seed=4, sessions=30):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for s in range(sessions):
+        n = int(rng.integers(1, 40))
+        offsets = np.sort(rng.uniform(0, 120, n))
+        for offset in offsets:
+            kind = rng.choice(["jump", "collision", "score", "position"])
+            rows.append({
+                "session_id": f"s{s:03d}",
+                "event_type": kind,
+                "timestamp": START + timedelta(seconds=float(offset)),
+                "payload_score": float(rng.integers(0, 50)) if kind == "score" else None,
+            })
+    return pd.DataFrame(rows).sort_values(["session_id", "timestamp"], ignore_index=True)
+
+
+def _naive(group):
+    ts = pd.to_datetime(group["timestamp"], utc=True)
+    active = (ts.max() - ts.min()).total_seconds()
+    jumps = ts[group["event_type"] == "jump"]
+    gaps = jumps.diff().dt.total_seconds().dropna().to_numpy()
+    scores = group.loc[group["event_type"] == "score", "payload_score"].astype(float)
+    score_max = scores.max() if len(scores) else np.nan
+    return {
+        "event_count": len(group),
+        "active_seconds": active,
+        "jump_count": len(jumps),
+        "collision_count": int((group["event_type"] == "collision").sum()),
+        "jumps_per_second": len(jumps) / active if active > 0 else np.nan,
+        "score_max": score_max,
+        "score_velocity": score_max / active if active > 0 else np.nan,
+        "inter_jump_mean": gaps.mean() if len(gaps) else np.nan,
+        "inter_jump_std": gaps.std() if len(gaps) else np.nan,
+        "inter_jump_min": gaps.min() if len(gaps) else np.nan,
+        "inter_jump_max": gaps.max() if len(gaps) else np.nan,
+    }
+
+
+def test_matches_per_session_computation():
+    events = _events()
+    features = compute_features(events).set_index("session_id")
+    assert list(features.columns) == FEATURE_COLUMNS
+    for session_id, group in events.groupby("session_id"):
+        row = features.loc[session_id]
+        for col, expected in _naive(group).items():
+            np.testing.assert_allclose(row[col], expected, rtol=1e-9, atol=1e-6, err_msg=f"{session_id} {col}")
+        assert row["first_event_at"] == pd.Timestamp(group["timestamp"].min())
+
+
+def test_empty():
+    assert compute_features(pd.DataFrame()).empty
@@ -0,0 +1,95 @@
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+import pytest
+
+from scripts.grids import GridSpec
+from scripts.tiles import build_pyramid, pyramid_rows, split_tiles, tiles_for_viewport
+
+GRID = GridSpec(0, 700, 0, 560, resolution=32)
+
+
+def _finest(seed=4, n=32):
+    rng = np.random.default_rng(seed)
+    m = np.zeros((n, n), dtype=np.int64)
+    m[rng.integers(0, n, 60), rng.integers(0, n // 2, 60)] += rng.integers(1, 9, 60)
+    return m
+
+
+def test_pyramid_is_2x2_sums():
+    finest = _finest()
+    zooms = build_pyramid(finest, 1)
+    assert [z.shape[0] for z in zooms] == [1, 2, 4, 8, 16, 32]
+    assert [z.shape[0] for z in build_pyramid(finest, 8)] == [8, 16, 32]
+    with pytest.raises(ValueError):
+        build_pyramid(finest, 12)
+    assert all(z.sum() == finest.sum() for z in zooms)
+    np.testing.assert_array_equal(zooms[-2][3, 5], finest[6:8, 10:12].sum())
+
+
+def test_split_tiles_skips_empty_and_reassembles():
+    finest = _finest()
+    tiles = list(split_tiles(finest, 8))
+    # Events only in the left half: right-hand tiles are empty
+    assert all(tx < 2 for tx, _, _ in tiles)
+    rebuilt = np.zeros_like(finest)
+    for tx, ty, tile in tiles:
+        rebuilt[ty * 8:(ty + 1) * 8, tx * 8:(tx + 1) * 8] = tile
+    np.testing.assert_array_equal(rebuilt, finest)
+
+
+def test_tiles_for_viewport():
+    assert tiles_for_viewport(GRID, 0, 0, 700, 0, 560) == (range(0, 1), range(0, 1))
+    assert tiles_for_viewport(GRID, 2, 0, 700, 0, 560) == (range(0, 4), range(0, 4))
+    # 350..525 in x is tiles 2 and 2 (exclusive upper edge); y clamps at the grid
+    assert tiles_for_viewport(GRID, 2, 350, 525, -100, 100) == (range(2, 3), range(0, 1))
+    assert len(tiles_for_viewport(GRID, 2, 800, 900, 0, 10)[0]) == 0
+
+
+def _answer_from(rows):
+    """Answers the grid lookup and the tile range query from stored pyramid rows."""
+    Grid = namedtuple("Grid", "x_min x_max y_min y_max tile_size")
+    Tile = namedtuple("Tile", "tile_x tile_y data")
+
+    def respond(sql, params):
+        if "LIMIT 1" in sql:
+            return [Grid(r["x_min"], r["x_max"], r["y_min"], r["y_max"], r["tile_size"])
+                    for r in rows if r["zoom"] == 0][:1]
+        return [
+            Tile(r["tile_x"], r["tile_y"], r["data"]) for r in rows
+            if r["zoom"] == params["zoom"]
+            and params["x_first"] <= r["tile_x"] <= params["x_last"]
+            and params["y_first"] <= r["tile_y"] <= params["y_last"]
+        ]
+
+    return respond
+
+
+@pytest.fixture
+def client(db_client):
+    finest = _finest()
+    rows = pyramid_rows("1", date(2025, 11, 16), finest, GRID, size=8)
+    client, _ = db_client(respond=_answer_from(rows))
+    return client, finest
+
+
+def test_tiles_endpoint_returns_viewport_tiles(client):
+    client, finest = client
+    body = client.get(
+        "/api/v1/heatmap/tiles", params={"level": "1", "date": "2025-11-16", "zoom": 2, "x_max": 350, "y_max": 280}
+    ).json()
+    assert body["tile_x"] == [0, 1] and body["tile_y"] == [0, 1]
+    for tile in body["tiles"]:
+        tx, ty = tile["x"], tile["y"]
+        np.testing.assert_array_equal(np.array(tile["matrix"]), finest[ty * 8:(ty + 1) * 8, tx * 8:(tx + 1) * 8])
+
+    whole = client.get("/api/v1/heatmap/tiles", params={"level": "1", "date": "2025-11-16"}).json()
+    assert whole["tile_size"] == 8 and np.array(whole["tiles"][0]["matrix"]).sum() == finest.sum()
+
+
+def test_tiles_endpoint_caps_viewport(client, monkeypatch):
+    client, _ = client
+    monkeypatch.setattr("app.api.heatmap_api.MAX_TILES", 4)
+    res = client.get("/api/v1/heatmap/tiles", params={"level": "1", "date": "2025-11-16", "zoom": 2})
+    assert res.status_code == 400